@@ -1,33 +1,41 @@
+import json
 import os
 import random
 from time import sleep
 
 import requests
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 
 from backend.app.localtunnel_app_wrapper import LocalTunnelAppRunner
-from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.chain_range import chain_etag, newest_first_heights, page_heights
+from backend.blockchain.headers_sync import HeadersFirstSync, HttpPeer
+from backend.config import ADDRESS_TRANSACTIONS_LIMIT, BLOCKCHAIN_RANGE_LIMIT, HEADERS_LIMIT
+from backend.miner import Miner
 from backend.pubsub import PubSub
 from backend.util.retrieve_or_generate_private_key import retrieve_or_create_new_private_key
 from backend.util.try_retrieve_local_blockchain import try_retrieve_local_blockchain
 from backend.wallet.transaction import Transaction
 from backend.wallet.transaction_pool import TransactionPool
-from backend.wallet.wallet import Wallet
+from backend.wallet.wallet import PUBLIC_KEY_CACHE, SIGNATURE_CACHE, Wallet
 
 app = Flask(__name__)
 CORS(app, resources={r'/*': {'origins': 'http://localhost:3000'}})
 
 # Get blockchain
-existing_blockchain_path = "local_blockchain.txt"
-local_blockchain = try_retrieve_local_blockchain(existing_blockchain_path)
-blockchain = Blockchain(local_blockchain.chain, existing_blockchain_path)
+# Blocks are kept in an append-only block store. A chain saved as a single JSON file by older versions is migrated
+blockchain = try_retrieve_local_blockchain("local_blockchain", "local_blockchain.txt")
 transaction_pool = TransactionPool()
+# The pool drops the transactions of every block added to the chain, and takes back those of orphaned blocks
+blockchain.add_listener(transaction_pool.update_for_blocks)
 
 # Get wallet
 private_key = retrieve_or_create_new_private_key("sebcoin_private_key.txt")
 wallet = Wallet(blockchain, private_key)
 
+# Background miner, started and stopped through the /miner routes
+miner = Miner(blockchain, transaction_pool, wallet)
+
 
 ROOT_PORT = 5000
 PORT = ROOT_PORT
@@ -44,11 +52,42 @@ local_tunnel_app_runner.run_local_tunnel_on_separate_thread()
 tunnel_url = local_tunnel_app_runner.tunnel_url
 
 # Instantiate pubsub with the tunnel url, blockchain and transaction pool
-pubsub = PubSub(blockchain, transaction_pool, tunnel_url)
+pubsub = PubSub(blockchain, transaction_pool, tunnel_url, miner)
+miner.pubsub = pubsub
 sleep(2)  # wait for localtunnel connection to be done
 pubsub.broadcast_new_connection(tunnel_url)
 
 
+def chain_response(etag, build_body):
+    """
+    JSON response of a chain endpoint, or 304 Not Modified if the client already has the version of the ETag
+    :param etag:
+    :param build_body: builds the encoded JSON body, only called when the body is sent
+    :return:
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(build_body(), mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+
+def int_arg(name, default=None) -> int:
+    """
+    Integer query parameter of the request
+    :param name:
+    :param default: value when the parameter is missing. Without a default, the parameter is required
+    :return:
+    :raise: Exception if the parameter is missing or not an integer
+    """
+    value = request.args.get(name, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Exception(f'Invalid {name} parameter {value}')
+
+
 @app.route('/')
 def route_default():
     return 'Welcome to the Blockchain Seb!'
@@ -56,16 +95,84 @@ def route_default():
 
 @app.route('/blockchain')
 def route_blockchain():
-    return jsonify(blockchain.to_json())
+    with blockchain.lock:
+        return chain_response(chain_etag(blockchain.chain[-1].hash), blockchain.to_json_bytes)
+
+
+def blocks_stream_response(start_height):
+    """
+    Stream the blocks from the height to the tip, one block per line (NDJSON), written as the blocks are read
+    :param start_height:
+    :return:
+    """
+    def generate_blocks():
+        height = start_height
+        while True:
+            with blockchain.lock:
+                if height >= len(blockchain.chain):
+                    return
+                block_json = blockchain.block_json_bytes(height)
+            yield block_json + b'\n'
+            height += 1
+
+    return Response(generate_blocks(), mimetype='application/x-ndjson')
+
+
+@app.route('/blockchain/stream')
+def route_blockchain_stream():
+    return blocks_stream_response(0)
+
+
+@app.route('/blockchain/headers')
+def route_blockchain_headers():
+    # http://localhost:5000/blockchain/headers?start=0&end=100
+    try:
+        start = int_arg('start', 0)
+        end = int_arg('end', start + HEADERS_LIMIT)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(blockchain.headers(start, end))
+
+
+@app.route('/blockchain/after/<block_hash>')
+def route_blockchain_after(block_hash):
+    # Blocks after the block with the hash, streamed like /blockchain/stream
+    height = blockchain.height_of(block_hash)
+    if height is None:
+        return jsonify({'error': f'Unknown block {block_hash}'}), 404
+
+    return blocks_stream_response(height + 1)
 
 
 @app.route('/blockchain/range')
 def route_blockchain_range():
     # http://localhost:5000/blockchain/range?start=2&end=5
-    start = int(request.args.get('start'))
-    end = int(request.args.get('end'))
+    # http://localhost:5000/blockchain/range?limit=20&cursor=<next_cursor of the previous page>
+    try:
+        limit = int_arg('limit', BLOCKCHAIN_RANGE_LIMIT)
+        if 'start' in request.args:
+            start = int_arg('start')
+            end = int_arg('end')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    with blockchain.lock:
+        etag = chain_etag(blockchain.chain[-1].hash, request.query_string.decode('utf-8'))
+
+        if 'start' in request.args:
+            heights = newest_first_heights(len(blockchain.chain), start, end, limit)
+            return chain_response(etag, lambda: blockchain.to_json_bytes(heights))
 
-    return jsonify(blockchain.to_json()[::-1][start:end])
+        try:
+            heights, next_cursor = page_heights(blockchain.chain, request.args.get('cursor'), limit)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+
+        return chain_response(etag, lambda: (
+            b'{"blocks": ' + blockchain.to_json_bytes(heights) +
+            b', "next_cursor": ' + json.dumps(next_cursor).encode('utf-8') + b'}'
+        ))
 
 
 @app.route('/blockchain/length')
@@ -80,27 +187,59 @@ def route_blockchain_mine():
     mining_reward = Transaction.reward_transaction(wallet)
     transaction_data.append(mining_reward.to_json())
 
-    # add_block calls the mine method
-    blockchain.add_block(transaction_data)
+    # add_block calls the mine method. The background miner or a peer may extend the tip first
+    try:
+        resulting_block = blockchain.add_block(transaction_data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 409
 
-    resulting_block = blockchain.chain[-1]
+    # The transactions of the block have been removed from the transaction pool as the block was added
     pubsub.broadcast_block(resulting_block)
-    # After the transaction has been added to the blockchain,
-    # then remove all transactions already on the blockchain from the transaction pool
-    transaction_pool.clear_blockchain_transactions(blockchain)
 
     return jsonify(resulting_block.to_json())
 
 
+@app.route('/miner/start', methods=['POST'])
+def route_miner_start():
+    miner.start()
+    return jsonify(miner.status())
+
+
+@app.route('/miner/stop', methods=['POST'])
+def route_miner_stop():
+    miner.stop()
+    return jsonify(miner.status())
+
+
+@app.route('/miner/status')
+def route_miner_status():
+    return jsonify(miner.status())
+
+
 @app.route('/known-addresses')
 def route_known_addresses():
-    known_addresses = set()
+    return jsonify(blockchain.known_addresses())
+
+
+@app.route('/transaction/<transaction_id>')
+def route_transaction(transaction_id):
+    transaction = blockchain.find_transaction(transaction_id)
+    if transaction is None:
+        return jsonify({'error': f'Unknown transaction {transaction_id}'}), 404
 
-    for block in blockchain.chain:
-        for transaction in block.data:
-            known_addresses.update(transaction['output'].keys())
+    return jsonify(transaction)
 
-    return jsonify(list(known_addresses))
+
+@app.route('/address/<address>/transactions')
+def route_address_transactions(address):
+    # http://localhost:5000/address/<address>/transactions?limit=20&cursor=<next_cursor of the previous page>
+    try:
+        limit = int_arg('limit', ADDRESS_TRANSACTIONS_LIMIT)
+        transactions, next_cursor = blockchain.address_transactions(address, request.args.get('cursor'), limit)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'transactions': transactions, 'next_cursor': next_cursor})
 
 
 # This sync should ever be triggered upon connection
@@ -109,24 +248,22 @@ def route_peer_sync_chain():
     peer_url = request.get_json()['peer_url']
     # Sync chain
     # All peers that are connecting should be able to see the current state of the blockchain
-    # Get the blockchain of peers upon connecting
-    result = requests.get(f'{peer_url}/blockchain')
-    if not result.ok:
-        return jsonify(result.json()) # return if the response is a failure
-    print(f'Result blockchain on the main APP node: {result.json()}')
-    result_blockchain = Blockchain.from_json(result.json())
-
     # The connected peers should be able to replace the existing chain with their own chain on their own machine
     # Which is contained by the 'Blockchain' instance
     # As a result, the node that just has connected, should be synchronised with the remaining chains on the network
+    # Headers are compared first, so only the blocks missing from the local chain are downloaded
+    tip_hash = blockchain.chain[-1].hash
     try:
-        blockchain.replace_chain(result_blockchain.chain)
-        blockchain.save_to_file()
-        print(f'\n -- Successfully synced the new chain')
+        blocks_added = HeadersFirstSync(blockchain, HttpPeer(peer_url)).sync()
+        print(f'\n -- Successfully synced the new chain, {blocks_added} blocks added')
     except Exception as e:
         print(f'\n -- Error synchronising the new chain: {e}')
 
-    return jsonify(blockchain.to_json())
+    # A sync that fails part way may still have switched to a longer valid prefix of the peer chain
+    if blockchain.chain[-1].hash != tip_hash:
+        miner.restart()
+
+    return jsonify({'length': len(blockchain.chain), 'tip_hash': blockchain.chain[-1].hash})
 
 
 @app.route('/wallet/transact', methods=['POST'])
@@ -134,10 +271,15 @@ def route_wallet_transact():
     transaction_data = request.get_json()
 
     transaction = transaction_pool.existing_transaction(wallet.address)
-    if transaction:
-        transaction.update(wallet, transaction_data['recipient'], transaction_data['amount'])
-    else:
-        transaction = Transaction(wallet, transaction_data['recipient'], transaction_data['amount'])
+    try:
+        if transaction:
+            transaction_pool.update_transaction(
+                transaction, wallet, transaction_data['recipient'], transaction_data['amount']
+            )
+        else:
+            transaction = Transaction(wallet, transaction_data['recipient'], transaction_data['amount'])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
 
     pubsub.broadcast_transaction(transaction)
     return jsonify(transaction.to_json())
@@ -153,6 +295,15 @@ def route_wallet_info():
     return jsonify({'address': wallet.address, 'balance': wallet.balance})
 
 
+@app.route('/stats')
+def route_stats():
+    return jsonify({
+        'signature_cache': SIGNATURE_CACHE.stats(),
+        'public_key_cache': PUBLIC_KEY_CACHE.stats(),
+        'transaction_pool': transaction_pool.stats()
+    })
+
+
 # Run the app with the specified port
 local_tunnel_app_runner.run_app()
 
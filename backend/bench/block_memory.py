@@ -0,0 +1,86 @@
+"""
+Benchmark of the memory used by the blocks of a loaded chain, with the __slots__ Block against a Block that keeps
+its fields in a per instance __dict__, like Block did before.
+Blocks are loaded from their JSON text, like they are from the block store. Measured with tracemalloc.
+
+Run with:
+    python -m backend.bench.block_memory
+    python -m backend.bench.block_memory --blocks 100000
+"""
+import argparse
+import hashlib
+import json
+import time
+import tracemalloc
+
+from backend.blockchain.block import Block
+from backend.config import SECONDS
+
+
+class DictBlock:
+    """
+    Block with its fields in a __dict__, for comparison
+    """
+
+    def __init__(self, timestamp, last_hash, hash, data, difficulty, nonce, version=1):
+        self.timestamp = timestamp
+        self.last_hash = last_hash
+        self.hash = hash
+        self.data = data
+        self.difficulty = difficulty
+        self.nonce = nonce
+        self.version = version
+
+
+def synthetic_block_json(count):
+    """
+    JSON text of a chain of count blocks without transactions, generated one block at a time
+    :param count:
+    :return: generator of JSON strings
+    """
+    last_hash = 'genesis_hash'
+    for height in range(count):
+        hash = hashlib.sha256(str(height).encode('utf-8')).hexdigest()
+        yield json.dumps({
+            'timestamp': 1_700_000_000_000_000_000 + height * 4_000_000_000,
+            'last_hash': last_hash,
+            'hash': hash,
+            'data': [],
+            'difficulty': 20,
+            'nonce': height * 7919,
+            'version': 2
+        })
+        last_hash = hash
+
+
+def measure(block_class, count):
+    """
+    :return: bytes per block and seconds to load the blocks
+    """
+    tracemalloc.start()
+    start = time.time_ns()
+    blocks = [block_class(**json.loads(block_json)) for block_json in synthetic_block_json(count)]
+    seconds = (time.time_ns() - start) / SECONDS
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del blocks
+    return size / count, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory used by __dict__ and __slots__ blocks')
+    parser.add_argument('--blocks', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    dict_bytes, dict_seconds = measure(DictBlock, args.blocks)
+    slots_bytes, slots_seconds = measure(Block, args.blocks)
+
+    print(f'{"block":<10}{"bytes/block":>14}{"load seconds":>14}')
+    print(f'{"__dict__":<10}{dict_bytes:>14.1f}{dict_seconds:>14.2f}')
+    print(f'{"__slots__":<10}{slots_bytes:>14.1f}{slots_seconds:>14.2f}')
+    print(f'memory: {100 * (slots_bytes - dict_bytes) / dict_bytes:+.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark of syncing with a peer that is a few blocks ahead, downloading the peer's whole chain as NDJSON against
+the headers-first sync, which finds the fork point from headers and downloads only the missing blocks.
+Both peers run in process and count the bytes they send, as a stand-in for the bytes on the wire.
+
+Run with:
+    python -m backend.bench.delta_sync
+    python -m backend.bench.delta_sync --blocks 20000 --ahead 5
+"""
+import argparse
+import json
+import time
+
+from backend.blockchain.block import Block
+from backend.blockchain.block_header import CURRENT_HEADER_VERSION, header_hash
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.chain_sync import ChainSync
+from backend.blockchain.headers_sync import HeadersFirstSync
+from backend.blockchain.mining import MiningEngine
+from backend.blockchain.proof_of_work import meets_difficulty
+from backend.config import MINE_RATE, SECONDS
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+class SteadyMiningEngine(MiningEngine):
+    """
+    Mines every block exactly MINE_RATE after the last one, so the difficulty settles at its minimum and a long
+    valid chain is mined in seconds
+    """
+    name = 'steady'
+
+    def search(self, last_block, stop_event=None):
+        timestamp = last_block.timestamp + MINE_RATE
+        difficulty = Block.adjust_difficulty(last_block, timestamp)
+        nonce = 0
+        while True:
+            hash = header_hash(CURRENT_HEADER_VERSION, timestamp, last_block.hash, difficulty, nonce)
+            if meets_difficulty(hash, difficulty):
+                return timestamp, nonce, difficulty, hash
+            nonce += 1
+
+
+class CountingPeer:
+    """
+    Chain endpoints of a peer, served from a blockchain in the same process, counting the bytes sent
+    """
+
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self.bytes_sent = 0
+
+    def length(self):
+        return len(self.blockchain.chain)
+
+    def headers(self, start, end):
+        body = json.dumps(self.blockchain.headers(start, end)).encode('utf-8')
+        self.bytes_sent += len(body)
+        return json.loads(body)
+
+    def blocks_after(self, block_hash):
+        return self.blocks_from(self.blockchain.height_of(block_hash) + 1)
+
+    def blocks_from(self, start_height):
+        for height in range(start_height, len(self.blockchain.chain)):
+            line = self.blockchain.block_json_bytes(height) + b'\n'
+            self.bytes_sent += len(line)
+            yield Block.from_json(json.loads(line))
+
+
+def full_sync(chain, peer):
+    """
+    Download the whole peer chain as NDJSON and sync with it, as the sync route did before headers-first sync
+    """
+    ChainSync(Blockchain(chain[:])).sync(peer.blocks_from(0))
+
+
+def headers_first_sync(chain, peer):
+    HeadersFirstSync(Blockchain(chain[:]), peer).sync()
+
+
+def measure(sync, chain, peer_blockchain):
+    peer = CountingPeer(peer_blockchain)
+    start = time.time_ns()
+    sync(chain, peer)
+    return peer.bytes_sent, (time.time_ns() - start) / SECONDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare full chain sync with headers-first delta sync')
+    parser.add_argument('--blocks', type=int, default=5000)
+    parser.add_argument('--ahead', type=int, default=3)
+    args = parser.parse_args()
+
+    miner_wallet = Wallet()
+    blockchain = Blockchain(mining_engine=SteadyMiningEngine())
+    for _ in range(args.blocks + args.ahead - 1):
+        blockchain.add_block([Transaction.reward_transaction(miner_wallet).to_json()])
+    chain = blockchain.chain[:args.blocks]
+
+    full_bytes, full_seconds = measure(full_sync, chain, blockchain)
+    delta_bytes, delta_seconds = measure(headers_first_sync, chain, blockchain)
+
+    print(f'Local chain of {len(chain)} blocks, peer {args.ahead} blocks ahead')
+    print(f'{"sync":<14}{"bytes":>14}{"seconds":>10}')
+    print(f'{"full chain":<14}{full_bytes:>14}{full_seconds:>10.2f}')
+    print(f'{"headers-first":<14}{delta_bytes:>14}{delta_seconds:>10.2f}')
+    print(f'bytes: {100 * (delta_bytes - full_bytes) / full_bytes:+.1f}%')
+
+
+if __name__ == '__main__':
+    main()
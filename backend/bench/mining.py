@@ -0,0 +1,111 @@
+"""
+Hashrate benchmark of the mining engines.
+
+Run with:
+    python -m backend.bench.mining
+    python -m backend.bench.mining --engines batched multiprocess --difficulties 12 16 --blocks 5 --workers 4
+"""
+import argparse
+import os
+import time
+
+from backend.blockchain.block import Block
+from backend.blockchain.mining import MINING_ENGINES, BatchedMiningEngine, MultiprocessMiningEngine
+from backend.config import MINING_WORKERS, SECONDS
+from backend.util.crypto_hash import crypto_hash
+
+
+def cpu_seconds():
+    """
+    CPU time used by this process
+    """
+    times = os.times()
+    return times.user + times.system
+
+
+def children_cpu_seconds():
+    """
+    CPU time used by the finished child processes of this process (the multiprocess engine's workers)
+    """
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def create_engine(name, workers):
+    if name == MultiprocessMiningEngine.name:
+        return MultiprocessMiningEngine(workers)
+    if name == BatchedMiningEngine.name:
+        return BatchedMiningEngine()
+    return MINING_ENGINES[name]()
+
+
+def benchmark_engine(engine, difficulty, blocks):
+    """
+    Mine blocks at the given difficulty and measure the hashrate.
+    Each block is mined on a fresh last block one difficulty below, so that the mined block lands on the difficulty
+    (as long as it is found within MINE_RATE).
+    Nonces are tried in increasing order (strided across workers), so nonce + 1 is the number of hashes tried.
+    :return: dict of results
+    """
+    hashes = 0
+    wall_time = 0
+    cpu_time = 0
+    mined_difficulties = []
+    start_children_cpu = children_cpu_seconds()
+
+    for i in range(blocks):
+        last_block = Block(
+            timestamp=time.time_ns(),
+            last_hash='bench',
+            hash=crypto_hash('bench', difficulty, i),
+            data=[],
+            difficulty=difficulty - 1,
+            nonce=0
+        )
+
+        start_cpu = cpu_seconds()
+        start = time.time_ns()
+        block = engine.mine(last_block, [])
+        wall_time += time.time_ns() - start
+        cpu_time += cpu_seconds() - start_cpu
+
+        hashes += block.nonce + 1
+        mined_difficulties.append(block.difficulty)
+
+    # The CPU time of worker processes is only counted once they have finished
+    engine.close()
+    cpu_time += children_cpu_seconds() - start_children_cpu
+    wall_seconds = wall_time / SECONDS
+    return {
+        'engine': engine.name,
+        'difficulty': difficulty,
+        'mined_difficulty': min(mined_difficulties),
+        'hashes_per_second': hashes / wall_seconds if wall_seconds else 0,
+        'seconds_per_block': wall_seconds / blocks,
+        'cpu_percent': 100 * cpu_time / wall_seconds if wall_seconds else 0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hashrate of the mining engines')
+    parser.add_argument('--engines', nargs='+', default=list(MINING_ENGINES), choices=list(MINING_ENGINES))
+    parser.add_argument('--difficulties', nargs='+', type=int, default=[8, 12, 16])
+    parser.add_argument('--blocks', type=int, default=3, help='blocks mined per engine and difficulty')
+    parser.add_argument('--workers', type=int, default=max(MINING_WORKERS, os.cpu_count() or 1),
+                        help='worker processes of the multiprocess engine')
+    args = parser.parse_args()
+
+    print(f'{"engine":<14}{"difficulty":>11}{"hashes/s":>14}{"s/block":>10}{"cpu %":>8}')
+    for difficulty in args.difficulties:
+        for name in args.engines:
+            result = benchmark_engine(create_engine(name, args.workers), difficulty, args.blocks)
+            note = '' if result['mined_difficulty'] == difficulty else \
+                f'  (slower than MINE_RATE, mined at difficulty {result["mined_difficulty"]})'
+            print(
+                f'{result["engine"]:<14}{difficulty:>11}{result["hashes_per_second"]:>14,.0f}'
+                f'{result["seconds_per_block"]:>10.3f}{result["cpu_percent"]:>8.0f}{note}'
+            )
+
+
+if __name__ == '__main__':
+    main()
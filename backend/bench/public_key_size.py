@@ -0,0 +1,54 @@
+"""
+Report of the serialised chain size with the legacy PEM public keys in the transaction inputs,
+against the compact compressed point public keys.
+
+Run with:
+    python -m backend.bench.public_key_size
+    python -m backend.bench.public_key_size --blocks 200 --transactions 4
+"""
+import argparse
+import json
+
+from backend.bench.validation import synthetic_chain
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+def legacy_block_json(block):
+    """
+    Serialise a block as it would have been stored before compact inputs: PEM public keys and no input version
+    :param block:
+    :return:
+    """
+    block_json = block.to_json()
+    data = []
+    for transaction_json in block_json['data']:
+        transaction = Transaction.from_json(transaction_json)
+        if 'version' in transaction.input:
+            transaction.input = dict(transaction.input)
+            transaction.input['public_key'] = Wallet.pem_public_key(transaction.input['public_key'])
+            del transaction.input['version']
+        data.append(transaction.to_json())
+    return {**block_json, 'data': data}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the chain size with legacy and compact public keys')
+    parser.add_argument('--blocks', type=int, default=100)
+    parser.add_argument('--transactions', type=int, default=2, help='transactions per block, besides the reward')
+    args = parser.parse_args()
+
+    chain = synthetic_chain(args.blocks, args.transactions)
+    transactions = sum(len(block.data) for block in chain[1:])
+
+    legacy_size = len(json.dumps([legacy_block_json(block) for block in chain]).encode('utf-8'))
+    compact_size = len(json.dumps([block.to_json() for block in chain]).encode('utf-8'))
+
+    print(f'{"inputs":<10}{"chain bytes":>14}{"bytes/transaction":>20}')
+    print(f'{"legacy":<10}{legacy_size:>14}{legacy_size / transactions:>20.1f}')
+    print(f'{"compact":<10}{compact_size:>14}{compact_size / transactions:>20.1f}')
+    print(f'chain size: {100 * (compact_size - legacy_size) / legacy_size:+.1f}%')
+
+
+if __name__ == '__main__':
+    main()
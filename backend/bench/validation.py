@@ -0,0 +1,61 @@
+"""
+Benchmark of transaction chain validation time against chain length.
+
+Run with:
+    python -m backend.bench.validation
+    python -m backend.bench.validation --lengths 100 200 400 800 --transactions 4
+"""
+import argparse
+import random
+import time
+
+from backend.blockchain.block import Block
+from backend.blockchain.blockchain import Blockchain
+from backend.config import SECONDS
+from backend.util.crypto_hash import crypto_hash
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+def synthetic_chain(length, transactions_per_block, wallets=20, seed=0):
+    """
+    Build a chain of valid transactions. Transaction validation does not look at the proof of work,
+    so the blocks are not mined
+    :return: list of blocks
+    """
+    rng = random.Random(seed)
+    blockchain = Blockchain()
+    wallets = [Wallet(blockchain) for _ in range(wallets)]
+
+    for height in range(1, length):
+        transactions = []
+        for sender in rng.sample(wallets, transactions_per_block):
+            recipient = rng.choice([wallet for wallet in wallets if wallet is not sender])
+            transactions.append(Transaction(sender, recipient.address, rng.randint(1, 5)).to_json())
+        transactions.append(Transaction.reward_transaction(rng.choice(wallets)).to_json())
+
+        last_block = blockchain.chain[-1]
+        blockchain.chain.append(Block(height, last_block.hash, crypto_hash(height), transactions, 1, 0))
+
+    return blockchain.chain
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark transaction chain validation against chain length')
+    parser.add_argument('--lengths', nargs='+', type=int, default=[100, 200, 400, 800])
+    parser.add_argument('--transactions', type=int, default=2, help='transactions per block, besides the reward')
+    args = parser.parse_args()
+
+    print(f'{"blocks":>8}{"seconds":>10}{"ms/block":>10}')
+    for length in args.lengths:
+        chain = synthetic_chain(length, args.transactions)
+
+        start = time.time_ns()
+        Blockchain.is_valid_transaction_chain(chain)
+        seconds = (time.time_ns() - start) / SECONDS
+
+        print(f'{length:>8}{seconds:>10.3f}{1000 * seconds / length:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
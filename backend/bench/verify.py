@@ -0,0 +1,54 @@
+"""
+Microbenchmark of the signature verification path, with and without the parsed public key cache.
+Every verified signature is distinct, so the verified signature cache never hits.
+
+Run with:
+    python -m backend.bench.verify
+    python -m backend.bench.verify --signatures 2000 --keys 5
+"""
+import argparse
+import time
+
+from backend.config import MICROSECONDS
+from backend.wallet.wallet import PUBLIC_KEY_CACHE, SIGNATURE_CACHE, Wallet
+
+
+def time_verify(signatures, clear_public_key_cache):
+    """
+    :return: average microseconds per Wallet.verify call
+    """
+    SIGNATURE_CACHE.clear()
+    PUBLIC_KEY_CACHE.clear()
+
+    start = time.time_ns()
+    for public_key, data, signature in signatures:
+        if clear_public_key_cache:
+            PUBLIC_KEY_CACHE.clear()
+        assert Wallet.verify(public_key, data, signature)
+    return (time.time_ns() - start) / MICROSECONDS / len(signatures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Wallet.verify with and without the public key cache')
+    parser.add_argument('--signatures', type=int, default=1000)
+    parser.add_argument('--keys', type=int, default=10, help='number of distinct signing wallets')
+    args = parser.parse_args()
+
+    wallets = [Wallet() for _ in range(args.keys)]
+    signatures = []
+    for i in range(args.signatures):
+        wallet = wallets[i % len(wallets)]
+        data = {'recipient': i, wallet.address: 1000 - i}
+        signatures.append((wallet.public_key, data, wallet.sign(data)))
+
+    uncached = time_verify(signatures, clear_public_key_cache=True)
+    cached = time_verify(signatures, clear_public_key_cache=False)
+
+    print(f'{"public key cache":<20}{"us/verify":>12}')
+    print(f'{"off":<20}{uncached:>12.1f}')
+    print(f'{"on":<20}{cached:>12.1f}')
+    print(f'speedup: {uncached / cached:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,20 @@
+import copy
+import json
+import multiprocessing
+import sys
+import threading
 import time
-from backend.util.crypto_hash import crypto_hash
-from backend.util.hex_to_binary import hex_to_binary
+from backend.blockchain.block_header import (
+    CURRENT_HEADER_VERSION,
+    HEADER_VERSIONS,
+    LEGACY_HEADER_VERSION,
+    header_hash,
+    header_prefix,
+    prefixed_header_digest
+)
+from backend.blockchain.proof_of_work import difficulty_to_target, digest_meets_target, meets_difficulty
 from backend.config import MINE_RATE
+from backend.wallet.parsed_transaction import ParsedTransaction
 
 GENESIS_DATA = {
     'timestamp': 1,
@@ -12,51 +25,95 @@ GENESIS_DATA = {
     'nonce': 'genesis_nonce'
 }
 
+# How many nonces are tried between checks of whether mining should stop
+STOP_CHECK_INTERVAL = 1000
+# How often a parallel search checks whether it was asked to stop, in seconds
+STOP_POLL_INTERVAL = 0.05
+
+# Set in each worker process of a parallel search, so the remaining workers can be stopped once one succeeds
+_worker_stop_event = None
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
 
 class Block:
     """
     Unit of storage.
     Store transactions in a blockchain that supports cryptocurrency
     """
-    def __init__(self, timestamp, last_hash, hash, data: list, difficulty, nonce):
+    # Fields in the order of the JSON representation. Slots instead of a per block __dict__ keep long chains compact
+    FIELDS = ('timestamp', 'last_hash', 'hash', 'data', 'difficulty', 'nonce', 'version')
+    # Fields the hash and the proof of work are checked against, everything but the data
+    HEADER_FIELDS = ('timestamp', 'last_hash', 'hash', 'difficulty', 'nonce', 'version')
+    __slots__ = FIELDS + ('_transactions', '_json_bytes')
+
+    def __init__(self, timestamp, last_hash, hash, data: list, difficulty, nonce, version=LEGACY_HEADER_VERSION):
         self.timestamp = timestamp
-        self.last_hash = last_hash
-        self.hash = hash
+        # Interned, so the last_hash of a block shares the string of the hash of the block before it
+        self.last_hash = _intern(last_hash)
+        self.hash = _intern(hash)
         self.data: list = data
         self.difficulty = difficulty
         self.nonce = nonce
+        self.version = version  # how the hash is built from the header fields, see block_header
+        self._transactions = None
+        self._json_bytes = None
 
     def __repr__(self):
         return (
             'Block('
-            f'{self.__dict__})'
+            f'{self.to_json()})'
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, Block) and all(
+            getattr(self, field) == getattr(other, field) for field in Block.FIELDS
         )
 
+    def __hash__(self):
+        # Equal blocks have equal hash fields
+        return hash(self.hash)
+
+    @property
+    def transactions(self) -> tuple[ParsedTransaction, ...]:
+        """
+        The transactions of the block data, parsed the first time they are used, which is when the block is accepted.
+        The data must not be changed once its transactions are parsed
+        :return:
+        """
+        if self._transactions is None:
+            self._transactions = tuple(ParsedTransaction(transaction_json) for transaction_json in self.data)
+        return self._transactions
+
     @staticmethod
-    def mine_block(last_block, data: list):
+    def mine_block(last_block, data: list, workers: int = 1, stop_event=None, search_pool=None):
         """
         Mine a block based on the given last_block and data. Until a block hash is found that meets
         the leading 0's proof of work requirement
         :param last_block: needed to retrieve last hash
         :param data: data of the block
-        :return: a new block
-        """
-        timestamp = time.time_ns()
-        last_hash = last_block.hash
-        difficulty = last_block.difficulty
-        nonce = 0  # nonce is just a one time number that we will modify to get the hash result we require
-        hash = crypto_hash(timestamp, last_hash, difficulty, nonce)
-
-        # Algorithm checking the number of leading zeros is the same as the difficulty number
-        while hex_to_binary(hash)[0:difficulty] != '0' * difficulty:
-            nonce += 1
-            timestamp = time.time_ns()  # doesn't the timestamp here make the mining a bit more difficult?
-            difficulty = Block.adjust_difficulty(last_block, timestamp)
-            # reassign the hash and repeat the process until we find the number of 0's required
-            hash = crypto_hash(timestamp, last_hash, difficulty, nonce)
+        :param workers: number of processes to split the nonce search across
+        :param stop_event: threading.Event that aborts mining when set
+        :param search_pool: NonceSearchPool to search with. Defaults to the shared pool of the number of workers
+        :return: a new block, or None if mining was aborted
+        """
+        if search_pool is None and workers > 1:
+            search_pool = NonceSearchPool.shared(workers)
+
+        if search_pool is not None:
+            result = search_pool.search(last_block, stop_event)
+        else:
+            result = _search_nonces(last_block, stop_event=stop_event)
+
+        if result is None:
+            return None
+
+        timestamp, nonce, difficulty, hash = result
 
         # Return the new block with the adjusted difficulty, correspondingly adjusted hash, and other values
-        return Block(timestamp, last_hash, hash, data, difficulty, nonce)
+        return Block(timestamp, last_block.hash, hash, data, difficulty, nonce, CURRENT_HEADER_VERSION)
 
     @staticmethod
     def adjust_difficulty(last_block, new_timestamp):
@@ -85,31 +142,77 @@ class Block:
         :param last_block:
         :param block:
         """
+        if block.version not in HEADER_VERSIONS:
+            raise Exception(f"Unknown block header version {block.version}")
 
         if block.last_hash != last_block.hash:
             raise Exception("The block last_hash must be the same as the hash of the previous block!")
 
-        if hex_to_binary(block.hash)[0:block.difficulty] != '0' * block.difficulty:
+        if not meets_difficulty(block.hash, block.difficulty):
             raise Exception("The proof of work requirement was not met! Number of leading zeroes do not match difficulty")
 
         if abs(last_block.difficulty - block.difficulty) > 1:
             raise Exception("The block difficulty must only adjust by 1")
 
-        reconstructed_hash = crypto_hash(
-            block.timestamp,
-            block.last_hash,
-            block.nonce,
-            block.difficulty
-        )
+        try:
+            reconstructed_hash = header_hash(
+                block.version,
+                block.timestamp,
+                block.last_hash,
+                block.difficulty,
+                block.nonce
+            )
+        except ValueError:
+            reconstructed_hash = None  # fields that cannot be encoded never reconstruct the hash
+
         if block.hash != reconstructed_hash:
             raise Exception("The reconstructed hash is not correct!")
 
     def to_json(self):
         """
-        Serialise the block into a dictionary of its attributes
+        Serialise the block into a new dictionary of its attributes.
+        The dictionary, its data list and the transactions in it are copies, so changing them does not change the block
+        :return:
+        """
+        return self._json_fields(copy.deepcopy(self.data))
+
+    def _json_fields(self, data: list) -> dict:
+        return {
+            'timestamp': self.timestamp,
+            'last_hash': self.last_hash,
+            'hash': self.hash,
+            'data': data,
+            'difficulty': self.difficulty,
+            'nonce': self.nonce,
+            'version': self.version
+        }
+
+    def to_json_bytes(self) -> bytes:
+        """
+        The block serialised and encoded as JSON, cached once encoded, so chain responses are built by joining
+        the bytes of their blocks. The block must not be changed once encoded
         :return:
         """
-        return self.__dict__
+        if self._json_bytes is None:
+            self._json_bytes = json.dumps(self._json_fields(self.data)).encode('utf-8')
+        return self._json_bytes
+
+    def header(self) -> dict:
+        """
+        Serialise the header fields of the block, enough to check its hash, its proof of work and how it links to
+        the block before it, without its transactions
+        :return:
+        """
+        return {field: getattr(self, field) for field in Block.HEADER_FIELDS}
+
+    @staticmethod
+    def from_header(header: dict):
+        """
+        Deserialise a block header into a block without data, that can be validated with is_valid_block
+        :param header:
+        :return:
+        """
+        return Block(data=[], **{field: header[field] for field in Block.HEADER_FIELDS})
 
     @staticmethod
     def from_json(block_json):
@@ -129,6 +232,118 @@ class Block:
         return Block(**GENESIS_DATA)
 
 
+def _init_mining_worker(stop_event):
+    global _worker_stop_event
+    _worker_stop_event = stop_event
+
+
+def _search_nonces(last_block, first_nonce=0, step=1, stop_event=None):
+    """
+    Try the nonces first_nonce, first_nonce + step, first_nonce + 2 * step... until a hash is found that meets
+    the leading 0's proof of work requirement
+    :param last_block: needed to retrieve last hash and to adjust the difficulty
+    :param first_nonce: the first nonce to try
+    :param step: distance between two tried nonces, so that parallel workers never try the same nonce
+    :param stop_event: event that stops the search when set
+    :return: (timestamp, nonce, difficulty, hash) of the found hash, or None if the search was stopped
+    """
+    last_hash = last_block.hash
+    nonce = first_nonce  # nonce is just a one time number that we will modify to get the hash result we require
+    attempts = 0
+    target_difficulty = None
+    target = None
+    prefix = None
+
+    while True:
+        timestamp = time.time_ns()  # doesn't the timestamp here make the mining a bit more difficult?
+        difficulty = Block.adjust_difficulty(last_block, timestamp)
+        if difficulty != target_difficulty:
+            target_difficulty = difficulty
+            target = difficulty_to_target(difficulty)
+            prefix = header_prefix(last_hash, difficulty)
+        digest = prefixed_header_digest(prefix, timestamp, nonce)
+
+        # A hash below the target has at least as many leading zero bits as the difficulty number
+        if digest_meets_target(digest, target):
+            return timestamp, nonce, difficulty, digest.hex()
+
+        nonce += step
+        attempts += 1
+        if attempts % STOP_CHECK_INTERVAL == 0 and stop_event is not None and stop_event.is_set():
+            return None
+
+
+def _search_nonce_slice(args):
+    return _search_nonces(*args, stop_event=_worker_stop_event)
+
+
+class NonceSearchPool:
+    """
+    Pool of worker processes that split the nonce search of a block between them.
+    The processes are started once and reused for every block, so their start up cost is not paid on each block.
+    Worker i tries the nonces i, i + workers, ... The first worker to find a valid hash wins,
+    and the remaining workers are told to stop
+    """
+    # Pools shared by the blocks mined without a pool of their own, by number of workers
+    _shared_pools = {}
+    _shared_pools_lock = threading.Lock()
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # Inherited by the workers when they start, set to stop the current search and cleared before the next one
+        self.worker_stop_event = multiprocessing.Event()
+        self.pool = multiprocessing.Pool(workers, initializer=_init_mining_worker, initargs=(self.worker_stop_event,))
+        # One search at a time, as all the workers take part in every search
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def shared(workers: int):
+        """
+        The pool shared by the blocks mined with the number of workers, started the first time it is needed
+        :param workers:
+        :return:
+        """
+        with NonceSearchPool._shared_pools_lock:
+            if workers not in NonceSearchPool._shared_pools:
+                NonceSearchPool._shared_pools[workers] = NonceSearchPool(workers)
+            return NonceSearchPool._shared_pools[workers]
+
+    def search(self, last_block, stop_event=None):
+        """
+        Search for a hash meeting the proof of work requirement, on all the workers
+        :param last_block:
+        :param stop_event: threading.Event of the calling process that stops the search when set
+        :return: (timestamp, nonce, difficulty, hash) of the first found hash, or None if the search was stopped
+        """
+        with self.lock:
+            self.worker_stop_event.clear()
+            slices = [(last_block, first_nonce, self.workers) for first_nonce in range(self.workers)]
+            results = self.pool.imap_unordered(_search_nonce_slice, slices)
+
+            try:
+                while True:
+                    try:
+                        result = results.next(timeout=STOP_POLL_INTERVAL)
+                    except multiprocessing.TimeoutError:
+                        if stop_event is not None and stop_event.is_set():
+                            return None
+                        continue
+
+                    if result:
+                        return result
+            finally:
+                # Wait for every worker to stop, so none is still searching when the event is cleared for the next block
+                self.worker_stop_event.set()
+                for _ in results:
+                    pass
+
+    def close(self):
+        """
+        Stop the worker processes
+        """
+        self.pool.terminate()
+        self.pool.join()
+
 
 def main():
     genesis_block = Block.genesis()
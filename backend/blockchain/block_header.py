@@ -0,0 +1,89 @@
+import hashlib
+import struct
+
+from backend.util.crypto_hash import crypto_hash
+
+# Blocks without a version were hashed with crypto_hash over the JSON of their header fields
+LEGACY_HEADER_VERSION = 1
+# Blocks hashed over the fixed layout binary header below
+BINARY_HEADER_VERSION = 2
+
+CURRENT_HEADER_VERSION = BINARY_HEADER_VERSION
+HEADER_VERSIONS = (LEGACY_HEADER_VERSION, BINARY_HEADER_VERSION)
+
+# Binary header layout, big endian:
+# version (1 byte) | last_hash (32 bytes) | difficulty (2 bytes) | timestamp (8 bytes) | nonce (8 bytes)
+# The prefix only changes with the last hash and the difficulty, so it is hashed once per mining run
+HEADER_PREFIX = struct.Struct('>B32sH')
+HEADER_SUFFIX = struct.Struct('>QQ')
+
+
+def hash_to_bytes(hash: str) -> bytes:
+    """
+    Encode a block hash into the 32 bytes of the header.
+    Hex hashes are stored as their raw bytes, other hashes (like the genesis hash) as the sha256 digest of their text
+    :param hash:
+    :return:
+    """
+    if len(hash) == 64:
+        try:
+            return bytes.fromhex(hash)
+        except ValueError:
+            pass
+
+    return hashlib.sha256(hash.encode('utf-8')).digest()
+
+
+def header_prefix(last_hash: str, difficulty: int):
+    """
+    Return a sha256 object seeded with the constant prefix of the header.
+    Copy it for every nonce instead of hashing the whole header again
+    :param last_hash:
+    :param difficulty:
+    :return: hashlib sha256 object
+    """
+    return hashlib.sha256(HEADER_PREFIX.pack(BINARY_HEADER_VERSION, hash_to_bytes(last_hash), difficulty))
+
+
+def prefixed_header_digest(prefix, timestamp: int, nonce: int) -> bytes:
+    """
+    Finish hashing a header from a prefix returned by header_prefix
+    :param prefix:
+    :param timestamp:
+    :param nonce:
+    :return: raw sha256 digest
+    """
+    sha256 = prefix.copy()
+    sha256.update(HEADER_SUFFIX.pack(timestamp, nonce))
+    return sha256.digest()
+
+
+def timestamped_header_prefix(prefix, timestamp: int):
+    """
+    Extend a prefix returned by header_prefix with the timestamp, so that only the nonce is left to hash.
+    Used when a batch of nonces is tried with the same timestamp
+    :param prefix:
+    :param timestamp:
+    :return: hashlib sha256 object
+    """
+    sha256 = prefix.copy()
+    sha256.update(timestamp.to_bytes(8, 'big'))
+    return sha256
+
+
+def header_hash(version, timestamp, last_hash, difficulty, nonce) -> str:
+    """
+    Hash the header fields of a block with the scheme of the given header version
+    :raise: ValueError if the version is unknown or the fields cannot be encoded with it
+    :return: hex hash
+    """
+    if version == LEGACY_HEADER_VERSION:
+        return crypto_hash(timestamp, last_hash, difficulty, nonce)
+
+    if version == BINARY_HEADER_VERSION:
+        try:
+            return prefixed_header_digest(header_prefix(last_hash, difficulty), timestamp, nonce).hex()
+        except (struct.error, TypeError, AttributeError) as e:
+            raise ValueError(f'Cannot encode the block header: {e}')
+
+    raise ValueError(f'Unknown block header version {version}')
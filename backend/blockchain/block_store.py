@@ -0,0 +1,283 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+
+from backend.blockchain.block import Block
+from backend.blockchain.block_header import hash_to_bytes
+from backend.config import BLOCK_STORE_FSYNC, BLOCK_STORE_SEGMENT_SIZE
+
+# Every block is one record in a segment file: length (4 bytes) | crc32 of the payload (4 bytes) | JSON payload
+RECORD_HEADER = struct.Struct('>II')
+# One fixed size index entry per height: segment number | offset of the record | payload length | block hash bytes
+INDEX_ENTRY = struct.Struct('>IQI32s')
+
+INDEX_FILE_NAME = 'index.dat'
+SEGMENT_FILE_NAME = 'segment-{:06d}.dat'
+
+
+class BlockStore:
+    """
+    Append-only store of the blocks of a chain, on disk.
+    Blocks are appended as checksummed records to segment files, and located through an index of fixed size
+    entries, so the entry of any height is at height * INDEX_ENTRY.size.
+    A block is written to its segment before its index entry, so after a crash only the tail can be incomplete.
+    The tail is checked and repaired when the store is opened
+    """
+
+    def __init__(self, directory: str, segment_size: int = BLOCK_STORE_SEGMENT_SIZE, fsync: bool = BLOCK_STORE_FSYNC):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        # The index file as it is on disk: one packed (segment, offset, length, hash bytes) entry per height.
+        # Entries are unpacked when needed, so a long chain costs INDEX_ENTRY.size bytes of memory per block
+        self.index = bytearray()
+        # Read only maps of the segment files, by segment number
+        self.segment_maps: dict[int, mmap.mmap] = {}
+        self.repaired = False
+        self._recover()
+
+    def __len__(self):
+        return len(self.index) // INDEX_ENTRY.size
+
+    def entry(self, height: int) -> tuple[int, int, int, bytes]:
+        """
+        Index entry of the block at the height
+        :param height:
+        :return: segment, offset, payload length and hash bytes
+        """
+        if height < 0:
+            height += len(self)
+        if not 0 <= height < len(self):
+            raise IndexError(f'No block stored at height {height}')
+        return INDEX_ENTRY.unpack_from(self.index, height * INDEX_ENTRY.size)
+
+    def hash_bytes(self, height: int) -> bytes:
+        """
+        Hash of the block at the height, as encoded by hash_to_bytes, without reading the block
+        :param height:
+        :return:
+        """
+        return self.entry(height)[3]
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILE_NAME)
+
+    def segment_path(self, segment: int):
+        return os.path.join(self.directory, SEGMENT_FILE_NAME.format(segment))
+
+    def append(self, block: Block):
+        """
+        Append a block on top of the stored ones. Costs one record and one index entry, whatever the chain length
+        :param block:
+        """
+        payload = block.to_json_bytes()
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        segment, offset = self._end()
+        if offset and offset + len(record) > self.segment_size:
+            segment, offset = segment + 1, 0
+
+        self._write(self.segment_path(segment), record)
+        entry = INDEX_ENTRY.pack(segment, offset, len(payload), hash_to_bytes(block.hash))
+        self._write(self.index_path, entry)
+        self.index += entry
+
+    def read(self, height: int) -> Block:
+        """
+        Read the block at the height, from the memory map of its segment
+        :param height:
+        :return:
+        """
+        payload = self.read_json_bytes(height)
+        block = Block.from_json(json.loads(payload))
+        block._json_bytes = payload  # the record is the encoded JSON of the block
+        return block
+
+    def read_json_bytes(self, height: int) -> bytes:
+        """
+        Read the encoded JSON of the block at the height, without decoding it
+        :param height:
+        :return:
+        """
+        segment, offset, length, _ = self.entry(height)
+        start = offset + RECORD_HEADER.size
+        return self._segment_map(segment, start + length)[start:start + length]
+
+    def read_all(self) -> list[Block]:
+        """
+        Read every stored block
+        :return: list of blocks, by height
+        """
+        return [self.read(height) for height in range(len(self))]
+
+    def close(self):
+        """
+        Release the segment maps. They are mapped again when a block is next read
+        """
+        for segment_map in self.segment_maps.values():
+            segment_map.close()
+        self.segment_maps.clear()
+
+    def _segment_map(self, segment: int, size: int) -> mmap.mmap:
+        """
+        Map of the segment covering at least size bytes. A segment that has grown since it was mapped is mapped again
+        """
+        segment_map = self.segment_maps.get(segment)
+        if segment_map is None or len(segment_map) < size:
+            if segment_map is not None:
+                segment_map.close()
+            with open(self.segment_path(segment), 'rb') as f:
+                segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.segment_maps[segment] = segment_map
+        return segment_map
+
+    def truncate(self, height: int):
+        """
+        Remove the blocks at and above the height. Used when the chain switches to a fork
+        :param height:
+        """
+        if height >= len(self):
+            return
+
+        del self.index[height * INDEX_ENTRY.size:]
+        with open(self.index_path, 'r+b') as f:
+            f.truncate(len(self.index))
+        # Maps must not outlive the end of a truncated file
+        self.close()
+        self._truncate_segments(*self._end())
+
+    def sync(self, chain: list[Block]):
+        """
+        Bring the store in line with the chain.
+        Only the blocks that differ from the stored ones, found by hash from the tip down, are written
+        :param chain:
+        """
+        height = min(len(self), len(chain)) - 1
+        while height >= 0 and self.hash_bytes(height) != hash_to_bytes(chain[height].hash):
+            height -= 1
+
+        self.truncate(height + 1)
+        for block in chain[height + 1:]:
+            self.append(block)
+
+    def _end(self):
+        """
+        :return: segment and offset at which the next record is written
+        """
+        if not len(self):
+            return 0, 0
+
+        segment, offset, length, _ = self.entry(-1)
+        return segment, offset + RECORD_HEADER.size + length
+
+    def _write(self, path, data: bytes):
+        with open(path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def _read_record(self, segment: int, offset: int):
+        """
+        Read the record at the offset, if it is complete and its checksum matches
+        :return: payload, or None
+        """
+        try:
+            with open(self.segment_path(segment), 'rb') as f:
+                f.seek(offset)
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return None
+
+                length, checksum = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+        except FileNotFoundError:
+            return None
+
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return None
+        return payload
+
+    def _truncate_segments(self, segment: int, offset: int):
+        """
+        Cut the segment at the offset and delete the segments after it
+        """
+        path = self.segment_path(segment)
+        if os.path.exists(path):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+
+        later_segment = segment + 1
+        while os.path.exists(self.segment_path(later_segment)):
+            os.remove(self.segment_path(later_segment))
+            later_segment += 1
+
+    def _recover(self):
+        """
+        Load the index and repair an incomplete tail left by a crash:
+        1. A partially written index entry is dropped
+        2. Index entries at the tail whose record is missing or corrupt are dropped
+        3. Complete records written after the last index entry are indexed
+        4. Anything after the last complete record is cut off
+        """
+        index_data = b''
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                index_data = f.read()
+
+        self.index = bytearray(index_data[:len(index_data) - len(index_data) % INDEX_ENTRY.size])
+
+        while len(self) and self._read_record(*self.entry(-1)[:2]) is None:
+            del self.index[-INDEX_ENTRY.size:]
+
+        valid_length = len(self.index)
+        if valid_length != len(index_data):
+            with open(self.index_path, 'r+b') as f:
+                f.truncate(valid_length)
+            self.repaired = True
+
+        segment, offset = self._end()
+        while True:
+            payload = self._read_record(segment, offset)
+            if payload is None and offset and os.path.exists(self.segment_path(segment + 1)):
+                # The record did not fit at the end of the segment, so it was written to the next one
+                segment, offset = segment + 1, 0
+                payload = self._read_record(segment, offset)
+            if payload is None:
+                break
+
+            try:
+                block_hash = json.loads(payload)['hash']
+            except (ValueError, KeyError):
+                break
+            entry = INDEX_ENTRY.pack(segment, offset, len(payload), hash_to_bytes(block_hash))
+            self._write(self.index_path, entry)
+            self.index += entry
+            self.repaired = True
+            offset += RECORD_HEADER.size + len(payload)
+
+        segment, offset = self._end()
+        path = self.segment_path(segment)
+        if (os.path.exists(path) and os.path.getsize(path) > offset) or os.path.exists(self.segment_path(segment + 1)):
+            self._truncate_segments(segment, offset)
+            self.repaired = True
+
+
+def main():
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        block_store = BlockStore(directory)
+        block_store.append(Block.genesis())
+        block_store.append(Block.mine_block(Block.genesis(), ['foo']))
+        print(f'Stored blocks: {len(block_store)}')
+        print(f'Reopened: {BlockStore(directory).read_all()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,14 @@
-import json
+import threading
 
 from backend.blockchain.block import Block
-from backend.config import MINING_REWARD_INPUT
-from backend.wallet.transaction import Transaction
-from backend.wallet.wallet import Wallet
+from backend.blockchain.block_header import hash_to_bytes
+from backend.blockchain.block_store import BlockStore
+from backend.blockchain.chain_range import page_postings
+from backend.blockchain.chain_state import ChainState
+from backend.blockchain.lazy_chain import LazyChain
+from backend.blockchain.mining import MiningEngine, get_mining_engine
+from backend.blockchain.state_snapshots import StateSnapshots
+from backend.config import ADDRESS_TRANSACTIONS_LIMIT, HEADERS_LIMIT, STATE_SNAPSHOT_INTERVAL
 
 
 def lightning_hash(data):
@@ -15,15 +20,60 @@ class Blockchain:
     Public ledger of transactions
     Implemented as a list of blocks - data sets of transactions
     """
-    def __init__(self, local_chain=None, local_blockchain_file_path=None):
-        self.local_blockchain_file_path = local_blockchain_file_path
+    def __init__(self, local_chain=None, block_store: BlockStore = None, mining_engine: MiningEngine = None):
+        self.block_store = block_store
+        self.snapshots = StateSnapshots.for_block_store(block_store) if block_store is not None else None
+        self.snapshot_height = 0  # height of the last snapshot of the state written or loaded
         if local_chain:
             print("Loaded the chain from a local file")
         self.chain: list[Block] = local_chain or [Block.genesis()]
+        self.mining_engine = mining_engine or get_mining_engine()
+        # Blocks are mined on a background thread and received on the pubsub thread
+        self.lock = threading.RLock()
+        # Called with the blocks removed from and added to the tip, whenever the chain changes
+        self.listeners = []
 
-    def add_block(self, data: list):
+    def add_block(self, data: list) -> Block:
+        """
+        Mine a block of the data on the tip of the chain and append it
+        :param data:
+        :raise: Exception if the tip moved on while the block was being mined, see append_block
+        :return: the appended block
+        """
         last_block = self.chain[-1]
-        self.chain.append(Block.mine_block(last_block, data))
+        block = self.mining_engine.mine(last_block, data)
+        self.append_block(block)
+        return block
+
+    def append_block(self, block: Block):
+        """
+        Append a mined block, if it still extends the tip of the chain.
+        The tip may have moved on while the block was being mined
+        :param block:
+        """
+        with self.lock:
+            last_block = self.chain[-1]
+            if block.last_hash != last_block.hash:
+                raise Exception("Cannot append. The block does not extend the tip of the chain")
+            self.chain.append(block)
+            self.notify_listeners([], [block])
+
+    def add_listener(self, listener):
+        """
+        Follow the changes of the chain. The listener is called with the list of blocks removed from the tip,
+        latest first, the list of blocks added on top of the fork point, in chain order, and the state of the chain
+        after the change
+        :param listener: callable taking (removed_blocks, added_blocks, state)
+        """
+        self.listeners.append(listener)
+
+    def notify_listeners(self, removed_blocks: list[Block], added_blocks: list[Block]):
+        if not self.listeners:
+            return
+
+        state = self.synced_state()
+        for listener in self.listeners:
+            listener(removed_blocks, added_blocks, state)
 
     def __repr__(self):
         return f'Blockchain: {self.chain}'
@@ -36,16 +86,252 @@ class Blockchain:
         :param chain:
         :return:
         """
-        if len(chain) <= len(self.chain):
-            raise Exception("Cannot replace. The incoming chain must be longer")
+        with self.lock:
+            if len(chain) <= len(self.chain):
+                raise Exception("Cannot replace. The incoming chain must be longer")
+
+            fork_height = self.find_fork_height(chain)
+
+            try:
+                self.switch_to_fork(fork_height, chain[fork_height + 1:])
+            except Exception as e:
+                raise Exception(f'Cannot replace. The incoming chain is invalid: {e}')
+
+    def receive_block(self, block: Block):
+        """
+        Add a block broadcast by a peer, once it is validated on top of the tip of the chain.
+        Same rules as replacing the chain with the chain extended by the block, without copying the chain
+        :param block:
+        """
+        with self.lock:
+            if block.last_hash != self.chain[-1].hash:
+                raise Exception("Cannot add. The block does not extend the tip of the chain")
+
+            try:
+                self.switch_to_fork(len(self.chain) - 1, [block])
+            except Exception as e:
+                raise Exception(f'Cannot add. The block is invalid: {e}')
+
+    def headers(self, start: int, end: int) -> list[dict]:
+        """
+        Headers of the blocks from height start to end, end excluded, at most HEADERS_LIMIT of them
+        :param start:
+        :param end:
+        :return: headers, with the height of their block
+        """
+        with self.lock:
+            start = max(start, 0)
+            end = min(end, len(self.chain), start + HEADERS_LIMIT)
+            return [{'height': height, **self.chain[height].header()} for height in range(start, end)]
+
+    def height_of(self, block_hash: str):
+        """
+        Height of the block with the hash, looked up in the index of block heights by hash.
+        The index is first brought up to date with the blocks added since the last lookup. The hash of the block
+        found is then compared as a string, which tells apart entries left by blocks replaced since, and hashes
+        that only encode to the same bytes, like an uppercase hex hash
+        :param block_hash:
+        :return: height, or None if the block is not on the chain
+        """
+        hash_bytes = hash_to_bytes(block_hash)
+        with self.lock:
+            for height in range(self.indexed_length, len(self.chain)):
+                self.block_heights[self.block_hash_bytes(height)] = height
+            self.indexed_length = len(self.chain)
+
+            height = self.block_heights.get(hash_bytes)
+            if height is not None and height < len(self.chain) and self.chain[height].hash == block_hash:
+                return height
+        return None
+
+    def block_hash_bytes(self, height: int) -> bytes:
+        """
+        Hash of the block at the height, as encoded by hash_to_bytes, without reading a stored block
+        :param height:
+        :return:
+        """
+        if isinstance(self.chain, LazyChain):
+            return self.chain.hash_bytes(height)
+        return hash_to_bytes(self.chain[height].hash)
+
+    def find_fork_height(self, chain):
+        """
+        Find the height of the last block the incoming chain has in common with the local chain, by hash.
+        Walks back from the shorter tip, so the cost depends on how far back the chains diverge
+        :param chain:
+        :return: height of the common ancestor, or -1 if there is none
+        """
+        height = min(len(self.chain), len(chain)) - 1
+        while height >= 0 and self.chain[height].hash != chain[height].hash:
+            height -= 1
+        return height
+
+    def switch_to_fork(self, fork_height, new_blocks):
+        """
+        Replace the blocks above fork_height with new_blocks. Only the new blocks are validated, against the state
+        of the chain at the fork point. Blocks up to the fork point are kept as they are
+        :param fork_height: -1 if the new blocks replace the whole chain, genesis block included
+        :param new_blocks:
+        :raise: Exception if a new block is invalid, in which case the chain is unchanged
+        """
+        if fork_height < 0:
+            self.switch_to_chain(new_blocks)
+            return
+
+        state = self.synced_state()
+        orphaned_blocks = self.chain[fork_height + 1:]
+        rolled_back = fork_height + 1 >= state.base_height
+
+        if rolled_back:
+            # Roll the state back to the fork point
+            for _ in orphaned_blocks:
+                state.rollback_block()
+        else:
+            # The state was loaded from a snapshot above the fork point, so it is rebuilt up to the fork point
+            state = ChainState()
+            for block in self.chain[:fork_height + 1]:
+                state.apply_block(block, validate=False)
 
         try:
-            Blockchain.is_valid_chain(chain)
-        except Exception as e:
-            raise Exception(f'Cannot replace. The incoming chain is invalid: {e}')
+            last_block = self.chain[fork_height]
+            for block in new_blocks:
+                Block.is_valid_block(last_block, block)
+                last_block = block
+
+            state.apply_blocks(new_blocks)
+        except Exception:
+            if rolled_back:
+                for block in orphaned_blocks:
+                    state.apply_block(block, validate=False)
+            raise
+
+        del self.chain[fork_height + 1:]
+        self.indexed_length = min(self.indexed_length, fork_height + 1)
+        self.chain.extend(new_blocks)
+        self.state = state
+        self.notify_listeners(orphaned_blocks[::-1], list(new_blocks))
+
+    def switch_to_chain(self, chain):
+        """
+        Replace the whole chain, when not even the genesis block is in common, like after the local genesis block
+        was corrupted. The chain is validated from the genesis block on, into a new state
+        :param chain:
+        :raise: Exception if the chain is invalid, in which case the chain is unchanged
+        """
+        if not chain or chain[0] != Block.genesis():
+            raise Exception("The genesis block must be valid")
+
+        for i in range(1, len(chain)):
+            Block.is_valid_block(chain[i - 1], chain[i])
+
+        state = ChainState()
+        state.apply_blocks(chain)
+
+        orphaned_blocks = self.chain[:]
+        del self.chain[:]
+        self.indexed_length = 0
+        self.chain.extend(chain)
+        self.state = state
+        self.notify_listeners(orphaned_blocks[::-1], list(chain))
+
+    def restore_state(self, state: ChainState):
+        """
+        Start from a state loaded from a snapshot of this chain. Only the blocks after the snapshot are validated
+        and applied, instead of the whole chain
+        :param state:
+        :raise: Exception if a block after the snapshot is invalid, in which case the chain is cut back to the snapshot
+        """
+        with self.lock:
+            new_blocks = self.chain[state.height:]
+            del self.chain[state.height:]
+            self.indexed_length = min(self.indexed_length, state.height)
+            self.state = state
+            self.snapshot_height = state.height
+
+            self.switch_to_fork(state.height - 1, new_blocks)
+
+    @property
+    def chain(self) -> list[Block]:
+        return self._chain
+
+    @chain.setter
+    def chain(self, chain: list[Block]):
+        self._chain = chain
+        # Rebuilt from the new chain when they are next needed
+        self.state = ChainState()
+        # Heights of the blocks by hash bytes, for the heights below indexed_length
+        self.block_heights: dict[bytes, int] = {}
+        self.indexed_length = 0
+
+    def balance(self, address: str):
+        """
+        Balance of the address at the tip of the chain
+        :param address:
+        :return:
+        """
+        return self.synced_state().balance(address)
+
+    def find_transaction(self, transaction_id: str):
+        """
+        Find a transaction of the chain through the transaction index of the state, without scanning the blocks
+        :param transaction_id:
+        :return: height, block hash, position in the block and JSON of the transaction, or None if not on the chain
+        """
+        with self.lock:
+            location = self.synced_state().transaction_location(transaction_id)
+            if location is None:
+                return None
+
+            height, position = location
+            block = self.chain[height]
+            return {
+                'height': height,
+                'block_hash': block.hash,
+                'position': position,
+                'transaction': block.data[position]
+            }
+
+    def known_addresses(self) -> list[str]:
+        """
+        Addresses that took part in a transaction of the chain, from the address index of the state
+        :return:
+        """
+        with self.lock:
+            return list(self.synced_state().known_addresses())
 
-        # Finally, replace the current chain with the incoming chain
-        self.chain = chain
+    def address_transactions(self, address: str, cursor: str = None, limit: int = ADDRESS_TRANSACTIONS_LIMIT):
+        """
+        A page of the transactions the address takes part in, newest first, found through the address index
+        :param address:
+        :param cursor: next_cursor of the previous page
+        :param limit:
+        :raise: Exception if the cursor is invalid
+        :return: list of the height, block hash and JSON of each transaction, and the cursor of the next page
+        """
+        with self.lock:
+            postings = self.synced_state().address_postings_of(address)
+            page, next_cursor = page_postings(postings, self.chain, cursor, limit)
+
+            transactions = []
+            for height, transaction_id in page:
+                block = self.chain[height]
+                transaction_json = next(
+                    transaction_json for transaction, transaction_json in zip(block.transactions, block.data)
+                    if transaction.id == transaction_id
+                )
+                transactions.append({'height': height, 'block_hash': block.hash, 'transaction': transaction_json})
+
+            return transactions, next_cursor
+
+    def synced_state(self) -> ChainState:
+        """
+        The state of the chain, brought up to date with the blocks appended since it was last used
+        :return:
+        """
+        with self.lock:
+            while self.state.height < len(self.chain):
+                self.state.apply_block(self.chain[self.state.height], validate=False)
+            return self.state
 
     def to_json(self):
         """
@@ -54,6 +340,30 @@ class Blockchain:
         """
         return list(map(lambda block: block.to_json(), self.chain))
 
+    def to_json_bytes(self, heights=None) -> bytes:
+        """
+        Serialise the blocks at the heights, or the whole chain, into an encoded JSON list.
+        Built by joining the cached encoded JSON of each block, instead of serialising the blocks again
+        :param heights:
+        :return:
+        """
+        with self.lock:
+            if heights is None:
+                heights = range(len(self.chain))
+            blocks_json = [self.block_json_bytes(height) for height in heights]
+
+        return b'[' + b', '.join(blocks_json) + b']'
+
+    def block_json_bytes(self, height: int) -> bytes:
+        """
+        Encoded JSON of the block at the height. Blocks of a lazily loaded chain are not decoded to be encoded again
+        :param height:
+        :return:
+        """
+        if isinstance(self.chain, LazyChain):
+            return self.chain.json_bytes(height)
+        return self.chain[height].to_json_bytes()
+
     @staticmethod
     def from_json(chain_json):
         """
@@ -81,7 +391,7 @@ class Blockchain:
         :param chain:
         """
 
-        if chain[0].__dict__ != Block.genesis().__dict__:
+        if chain[0] != Block.genesis():
             raise Exception("The genesis block must be valid")
 
         # Iterate over the chain blocks, except the first genesis block
@@ -100,52 +410,28 @@ class Blockchain:
         2. There can only be one mining reward per block
         3. Each transaction must be valid
 
+        The chain is checked in a single forward pass that keeps the running balances of all addresses,
+        instead of recalculating the historic balance of every sender
         :param chain:
         :return:
         """
-        transaction_ids = set()
-
-        for i in range(len(chain)):
-            block = chain[i]
-            has_mining_reward = False
-
-            for transaction_json in block.data:
-                transaction = Transaction.from_json(transaction_json)
-
-                if transaction.id in transaction_ids:
-                    raise Exception(f'Transaction with {transaction.id} is not unique')
-
-                if transaction.input == MINING_REWARD_INPUT:
-                    if has_mining_reward:
-                        raise Exception(f'There can only be one mining reward per block')
-                    has_mining_reward = True
-                else:
-                    transaction_ids.add(transaction.id)
-
-                    historic_blockchain = Blockchain()
-                    historic_blockchain.chain = chain[0:i]
-                    historic_balance = Wallet.calculate_balance(
-                        historic_blockchain,
-                        transaction.input['address']
-                    )
-
-                    if historic_balance != transaction.input['amount']:
-                        raise Exception(f'Transaction {transaction.id} has an invalid input amount')
-
-                # Finally validate the transaction
-                Transaction.is_valid_transaction(transaction)
+        ChainState().apply_blocks(chain)
 
     def save_to_file(self):
         """
-        Saves existing blockchain to a file with the path specified
+        Save the blockchain to its block store, if it has one.
+        Only the blocks appended or replaced since the last save are written.
+        Every STATE_SNAPSHOT_INTERVAL blocks, a snapshot of the state is saved too
         """
-        # write empty file if not exist
-        if not self.local_blockchain_file_path:
+        if self.block_store is None:
             return
 
-        with open(self.local_blockchain_file_path, 'w') as f:
-            f.write(json.dumps(self.to_json()))
-
-
-
+        with self.lock:
+            self.block_store.sync(self.chain)
+            if isinstance(self.chain, LazyChain):
+                self.chain.release_saved_blocks()
 
+            state = self.synced_state()
+            if state.height - self.snapshot_height >= STATE_SNAPSHOT_INTERVAL:
+                self.snapshots.save(state, self.chain[-1].hash)
+                self.snapshot_height = state.height
@@ -0,0 +1,106 @@
+import base64
+import binascii
+import hashlib
+
+from backend.config import ADDRESS_TRANSACTIONS_LIMIT, BLOCKCHAIN_RANGE_LIMIT
+
+
+def newest_first_heights(length: int, start: int, end: int, limit: int = BLOCKCHAIN_RANGE_LIMIT) -> range:
+    """
+    Heights of the blocks of chain[::-1][start:end], for a chain of the given length, without reversing the chain.
+    At most limit heights, capped at BLOCKCHAIN_RANGE_LIMIT, are returned
+    :param length:
+    :param start: position from the tip of the first block
+    :param end: position from the tip after the last block
+    :param limit:
+    :return: heights, newest first
+    """
+    return range(length - 1, -1, -1)[start:end][:max(0, min(limit, BLOCKCHAIN_RANGE_LIMIT))]
+
+
+def encode_cursor(position: int, block_hash: str) -> str:
+    """
+    Opaque cursor pointing below the block at the height, or below the posting at the position of an address index
+    :param position: height, or position of the posting
+    :param block_hash: hash of the block at the height (of the posting), to detect that the chain has been replaced
+    :return:
+    """
+    return base64.urlsafe_b64encode(f'{position}:{block_hash}'.encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(cursor: str) -> tuple[int, str]:
+    """
+    :param cursor:
+    :raise: Exception if the cursor is malformed
+    :return: position and block hash of the cursor
+    """
+    try:
+        height, block_hash = base64.urlsafe_b64decode(cursor.encode('utf-8')).decode('utf-8').split(':', 1)
+        return int(height), block_hash
+    except (ValueError, binascii.Error):
+        raise Exception("Invalid cursor")
+
+
+def page_heights(chain, cursor: str = None, limit: int = BLOCKCHAIN_RANGE_LIMIT):
+    """
+    Heights of a page of blocks, newest first, from the tip or from below the block of the cursor.
+    Pages are addressed by height, so they stay the same while new blocks are added at the tip
+    :param chain:
+    :param cursor: next_cursor of the previous page
+    :param limit: number of blocks, capped at BLOCKCHAIN_RANGE_LIMIT
+    :raise: Exception if the cursor is invalid, or points to a block that is no longer on the chain
+    :return: heights, and the cursor of the next page, None after the genesis block
+    """
+    limit = max(1, min(limit, BLOCKCHAIN_RANGE_LIMIT))
+    top = len(chain)
+
+    if cursor:
+        height, block_hash = decode_cursor(cursor)
+        if not 0 <= height < len(chain) or chain[height].hash != block_hash:
+            raise Exception("The cursor is no longer on the chain")
+        top = height
+
+    heights = range(top - 1, max(top - limit, 0) - 1, -1)
+
+    next_cursor = encode_cursor(heights[-1], chain[heights[-1]].hash) if heights and heights[-1] > 0 else None
+    return heights, next_cursor
+
+
+def page_postings(postings: list, chain, cursor: str = None, limit: int = ADDRESS_TRANSACTIONS_LIMIT):
+    """
+    A page of the (height, transaction id) postings of an address, newest first, from the latest one or from below
+    the posting of the cursor. Like page_heights, pages stay the same while new postings are added
+    :param postings: postings of the address, oldest first
+    :param chain:
+    :param cursor: next_cursor of the previous page
+    :param limit: number of postings, capped at ADDRESS_TRANSACTIONS_LIMIT
+    :raise: Exception if the cursor is invalid, or points to a posting that is no longer on the chain
+    :return: postings, and the cursor of the next page, None after the first posting
+    """
+    limit = max(1, min(limit, ADDRESS_TRANSACTIONS_LIMIT))
+    top = len(postings)
+
+    if cursor:
+        position, block_hash = decode_cursor(cursor)
+        if not 0 <= position < len(postings) or chain[postings[position][0]].hash != block_hash:
+            raise Exception("The cursor is no longer on the chain")
+        top = position
+
+    start = max(top - limit, 0)
+    page = postings[start:top][::-1]
+
+    next_cursor = encode_cursor(start, chain[postings[start][0]].hash) if page and start > 0 else None
+    return page, next_cursor
+
+
+def chain_etag(tip_hash: str, variant: str = '') -> str:
+    """
+    ETag of a response built from the chain. Blocks below the tip never change, so the tip hash identifies
+    the whole chain. Responses that depend on request parameters add a digest of them
+    :param tip_hash:
+    :param variant: the parameters the response depends on
+    :return:
+    """
+    if not variant:
+        return tip_hash
+    return f'{tip_hash}-{hashlib.sha256(variant.encode("utf-8")).hexdigest()[:16]}'
@@ -0,0 +1,243 @@
+from backend.config import STARTING_BALANCE
+from backend.wallet.signature_verifier import first_invalid_signature
+from backend.wallet.transaction import Transaction
+
+# Marks an address that had no balance entry before a block, in the undo log
+_MISSING = object()
+
+
+class ChainState:
+    """
+    State derived from the transactions of a chain: the balance of every address, the location of the transactions
+    already on the chain by id, and the index of the transactions of every address.
+    Blocks are applied one at a time and can be rolled back, so the state can follow the tip of the chain,
+    and new blocks can be validated against it, without rescanning the chain from genesis.
+    """
+
+    def __init__(self):
+        self.balances: dict[str, int] = {}
+        # Transaction index: (height, position in the block data) of every transaction on the chain, by id.
+        # Reward transactions are left out, as their ids are not required to be unique across the chain
+        self.transaction_locations: dict[str, tuple[int, int]] = {}
+        # Address index: (height, transaction id) postings of the transactions each address takes part in, by height
+        self.address_postings: dict[str, list[tuple[int, str]]] = {}
+        # Number of blocks applied before the undo log starts, for a state loaded from a snapshot
+        self.base_height = 0
+        # One entry per applied block: the balances it overwrote, the transaction ids it added,
+        # and the addresses it added a posting to
+        self.undo_log: list[tuple[dict, list, list]] = []
+
+    @property
+    def height(self):
+        """
+        Number of blocks applied to the state
+        """
+        return self.base_height + len(self.undo_log)
+
+    @property
+    def transaction_ids(self):
+        """
+        Ids of the transactions already on the chain
+        """
+        return self.transaction_locations.keys()
+
+    def balance(self, address: str):
+        """
+        Balance of the address after the blocks applied so far
+        :param address:
+        :return:
+        """
+        balance = self.balances.get(address, STARTING_BALANCE)
+        if balance is None:
+            # Same failure as Wallet.calculate_balance, for an address that spent without keeping a change output
+            raise KeyError(address)
+        return balance
+
+    def validate_block(self, block, signatures: list = None):
+        """
+        Enforce the transaction rules for a block applied on top of this state
+        1. Each transaction must only appear once in the chain
+        2. There can only be one mining reward per block
+        3. The input amount must be the balance of the sender before the block
+        4. Each transaction must be valid
+        :param block:
+        :param signatures: if given, (transaction id, (public key, data, signature)) pairs are collected here
+            to be verified later, instead of verified now
+        :raise: Exception
+        """
+        block_transaction_ids = set()
+        has_mining_reward = False
+
+        for transaction in block.transactions:
+            if transaction.id in self.transaction_locations or transaction.id in block_transaction_ids:
+                raise Exception(f'Transaction with {transaction.id} is not unique')
+
+            if transaction.is_reward:
+                if has_mining_reward:
+                    raise Exception(f'There can only be one mining reward per block')
+                has_mining_reward = True
+            else:
+                block_transaction_ids.add(transaction.id)
+
+                if self.balance(transaction.sender) != transaction.input_amount:
+                    raise Exception(f'Transaction {transaction.id} has an invalid input amount')
+
+            # Finally validate the transaction
+            Transaction.is_valid_transaction(transaction, verify_signature=signatures is None)
+            if signatures is not None and not transaction.is_reward:
+                signature = (transaction.input['public_key'], transaction.output, transaction.input['signature'])
+                signatures.append((transaction.id, signature))
+
+    def apply_block(self, block, validate=True, signatures: list = None):
+        """
+        Apply the transactions of the block on top of the state
+        :param block:
+        :param validate: validate the block against the state first. Blocks already on a validated chain skip this
+        :param signatures: see validate_block
+        :raise: Exception if the block is invalid, in which case the state is unchanged
+        """
+        if validate:
+            self.validate_block(block, signatures)
+
+        height = self.height
+        previous_balances = {}
+        added_ids = []
+        posted_addresses = []
+
+        def set_balance(address, balance):
+            if address not in previous_balances:
+                previous_balances[address] = self.balances.get(address, _MISSING)
+            self.balances[address] = balance
+
+        for position, transaction in enumerate(block.transactions):
+            sender = transaction.sender
+
+            # Any time the address conducts a transaction, its balance resets to the remaining output
+            set_balance(sender, transaction.output.get(sender))
+            for address, amount in transaction.outputs:
+                if address != sender:
+                    balance = self.balances.get(address, STARTING_BALANCE)
+                    set_balance(address, None if balance is None else balance + amount)
+
+            if not transaction.is_reward and transaction.id not in self.transaction_locations:
+                self.transaction_locations[transaction.id] = (height, position)
+                added_ids.append(transaction.id)
+
+            addresses = transaction.addresses if transaction.is_reward else {sender, *transaction.addresses}
+            for address in addresses:
+                self.address_postings.setdefault(address, []).append((height, transaction.id))
+                posted_addresses.append(address)
+
+        self.undo_log.append((previous_balances, added_ids, posted_addresses))
+
+    def apply_blocks(self, blocks):
+        """
+        Validate and apply blocks in order.
+        The ordered checks (balances, duplicate ids) run in this pass, while the signatures are collected and
+        verified afterwards in batches on the signature verification pool.
+        The first failure in chain order is raised, as if every transaction had been fully validated in turn
+        :param blocks:
+        :raise: Exception if a block is invalid, in which case the blocks applied by this call are rolled back
+        """
+        signatures = []
+        applied = 0
+        error = None
+
+        try:
+            for block in blocks:
+                self.apply_block(block, signatures=signatures)
+                applied += 1
+        except Exception as e:
+            # Only signatures of transactions before the failing one were collected
+            error = e
+
+        try:
+            invalid = first_invalid_signature([signature for _, signature in signatures])
+            if invalid is not None:
+                raise Exception(f'Invalid transaction signature, in transaction {signatures[invalid][0]}')
+            if error:
+                raise error
+        except Exception:
+            for _ in range(applied):
+                self.rollback_block()
+            raise
+
+    def rollback_block(self):
+        """
+        Undo the last applied block
+        :raise: Exception if the block was applied before the snapshot the state was loaded from
+        """
+        if not self.undo_log:
+            raise Exception("Cannot roll back below the snapshot the state was loaded from")
+
+        previous_balances, added_ids, posted_addresses = self.undo_log.pop()
+
+        for address, balance in previous_balances.items():
+            if balance is _MISSING:
+                del self.balances[address]
+            else:
+                self.balances[address] = balance
+
+        for transaction_id in added_ids:
+            del self.transaction_locations[transaction_id]
+
+        for address in reversed(posted_addresses):
+            postings = self.address_postings[address]
+            postings.pop()
+            if not postings:
+                del self.address_postings[address]
+
+    def transaction_location(self, transaction_id: str):
+        """
+        Where the transaction was included in the chain
+        :param transaction_id:
+        :return: height of the block and position of the transaction in the block data, or None if not on the chain
+        """
+        return self.transaction_locations.get(transaction_id)
+
+    def known_addresses(self):
+        """
+        Addresses that took part in a transaction of the chain
+        :return:
+        """
+        return self.address_postings.keys()
+
+    def address_postings_of(self, address: str) -> list[tuple[int, str]]:
+        """
+        Postings of the transactions the address takes part in, oldest first
+        :param address:
+        :return: (height, transaction id) pairs
+        """
+        return self.address_postings.get(address, [])
+
+    def to_json(self):
+        """
+        Serialise the state for a snapshot. The undo log is left out, so a loaded state cannot be rolled back
+        below the snapshot
+        :return:
+        """
+        return {
+            'height': self.height,
+            'balances': self.balances,
+            'transaction_locations': self.transaction_locations,
+            'address_postings': self.address_postings
+        }
+
+    @staticmethod
+    def from_json(state_json):
+        """
+        Deserialise a state snapshot
+        :param state_json:
+        :return:
+        """
+        state = ChainState()
+        state.base_height = state_json['height']
+        state.balances = state_json['balances']
+        state.transaction_locations = {
+            transaction_id: tuple(location) for transaction_id, location in state_json['transaction_locations'].items()
+        }
+        state.address_postings = {
+            address: [tuple(posting) for posting in postings]
+            for address, postings in state_json['address_postings'].items()
+        }
+        return state
@@ -0,0 +1,129 @@
+from backend.blockchain.block import Block
+from backend.config import SYNC_MAX_FORK_DEPTH, SYNC_SAVE_INTERVAL
+
+
+class ChainSync:
+    """
+    Replace the chain with a peer's chain received one block at a time, for example streamed over HTTP,
+    so the incoming chain is never held in memory as a whole.
+    Blocks the chains have in common are only compared by hash. Blocks after the fork point are validated as they
+    arrive, and kept only until the incoming chain is longer than the local one. From then on, every incoming block
+    is added to the chain as soon as it is validated. At most max_fork_depth blocks are kept, so a fork that
+    diverges deeper below the local tip is rejected.
+    A peer chain that turns out invalid part way through leaves the local chain on its longest valid prefix,
+    if that prefix is longer than the local chain was.
+    Blocks are read and validated without holding the chain lock, so mining and the API are not held up by a slow
+    peer. The lock is only taken to switch the chain to the received blocks
+    """
+
+    def __init__(
+            self, blockchain, save_interval: int = SYNC_SAVE_INTERVAL, max_fork_depth: int = SYNC_MAX_FORK_DEPTH
+    ):
+        self.blockchain = blockchain
+        self.save_interval = save_interval
+        self.max_fork_depth = max_fork_depth
+
+        self.height = 0  # height of the next incoming block
+        self.fork_height = None  # height of the last block in common, once the chains diverge
+        self.pending: list[Block] = []  # incoming blocks after the fork point, not on the chain yet
+        self.last_block = None  # last incoming block
+        self.blocks_added = 0
+        self.unsaved_blocks = 0
+
+    def sync(self, blocks, start_height: int = 0):
+        """
+        Receive the whole incoming chain
+        :param blocks: iterable of the blocks of the incoming chain, from start_height
+        :param start_height: height of the first block. Blocks below it must be the same on both chains
+        :raise: Exception if the incoming chain is not longer than the local one, is invalid, or no longer forks
+            from the local chain
+        :return: number of blocks added to the chain
+        """
+        self.height = start_height
+        if start_height > len(self.blockchain.chain):
+            raise Exception("Cannot replace. The local chain changed during the sync")
+
+        try:
+            for block in blocks:
+                self.add(block)
+            self.finish()
+        finally:
+            if self.blocks_added:
+                self.blockchain.save_to_file()
+
+        return self.blocks_added
+
+    def add(self, block: Block):
+        """
+        Receive the next block of the incoming chain
+        :param block:
+        :raise: Exception if the block is invalid, or forks deeper than max_fork_depth below the local tip
+        """
+        chain = self.blockchain.chain
+
+        if self.fork_height is None:
+            if self.height == 0:
+                if block != Block.genesis():
+                    raise Exception("Cannot replace. The incoming chain is invalid: The genesis block must be valid")
+            elif self.height >= len(chain) or chain[self.height].hash != block.hash:
+                self.fork_height = self.height - 1
+
+        if self.fork_height is None:
+            # Still on the part the chains have in common
+            self.last_block = block
+            self.height += 1
+            return
+
+        try:
+            Block.is_valid_block(self.last_block or chain[self.fork_height], block)
+        except Exception as e:
+            raise Exception(f'Cannot replace. The incoming chain is invalid: {e}')
+
+        if len(self.pending) >= self.max_fork_depth:
+            raise Exception(f'Cannot replace. The incoming chain forks more than {self.max_fork_depth} blocks deep')
+
+        self.pending.append(block)
+        self.last_block = block
+        self.height += 1
+
+        if self.height > len(chain):
+            self.switch()
+
+    def switch(self):
+        """
+        Switch the chain to the pending blocks, if they are still longer than the chain and the chain still has the
+        block they fork from. The chain may have changed since the pending blocks were validated
+        :raise: Exception if the chain no longer has the fork block, or a pending block is invalid
+        """
+        with self.blockchain.lock:
+            chain = self.blockchain.chain
+            if self.height <= len(chain):
+                return
+
+            if self.fork_height >= 0 and (
+                    self.fork_height >= len(chain) or chain[self.fork_height].hash != self.pending[0].last_hash
+            ):
+                raise Exception("Cannot replace. The local chain changed during the sync")
+
+            try:
+                self.blockchain.switch_to_fork(self.fork_height, self.pending)
+            except Exception as e:
+                raise Exception(f'Cannot replace. The incoming chain is invalid: {e}')
+
+            self.blocks_added += len(self.pending)
+            self.unsaved_blocks += len(self.pending)
+            self.fork_height = len(self.blockchain.chain) - 1
+            self.pending = []
+
+            if self.unsaved_blocks >= self.save_interval:
+                # Saved blocks are read back from the block store when needed, instead of kept in memory
+                self.blockchain.save_to_file()
+                self.unsaved_blocks = 0
+
+    def finish(self):
+        """
+        Check the incoming chain has been received in full
+        :raise: Exception if it was not longer than the local chain
+        """
+        if not self.blocks_added or self.pending:
+            raise Exception("Cannot replace. The incoming chain must be longer")
@@ -0,0 +1,125 @@
+import json
+
+import requests
+
+from backend.blockchain.block import Block
+from backend.blockchain.chain_sync import ChainSync
+from backend.config import FORK_SEARCH_WINDOW, HEADERS_LIMIT, PEER_REQUEST_TIMEOUT, SYNC_MAX_FORK_DEPTH
+
+
+class HttpPeer:
+    """
+    The chain endpoints of a peer node, as used by HeadersFirstSync.
+    Requests give up once the peer has not answered for timeout seconds, so an unresponsive peer cannot hold up
+    the sync forever
+    """
+
+    def __init__(self, url: str, timeout: float = PEER_REQUEST_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def length(self) -> int:
+        return requests.get(f'{self.url}/blockchain/length', timeout=self.timeout).json()
+
+    def headers(self, start: int, end: int) -> list[dict]:
+        """
+        :return: headers of the blocks from height start to end, end excluded
+        """
+        return requests.get(
+            f'{self.url}/blockchain/headers', params={'start': start, 'end': end}, timeout=self.timeout
+        ).json()
+
+    def blocks_after(self, block_hash: str):
+        """
+        :return: generator of the blocks after the block with the hash, parsed as they are streamed
+        """
+        response = requests.get(f'{self.url}/blockchain/after/{block_hash}', stream=True, timeout=self.timeout)
+        if not response.ok:
+            raise Exception(f'The peer does not have the block {block_hash}')
+
+        with response:
+            for line in response.iter_lines():
+                if line:
+                    yield Block.from_json(json.loads(line))
+
+
+class HeadersFirstSync:
+    """
+    Sync the chain with a longer peer chain, downloading only the blocks the local chain is missing.
+    1. The fork point is found by comparing the hashes of block headers, walking back from the local tip
+       with a window that doubles each step
+    2. The headers after the fork point are checked: they must link to each other and meet their proof of work
+    3. Only the blocks after the fork point are downloaded, and validated in full as they arrive
+    """
+
+    def __init__(self, blockchain, peer, window: int = FORK_SEARCH_WINDOW):
+        self.blockchain = blockchain
+        self.peer = peer
+        self.window = window
+
+    def sync(self) -> int:
+        """
+        :raise: Exception if the peer chain is not longer, has no block in common, forks deeper than
+            SYNC_MAX_FORK_DEPTH below the local tip, or is invalid
+        :return: number of blocks added to the chain
+        """
+        peer_length = self.peer.length()
+        if peer_length <= len(self.blockchain.chain):
+            raise Exception("Cannot replace. The incoming chain must be longer")
+
+        fork_height = self.find_fork_height(peer_length)
+        # Checked before any header or block after the fork point is downloaded, see ChainSync
+        if len(self.blockchain.chain) - fork_height > SYNC_MAX_FORK_DEPTH:
+            raise Exception(f'Cannot replace. The incoming chain forks more than {SYNC_MAX_FORK_DEPTH} blocks deep')
+        self.validate_headers(fork_height, peer_length)
+
+        fork_hash = self.blockchain.chain[fork_height].hash
+        return ChainSync(self.blockchain).sync(self.peer.blocks_after(fork_hash), fork_height + 1)
+
+    def find_fork_height(self, peer_length: int) -> int:
+        """
+        :param peer_length:
+        :raise: Exception if the chains do not even share the genesis block
+        :return: height of the last block the local chain and the peer chain have in common
+        """
+        chain = self.blockchain.chain
+        top = min(len(chain), peer_length)
+        window = self.window
+
+        while top > 0:
+            start = max(0, top - window)
+            for header in reversed(self.peer.headers(start, top)):
+                height = header['height']
+                if height < len(chain) and chain[height].hash == header['hash']:
+                    return height
+
+            top = start
+            window = min(2 * window, HEADERS_LIMIT)
+
+        raise Exception("Cannot replace. The incoming chain has no block in common with the local chain")
+
+    def validate_headers(self, fork_height: int, peer_length: int):
+        """
+        Check the headers of the peer chain after the fork point, a page at a time, before any block is downloaded
+        :param fork_height:
+        :param peer_length:
+        :raise: Exception if a header is invalid
+        """
+        last_block = self.blockchain.chain[fork_height]
+        height = fork_height + 1
+
+        while height < peer_length:
+            headers = self.peer.headers(height, min(height + HEADERS_LIMIT, peer_length))
+            if not headers:
+                raise Exception("Cannot replace. The peer did not send the headers of its chain")
+
+            for header in headers:
+                if header['height'] != height:
+                    raise Exception(f'Cannot replace. Expected the header at height {height}')
+                block = Block.from_header(header)
+                try:
+                    Block.is_valid_block(last_block, block)
+                except Exception as e:
+                    raise Exception(f'Cannot replace. The incoming chain is invalid: {e}')
+                last_block = block
+                height += 1
@@ -0,0 +1,114 @@
+from backend.blockchain.block import Block
+from backend.blockchain.block_header import hash_to_bytes
+from backend.blockchain.block_store import BlockStore
+from backend.config import BLOCK_CACHE_SIZE
+from backend.util.lru_cache import LRUCache
+
+
+class LazyChain:
+    """
+    Chain of blocks that reads the blocks of a block store only when they are accessed.
+    Behaves like the list of blocks it replaces: indexing, slicing, iteration, append, extend, and deleting the tail.
+    The length and the index of hashes come from the store index, so they are available without reading a block.
+    Read blocks are kept in a bounded cache, and blocks appended after loading are kept in memory
+    """
+
+    def __init__(self, block_store: BlockStore, cache_size: int = BLOCK_CACHE_SIZE):
+        self.block_store = block_store
+        # Heights below stored_length are read from the store, the ones above are in blocks
+        self.stored_length = len(block_store)
+        self.blocks: list[Block] = []
+        self.cache = LRUCache(max_entries=cache_size)
+
+    def __len__(self):
+        return self.stored_length + len(self.blocks)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[height] for height in range(*index.indices(len(self)))]
+
+        height = index + len(self) if index < 0 else index
+        if not 0 <= height < len(self):
+            raise IndexError('Chain index out of range')
+
+        if height >= self.stored_length:
+            return self.blocks[height - self.stored_length]
+
+        block = self.cache.get(height)
+        if block is None:
+            block = self.block_store.read(height)
+            self.cache.put(height, block)
+        return block
+
+    def __delitem__(self, index):
+        if not isinstance(index, slice) or index.step not in (None, 1) or index.stop not in (None, len(self)):
+            raise IndexError('Only the tail of the chain can be deleted')
+
+        height = index.indices(len(self))[0]
+        if height >= self.stored_length:
+            del self.blocks[height - self.stored_length:]
+        else:
+            self.stored_length = height
+            self.blocks = []
+            # The heights above are rewritten in the store once the chain is saved
+            self.cache.clear()
+
+    def __iter__(self):
+        height = 0
+        while height < len(self):
+            yield self[height]
+            height += 1
+
+    def __eq__(self, other):
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __repr__(self):
+        return f'LazyChain({len(self)} blocks, {self.stored_length} stored)'
+
+    def json_bytes(self, index: int) -> bytes:
+        """
+        Encoded JSON of the block at the index. Blocks that are not cached are not decoded
+        :param index:
+        :return:
+        """
+        height = index + len(self) if index < 0 else index
+        if not 0 <= height < len(self):
+            raise IndexError('Chain index out of range')
+
+        if height >= self.stored_length:
+            return self.blocks[height - self.stored_length].to_json_bytes()
+
+        block = self.cache.get(height)
+        if block is None:
+            return self.block_store.read_json_bytes(height)
+        return block.to_json_bytes()
+
+    def hash_bytes(self, index: int) -> bytes:
+        """
+        Hash of the block at the index, as encoded by hash_to_bytes. Stored blocks are not read
+        :param index:
+        :return:
+        """
+        height = index + len(self) if index < 0 else index
+        if not 0 <= height < len(self):
+            raise IndexError('Chain index out of range')
+
+        if height >= self.stored_length:
+            return hash_to_bytes(self.blocks[height - self.stored_length].hash)
+        return self.block_store.hash_bytes(height)
+
+    def release_saved_blocks(self):
+        """
+        Called once the chain has been saved to the block store: the blocks appended since the chain was loaded
+        are read back from the store from now on, instead of kept in memory
+        """
+        for height, block in enumerate(self.blocks, self.stored_length):
+            self.cache.put(height, block)
+        self.stored_length = len(self)
+        self.blocks = []
+
+    def append(self, block: Block):
+        self.blocks.append(block)
+
+    def extend(self, blocks):
+        self.blocks.extend(blocks)
@@ -0,0 +1,134 @@
+import time
+from abc import ABC, abstractmethod
+
+from backend.blockchain.block import Block, NonceSearchPool
+from backend.blockchain.block_header import CURRENT_HEADER_VERSION, header_prefix, timestamped_header_prefix
+from backend.blockchain.proof_of_work import difficulty_to_target
+from backend.config import MINING_BATCH_SIZE, MINING_ENGINE, MINING_WORKERS
+
+
+class MiningEngine(ABC):
+    """
+    Finds the proof of work for the block that follows last_block.
+    Blockchain.add_block mines through the engine selected by the MINING_ENGINE setting
+    """
+    name = None
+
+    @abstractmethod
+    def search(self, last_block, stop_event=None):
+        """
+        Search for a hash meeting the proof of work requirement
+        :param last_block:
+        :param stop_event: threading.Event that aborts the search when set
+        :return: (timestamp, nonce, difficulty, hash), or None if the search was aborted
+        """
+
+    def mine(self, last_block, data: list, stop_event=None):
+        """
+        Mine a block holding data on top of last_block
+        :param last_block:
+        :param data:
+        :param stop_event: threading.Event that aborts mining when set
+        :return: a new block, or None if mining was aborted
+        """
+        result = self.search(last_block, stop_event)
+        if result is None:
+            return None
+
+        timestamp, nonce, difficulty, hash = result
+        return Block(timestamp, last_block.hash, hash, data, difficulty, nonce, CURRENT_HEADER_VERSION)
+
+    def close(self):
+        """
+        Release what the engine keeps between blocks, like worker processes
+        """
+
+
+class PythonMiningEngine(MiningEngine):
+    """
+    The plain loop of Block.mine_block. Checks the timestamp and difficulty on every nonce
+    """
+    name = 'python'
+
+    def search(self, last_block, stop_event=None):
+        block = Block.mine_block(last_block, None, stop_event=stop_event)
+        if block is None:
+            return None
+        return block.timestamp, block.nonce, block.difficulty, block.hash
+
+
+class BatchedMiningEngine(MiningEngine):
+    """
+    Tries nonces in batches that share one timestamp, so the timestamp, difficulty and header prefix
+    are only recomputed once per batch and the inner loop only hashes the nonce
+    """
+    name = 'batched'
+
+    def __init__(self, batch_size: int = MINING_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def search(self, last_block, stop_event=None):
+        last_hash = last_block.hash
+        nonce = 0
+        prefixes = {}
+
+        while True:
+            timestamp = time.time_ns()
+            difficulty = Block.adjust_difficulty(last_block, timestamp)
+            if difficulty not in prefixes:
+                # Digests compare like their integer values, as they all have the same length
+                target_bytes = difficulty_to_target(difficulty).to_bytes(33, 'big')[1:]
+                prefixes[difficulty] = (header_prefix(last_hash, difficulty), target_bytes)
+            prefix, target_bytes = prefixes[difficulty]
+            timestamped_prefix = timestamped_header_prefix(prefix, timestamp)
+
+            for candidate in range(nonce, nonce + self.batch_size):
+                sha256 = timestamped_prefix.copy()
+                sha256.update(candidate.to_bytes(8, 'big'))
+                digest = sha256.digest()
+                if digest < target_bytes:
+                    return timestamp, candidate, difficulty, digest.hex()
+
+            nonce += self.batch_size
+            if stop_event is not None and stop_event.is_set():
+                return None
+
+
+class MultiprocessMiningEngine(MiningEngine):
+    """
+    Splits the nonce space across a pool of worker processes
+    """
+    name = 'multiprocess'
+
+    def __init__(self, workers: int = MINING_WORKERS):
+        self.workers = workers
+        # Started on the first search and reused for the next blocks
+        self.search_pool = None
+
+    def search(self, last_block, stop_event=None):
+        if self.search_pool is None:
+            self.search_pool = NonceSearchPool(self.workers)
+
+        return self.search_pool.search(last_block, stop_event)
+
+    def close(self):
+        if self.search_pool is not None:
+            self.search_pool.close()
+            self.search_pool = None
+
+
+MINING_ENGINES = {
+    engine.name: engine for engine in (PythonMiningEngine, BatchedMiningEngine, MultiprocessMiningEngine)
+}
+
+
+def get_mining_engine(name: str = MINING_ENGINE) -> MiningEngine:
+    """
+    Create the mining engine registered under name
+    :param name:
+    :return:
+    """
+    if name not in MINING_ENGINES:
+        raise Exception(f'Unknown mining engine {name}. Choose one of {list(MINING_ENGINES)}')
+
+    return MINING_ENGINES[name]()
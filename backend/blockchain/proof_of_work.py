@@ -0,0 +1,69 @@
+import re
+
+HASH_BITS = 256
+# Hashes are lowercase hex digits, without prefix, separators or whitespace
+HEX_HASH = re.compile('[0-9a-f]*')
+
+
+def difficulty_to_target(difficulty: int) -> int:
+    """
+    Convert a difficulty (number of leading zero bits) into an integer target.
+    A 256 bit hash meets the difficulty when its integer value is below the target.
+    :param difficulty:
+    :return: target
+    """
+    return 1 << (HASH_BITS - min(max(difficulty, 0), HASH_BITS))
+
+
+def leading_zero_bits(hash_hex: str) -> int:
+    """
+    Count the leading zero bits of a hex hash, without building its binary string representation
+    :param hash_hex:
+    :return: number of leading zero bits
+    """
+    return len(hash_hex) * 4 - int(hash_hex, 16).bit_length()
+
+
+def digest_leading_zero_bits(digest: bytes) -> int:
+    """
+    Count the leading zero bits of a raw digest
+    :param digest:
+    :return: number of leading zero bits
+    """
+    return len(digest) * 8 - int.from_bytes(digest, 'big').bit_length()
+
+
+def hash_meets_target(hash_hex: str, target: int) -> bool:
+    """
+    Compare a 256 bit hex hash against a precomputed target. Used in the mining loop where the target rarely changes
+    :param hash_hex:
+    :param target:
+    :return:
+    """
+    return int(hash_hex, 16) < target
+
+
+def digest_meets_target(digest: bytes, target: int) -> bool:
+    """
+    Compare a raw 256 bit digest against a precomputed target
+    :param digest:
+    :param target:
+    :return:
+    """
+    return int.from_bytes(digest, 'big') < target
+
+
+def meets_difficulty(hash_hex: str, difficulty: int) -> bool:
+    """
+    Check the leading 0's proof of work requirement of a hash of any length.
+    Hashes that are not lowercase hex never meet the requirement, whatever int() would accept
+    :param hash_hex:
+    :param difficulty:
+    :return:
+    """
+    if not isinstance(hash_hex, str) or not HEX_HASH.fullmatch(hash_hex):
+        return False
+    if not hash_hex:
+        return difficulty <= 0
+
+    return leading_zero_bits(hash_hex) >= difficulty
@@ -0,0 +1,95 @@
+import json
+import os
+
+from backend.blockchain.block_header import hash_to_bytes
+from backend.blockchain.block_store import BlockStore
+from backend.blockchain.chain_state import ChainState
+from backend.config import STATE_SNAPSHOTS_KEPT
+
+SNAPSHOTS_DIRECTORY_NAME = 'snapshots'
+SNAPSHOT_FILE_NAME = 'snapshot-{:010d}.json'
+
+
+class StateSnapshots:
+    """
+    Snapshots of the chain state, kept in a directory next to the block store.
+    A snapshot records the tip hash and height it was taken at, so it is only loaded for a chain that still
+    contains that tip. The blocks after it are then replayed, instead of the whole chain
+    """
+
+    def __init__(self, directory: str, kept: int = STATE_SNAPSHOTS_KEPT):
+        self.directory = directory
+        self.kept = kept
+
+    @staticmethod
+    def for_block_store(block_store: BlockStore):
+        """
+        Snapshots of the chain kept in the block store
+        :param block_store:
+        :return:
+        """
+        return StateSnapshots(os.path.join(block_store.directory, SNAPSHOTS_DIRECTORY_NAME))
+
+    def snapshot_path(self, height: int):
+        return os.path.join(self.directory, SNAPSHOT_FILE_NAME.format(height))
+
+    def heights(self) -> list[int]:
+        """
+        Heights of the saved snapshots, latest first
+        :return:
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        heights = []
+        for file_name in os.listdir(self.directory):
+            prefix, _, suffix = SNAPSHOT_FILE_NAME.partition('{:010d}')
+            if file_name.startswith(prefix) and file_name.endswith(suffix):
+                try:
+                    heights.append(int(file_name[len(prefix):-len(suffix)]))
+                except ValueError:
+                    pass
+        return sorted(heights, reverse=True)
+
+    def save(self, state: ChainState, tip_hash: str):
+        """
+        Write a snapshot of the state at the tip, then delete the oldest snapshots beyond the number kept.
+        The snapshot is written to a temporary file first, so a crash never leaves a partial snapshot
+        :param state:
+        :param tip_hash:
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.snapshot_path(state.height)
+        with open(f'{path}.tmp', 'w') as f:
+            f.write(json.dumps({'tip_hash': tip_hash, **state.to_json()}))
+        os.replace(f'{path}.tmp', path)
+
+        for height in self.heights()[self.kept:]:
+            os.remove(self.snapshot_path(height))
+
+    def load(self, block_store: BlockStore):
+        """
+        Load the latest snapshot taken at a block that is still in the block store
+        :param block_store:
+        :return: ChainState, or None if no snapshot matches
+        """
+        for height in self.heights():
+            if not 0 < height <= len(block_store):
+                continue
+
+            try:
+                with open(self.snapshot_path(height), 'r') as f:
+                    snapshot = json.loads(f.read())
+            except (OSError, ValueError):
+                continue
+
+            if block_store.hash_bytes(height - 1) != hash_to_bytes(snapshot['tip_hash']):
+                continue
+
+            try:
+                return ChainState.from_json(snapshot)
+            except KeyError:
+                # Written by a version that kept less state. The state is rebuilt from the chain instead
+                continue
+
+        return None
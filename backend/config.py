@@ -5,6 +5,65 @@ SECONDS = 1000 * MILLISECONDS
 
 # Mining settings
 MINE_RATE = 4 * SECONDS
+# Mining engine used by Blockchain.add_block: 'python', 'batched' or 'multiprocess'
+MINING_ENGINE = 'python'
+# Number of processes the 'multiprocess' engine splits the nonce search across
+MINING_WORKERS = 1
+# Number of nonces the 'batched' engine tries with the same timestamp
+MINING_BATCH_SIZE = 1000
+
+# Signature verification settings
+# Pool workers that verify transaction signatures during chain validation. 1 verifies on the calling thread
+SIGNATURE_VERIFICATION_WORKERS = 1
+# Number of signatures handed to a worker at a time
+SIGNATURE_VERIFICATION_BATCH_SIZE = 64
+# 'process' or 'thread'
+SIGNATURE_VERIFICATION_POOL = 'process'
+# Memory limit of the cache of already verified signatures, in bytes
+SIGNATURE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+# Number of loaded public keys kept, to skip parsing the keys of active addresses again
+PUBLIC_KEY_CACHE_SIZE = 1024
+
+# Block store settings
+# Size at which the block store starts a new segment file, in bytes
+BLOCK_STORE_SEGMENT_SIZE = 16 * 1024 * 1024
+# Flush every appended block to the disk, so that a crash loses at most the block being written
+BLOCK_STORE_FSYNC = True
+# Load the chain lazily at startup: blocks are read from the memory mapped block store when they are accessed
+LAZY_CHAIN_LOADING = True
+# Number of blocks read from the block store that are kept in memory, when the chain is loaded lazily
+BLOCK_CACHE_SIZE = 1024
+# Number of blocks between snapshots of the chain state, written next to the block store
+STATE_SNAPSHOT_INTERVAL = 100
+# Number of latest snapshots kept
+STATE_SNAPSHOTS_KEPT = 2
+
+# Peer sync settings
+# Number of blocks added by a streaming chain sync between saves of the chain
+SYNC_SAVE_INTERVAL = 500
+# Most incoming blocks held in memory past the fork point until the incoming chain is longer than the local one.
+# Forks deeper than this are rejected, so the memory of a sync stays bounded
+SYNC_MAX_FORK_DEPTH = 1000
+# Number of recent headers first compared to find the fork point with a peer chain, doubled until found
+FORK_SEARCH_WINDOW = 16
+# Seconds to wait for a peer to connect, and between the bytes of its responses, before giving up the sync
+PEER_REQUEST_TIMEOUT = 10
+
+# API settings
+# Most blocks returned by a /blockchain/range request
+BLOCKCHAIN_RANGE_LIMIT = 100
+# Most block headers returned by a /blockchain/headers request
+HEADERS_LIMIT = 2000
+# Most transactions returned by an /address/<address>/transactions request
+ADDRESS_TRANSACTIONS_LIMIT = 100
+
+# Transaction pool settings
+# Most transactions waiting in the pool
+TRANSACTION_POOL_MAX_ENTRIES = 10000
+# Most bytes of transactions waiting in the pool, estimated from the length of their JSON
+TRANSACTION_POOL_MAX_BYTES = 16 * 1024 * 1024
+# Transaction evicted when the pool is full: 'oldest' or 'lowest_amount'
+TRANSACTION_POOL_EVICTION = 'oldest'
 
 # Wallet settings
 STARTING_BALANCE = 1000
@@ -0,0 +1,122 @@
+import threading
+import time
+
+from backend.blockchain.blockchain import Blockchain
+from backend.config import SECONDS
+from backend.wallet.transaction import Transaction
+from backend.wallet.transaction_pool import TransactionPool
+from backend.wallet.wallet import Wallet
+
+
+class Miner:
+    """
+    Mines blocks on a background thread, so that API requests are not blocked while a hash is searched for.
+    Mining of a block is aborted and restarted on the new tip whenever the chain is replaced by a peer's chain,
+    so no work is spent extending a stale tip
+    """
+
+    def __init__(self, blockchain: Blockchain, transaction_pool: TransactionPool, wallet: Wallet, pubsub=None):
+        self.blockchain = blockchain
+        self.transaction_pool = transaction_pool
+        self.wallet = wallet
+        self.pubsub = pubsub  # set once the pubsub layer is up, to broadcast mined blocks
+
+        self.thread = None
+        self.running = False
+        self.abort_event = threading.Event()  # aborts the block currently being mined
+        self.lock = threading.Lock()  # start and stop one at a time
+
+        self.blocks_mined = 0
+        self.restarts = 0
+        self.mining_height = None
+        self.mining_started_at = None
+        self.last_block_hash = None
+        self.last_block_hashrate = None
+
+    def start(self):
+        """
+        Start mining on the background thread, if not already mining
+        """
+        with self.lock:
+            if self.running:
+                return
+
+            self.running = True
+            self.abort_event.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """
+        Abort the block being mined and wait for the background thread to finish
+        """
+        with self.lock:
+            # running is cleared before the abort event is set, see run
+            self.running = False
+            self.abort_event.set()
+            if self.thread:
+                self.thread.join()
+                self.thread = None
+
+    def restart(self):
+        """
+        Abort the block being mined. Mining restarts on the current tip of the chain.
+        Called when a block from a peer has been accepted
+        """
+        if self.running:
+            self.abort_event.set()
+
+    def run(self):
+        while self.running:
+            # Clear before reading the tip, so that a tip change after this point always aborts the attempt
+            self.abort_event.clear()
+            # A stop between the loop check and the clear would be wiped out by the clear, so check again
+            if not self.running:
+                break
+            last_block = self.blockchain.chain[-1]
+
+            transaction_data = self.transaction_pool.transaction_data()
+            transaction_data.append(Transaction.reward_transaction(self.wallet).to_json())
+
+            self.mining_height = len(self.blockchain.chain)
+            self.mining_started_at = time.time_ns()
+            block = self.blockchain.mining_engine.mine(last_block, transaction_data, self.abort_event)
+
+            if block is None:
+                if self.running:
+                    self.restarts += 1
+                continue
+
+            try:
+                self.blockchain.append_block(block)
+            except Exception as e:
+                print(f'\n -- Discarded mined block: {e}')
+                self.restarts += 1
+                continue
+
+            self.blocks_mined += 1
+            self.last_block_hash = block.hash
+            self.last_block_hashrate = (block.nonce + 1) / max((time.time_ns() - self.mining_started_at) / SECONDS, 1e-9)
+
+            if self.pubsub:
+                self.pubsub.broadcast_block(block)
+            self.blockchain.save_to_file()
+
+    def status(self) -> dict:
+        """
+        Progress of the miner
+        :return:
+        """
+        mining_seconds = None
+        if self.running and self.mining_started_at:
+            mining_seconds = (time.time_ns() - self.mining_started_at) / SECONDS
+
+        return {
+            'running': self.running,
+            'mining_height': self.mining_height if self.running else None,
+            'mining_seconds': mining_seconds,
+            'blocks_mined': self.blocks_mined,
+            'restarts': self.restarts,
+            'last_block_hash': self.last_block_hash,
+            'last_block_hashrate': self.last_block_hashrate
+        }
@@ -25,31 +25,37 @@ CHANNELS = {
 
 class Listener(SubscribeCallback):
 
-    def __init__(self, blockchain: Blockchain, transaction_pool: TransactionPool, my_url: str):
+    def __init__(self, blockchain: Blockchain, transaction_pool: TransactionPool, my_url: str, miner=None):
         self.blockchain = blockchain
         self.transaction_pool = transaction_pool
         self.my_url = my_url
+        self.miner = miner
 
     def message(self, pubnub, message_object):
         print(f'\n--Channel: {message_object.channel} | Message: {message_object.message}')
 
         if message_object.channel == CHANNELS['BLOCK']:
             block: dict = message_object.message
-            potential_chain = self.blockchain.chain[:]  # make an exact copy of the existing blockchain list
-            potential_chain.append(Block.from_json(block))  # The block must be a valid block instance
 
             try:
-                self.blockchain.replace_chain(potential_chain)
-                # Sync the transaction pool to have cleared transactions correctly
-                self.transaction_pool.clear_blockchain_transactions(self.blockchain)
+                # The block must be a valid block instance, extending the tip of the local chain
+                self.blockchain.receive_block(Block.from_json(block))
                 self.blockchain.save_to_file()
+                # Stop extending the old tip
+                if self.miner:
+                    self.miner.restart()
                 print('\n -- Successfully replaced the local chain')
             except Exception as e:
                 print(f'\n -- Did not replace chain: {e}')
 
         elif message_object.channel == CHANNELS['TRANSACTION']:
             transaction = Transaction.from_json(message_object.message)
-            self.transaction_pool.set_transaction(transaction)
+            try:
+                # Verified signatures are cached, so the transaction is not verified again when its block arrives
+                Transaction.is_valid_transaction(transaction)
+                self.transaction_pool.set_transaction(transaction)
+            except Exception as e:
+                print(f'\n -- Rejected transaction: {e}')
 
         elif message_object.channel == CHANNELS['NEW_CONNECTION']:
             peer_url = message_object.message
@@ -64,10 +70,10 @@ class PubSub:
     Provides communication between the nodes in the blockchain network
     """
 
-    def __init__(self, blockchain: Blockchain, transaction_pool: TransactionPool, my_url: str):
+    def __init__(self, blockchain: Blockchain, transaction_pool: TransactionPool, my_url: str, miner=None):
         self.pubnub = PubNub(pnconfig)
         self.pubnub.subscribe().channels(CHANNELS.values()).execute()
-        self.pubnub.add_listener(Listener(blockchain, transaction_pool, my_url))
+        self.pubnub.add_listener(Listener(blockchain, transaction_pool, my_url, miner))
 
     def publish(self, channel, message):
         """
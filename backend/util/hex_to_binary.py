@@ -23,7 +23,8 @@ HEX_TO_BINARY_CONVERSION_TABLE = {
 def hex_to_binary(hex_string):
     """
     Function needed to make the difficulty check more precise since checking the leading 0's in a hex value
-    is not as precise
+    is not as precise.
+    No longer used for mining, see backend.blockchain.proof_of_work. Kept as the reference the tests check it against
     :param hex_string:
     :return:
     """
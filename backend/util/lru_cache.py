@@ -0,0 +1,98 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# Rough per entry overhead of the OrderedDict holding the entries, in bytes
+ENTRY_OVERHEAD = 100
+
+
+class LRUCache:
+    """
+    Least recently used cache, bounded by a number of entries and/or an estimate of the memory its entries take.
+    Counts hits, misses and evictions
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Estimates the memory of an entry, in bytes
+        self.sizeof = sizeof or (lambda key, value: sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD)
+
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """
+        Return the cached value and mark it as most recently used
+        :param key:
+        :param default: returned on a miss
+        :return:
+        """
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        """
+        Cache a value, evicting the least recently used entries if the cache is full
+        :param key:
+        :param value:
+        """
+        size = self.sizeof(key, value)
+
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.sizes[key]
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self.sizes[key] = size
+            self.bytes += size
+
+            while self.entries and self.is_full():
+                evicted_key, _ = self.entries.popitem(last=False)
+                self.bytes -= self.sizes.pop(evicted_key)
+                self.evictions += 1
+
+    def is_full(self):
+        if self.max_entries is not None and len(self.entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.bytes > self.max_bytes
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Counters of the cache
+        :return:
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else None
+        }
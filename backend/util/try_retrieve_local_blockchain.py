@@ -1,21 +1,77 @@
 import json
 import os
+import shutil
 
+from backend.blockchain.block import Block
+from backend.blockchain.block_store import BlockStore
 from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.lazy_chain import LazyChain
+from backend.config import LAZY_CHAIN_LOADING
 
 
-def try_retrieve_local_blockchain(file_path) -> Blockchain:
-    if not file_path:
+def try_retrieve_local_blockchain(store_path, legacy_file_path=None, lazy=LAZY_CHAIN_LOADING) -> Blockchain:
+    """
+    Load the blockchain kept in the block store at store_path.
+    A chain saved by older versions as a single JSON file at legacy_file_path is migrated into an empty store,
+    see migrate_legacy_file.
+    The chain state is restored from the latest matching snapshot, and only the blocks after it are validated
+    :param store_path: directory of the block store
+    :param legacy_file_path:
+    :param lazy: read the blocks from the store when they are accessed, instead of loading them all up front
+    :return: blockchain saving to the block store
+    """
+    if not store_path:
         return Blockchain()
 
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            result_text = f.read()
-            resulting_blockchain = json.loads(result_text) if result_text else None
-            return Blockchain.from_json(resulting_blockchain)
+    block_store = BlockStore(store_path)
+    if block_store.repaired:
+        print("Repaired the incomplete tail of the local block store")
 
-    return Blockchain()
+    if not len(block_store) and legacy_file_path and os.path.exists(legacy_file_path):
+        block_store.close()
+        migrate_legacy_file(store_path, legacy_file_path)
+        block_store = BlockStore(store_path)
+        print("Migrated the local JSON blockchain file to the block store")
 
+    if not len(block_store):
+        block_store.append(Block.genesis())
 
+    blockchain = Blockchain(LazyChain(block_store) if lazy else block_store.read_all(), block_store)
 
+    state = blockchain.snapshots.load(block_store)
+    if state:
+        # restore_state applies the blocks after the snapshot to the state
+        snapshot_height = state.height
+        try:
+            blockchain.restore_state(state)
+            print(f"Restored the chain state from the snapshot at height {snapshot_height}")
+        except Exception as e:
+            print(f"Dropped the blocks after the state snapshot at height {snapshot_height}: {e}")
+            blockchain.save_to_file()
 
+    return blockchain
+
+
+def migrate_legacy_file(store_path, legacy_file_path):
+    """
+    Move a chain saved as a single JSON file into the empty block store at store_path.
+    The blocks are written to a temporary store that replaces the empty one once complete, and only then is the
+    JSON file renamed. A migration interrupted by a crash leaves the store empty and the JSON file in place,
+    so it is redone from the start on the next load
+    :param store_path:
+    :param legacy_file_path:
+    """
+    migrating_path = f'{store_path}.migrating'
+    shutil.rmtree(migrating_path, ignore_errors=True)
+
+    with open(legacy_file_path, 'r') as f:
+        result_text = f.read()
+
+    migrating_store = BlockStore(migrating_path)
+    for block_json in json.loads(result_text) if result_text else []:
+        migrating_store.append(Block.from_json(block_json))
+    migrating_store.close()
+
+    shutil.rmtree(store_path, ignore_errors=True)
+    os.replace(migrating_path, store_path)
+    os.replace(legacy_file_path, f'{legacy_file_path}.migrated')
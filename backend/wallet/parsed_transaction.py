@@ -0,0 +1,35 @@
+from backend.config import MINING_REWARD_INPUT
+
+
+class ParsedTransaction:
+    """
+    Transaction of a block, parsed once from its JSON representation.
+    Holds the fields the chain state and the API look at, precomputed, so the loops over the transactions of the chain
+    do not walk the nested transaction dicts again.
+    The input and output dicts are the ones of the JSON representation and must not be changed
+    """
+    __slots__ = ('id', 'input', 'output', 'is_reward', 'sender', 'input_amount', 'outputs', 'addresses')
+    FIELDS = ('id', 'input', 'output')
+
+    def __init__(self, transaction_json: dict):
+        """
+        :param transaction_json:
+        :raise: Exception if the transaction has fields other than id, input and output
+        """
+        unknown_fields = set(transaction_json).difference(ParsedTransaction.FIELDS)
+        if unknown_fields:
+            raise Exception(f'Unknown transaction fields {sorted(unknown_fields)}')
+
+        self.id: str = transaction_json['id']
+        self.input: dict = transaction_json['input']
+        self.output: dict = transaction_json['output']
+        self.is_reward: bool = self.input == MINING_REWARD_INPUT
+        self.sender: str = self.input['address']
+        self.input_amount = self.input.get('amount')
+        # (address, amount) pairs of the output
+        self.outputs: tuple = tuple(self.output.items())
+        # Addresses receiving an output, including the change output of the sender
+        self.addresses: tuple = tuple(self.output)
+
+    def __repr__(self):
+        return f'ParsedTransaction({self.id})'
@@ -0,0 +1,99 @@
+import atexit
+import json
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from backend.config import (
+    SIGNATURE_VERIFICATION_BATCH_SIZE,
+    SIGNATURE_VERIFICATION_POOL,
+    SIGNATURE_VERIFICATION_WORKERS
+)
+from backend.wallet.wallet import SIGNATURE_CACHE, Wallet
+
+POOLS = {
+    'process': ProcessPoolExecutor,
+    'thread': ThreadPoolExecutor
+}
+
+# Executors are started on first use and reused by every verification, by pool kind and number of workers
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _executor(pool: str, workers: int):
+    with _executors_lock:
+        if (pool, workers) not in _executors:
+            _executors[(pool, workers)] = POOLS[pool](workers)
+        return _executors[(pool, workers)]
+
+
+@atexit.register
+def shutdown_executors():
+    """
+    Stop the workers of the verification pools, dropping the batches that have not started
+    """
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+def _first_invalid(signatures):
+    for i, (public_key, data, signature) in enumerate(signatures):
+        if not Wallet.verify(public_key, data, signature):
+            return i
+    return None
+
+
+def first_invalid_signature(
+        signatures: list,
+        workers: int = SIGNATURE_VERIFICATION_WORKERS,
+        batch_size: int = SIGNATURE_VERIFICATION_BATCH_SIZE,
+        pool: str = SIGNATURE_VERIFICATION_POOL
+):
+    """
+    Verify signatures in batches on a pool of workers.
+    Batches are handed out in order, a few per worker at a time, so no new batches are started once an invalid
+    signature has been found, and the batches handed out but not started are cancelled.
+    The pool is started on first use and reused
+    :param signatures: list of (public_key, data, signature)
+    :param workers: number of pool workers. With 1 worker, or a single batch, verify on the calling thread
+    :param batch_size: number of signatures handed to a worker at a time
+    :param pool: 'process' or 'thread'
+    :return: index of the first invalid signature, or None if all are valid
+    """
+    if workers <= 1 or len(signatures) <= batch_size:
+        return _first_invalid(signatures)
+
+    # Signatures verified before are not sent to the pool, and the ones the pool verifies are cached here,
+    # since the workers' caches are not shared with this process
+    cache_keys = [
+        Wallet.signature_cache_key(public_key, json.dumps(data).encode('utf-8'), signature)
+        for public_key, data, signature in signatures
+    ]
+    pending = [i for i, cache_key in enumerate(cache_keys) if not SIGNATURE_CACHE.get(cache_key)]
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    next_batch = 0
+    in_flight = deque()
+
+    executor = _executor(pool, workers)
+    while next_batch < len(batches) or in_flight:
+        while next_batch < len(batches) and len(in_flight) < 2 * workers:
+            batch_signatures = [signatures[i] for i in batches[next_batch]]
+            in_flight.append(executor.submit(_first_invalid, batch_signatures))
+            next_batch += 1
+
+        batch = batches[next_batch - len(in_flight)]
+        invalid = in_flight.popleft().result()
+        if invalid is not None:
+            # Not waited for: batches already running finish on their own, and their results are dropped
+            for future in in_flight:
+                future.cancel()
+            return batch[invalid]
+
+        for i in batch:
+            SIGNATURE_CACHE.put(cache_keys[i], True)
+
+    return None
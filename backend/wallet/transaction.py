@@ -4,6 +4,12 @@ import uuid
 from backend.config import MINING_REWARD, MINING_REWARD_INPUT
 from backend.wallet.wallet import Wallet
 
+# Inputs without a version carry the PEM public key of the sender
+LEGACY_INPUT_VERSION = 1
+# Inputs carrying the hex of the compressed point of the sender's public key
+COMPACT_INPUT_VERSION = 2
+INPUT_VERSIONS = (LEGACY_INPUT_VERSION, COMPACT_INPUT_VERSION)
+
 
 class Transaction:
     """
@@ -54,6 +60,7 @@ class Transaction:
         structure input data for the transaction
         Sign the transaction and include sender's public key and address
         Input name might be misleading, but it is the signed input that will go into the blockchain.
+        The public key is stored in the compact format. Inputs without a version hold a PEM public key
         :param sender_wallet:
         :param output: Is the actual transactional data
         :return:
@@ -62,8 +69,9 @@ class Transaction:
             'timestamp': time.time_ns(),
             'amount': sender_wallet.balance,
             'address': sender_wallet.address,
-            'public_key': sender_wallet.public_key,
-            'signature': sender_wallet.sign(output)
+            'public_key': sender_wallet.compact_public_key,
+            'signature': sender_wallet.sign(output),
+            'version': COMPACT_INPUT_VERSION
         }
 
     def update(self, sender_wallet: Wallet, recipient, amount: float):
@@ -88,11 +96,12 @@ class Transaction:
         self.input = self.create_input(sender_wallet, self.output)
 
     @staticmethod
-    def is_valid_transaction(transaction):
+    def is_valid_transaction(transaction, verify_signature=True):
         """
         Validate a transaction
         Raise exception if transaction is invalid
-        :param transaction:
+        :param transaction: Transaction, or ParsedTransaction of a block
+        :param verify_signature: chain validation verifies the signatures separately, in batches
         :raise: Exception
         """
         if transaction.input == MINING_REWARD_INPUT:
@@ -105,13 +114,42 @@ class Transaction:
         if transaction.input['amount'] != output_total:
             raise Exception("Invalid transaction output values")
 
-        if not Wallet.verify(
+        Transaction.validate_input_public_key(transaction.input)
+
+        if verify_signature and not Wallet.verify(
                 transaction.input['public_key'],
                 transaction.output,
                 transaction.input['signature']
         ):
             raise Exception("Invalid transaction signature")
 
+    @staticmethod
+    def validate_input_public_key(transaction_input: dict):
+        """
+        Check the public key of a transaction input against the version of the input and the sender address
+        1. Inputs without a version, or of the legacy version, must carry a PEM public key
+        2. Inputs of the compact version must carry a compact public key
+        3. The sender address must be the address of the public key
+        :param transaction_input:
+        :raise: Exception
+        """
+        version = transaction_input.get('version', LEGACY_INPUT_VERSION)
+        if version not in INPUT_VERSIONS:
+            raise Exception(f'Unknown transaction input version {version}')
+
+        public_key = transaction_input['public_key']
+        if not isinstance(public_key, str):
+            raise Exception("Invalid transaction public key")
+        if Wallet.is_pem_public_key(public_key) != (version == LEGACY_INPUT_VERSION):
+            raise Exception(f'The transaction public key is not in the format of input version {version}')
+
+        try:
+            address = Wallet.address_from_public_key(public_key)
+        except ValueError:
+            raise Exception("Invalid transaction public key")
+        if address != transaction_input['address']:
+            raise Exception("The transaction address is not the address of its public key")
+
     def to_json(self):
         """
         Converts a transaction instance to a json
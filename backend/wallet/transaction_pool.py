@@ -1,50 +1,265 @@
+import copy
+import heapq
+import itertools
+import json
+import threading
+
+from backend.config import (
+    MINING_REWARD_INPUT, TRANSACTION_POOL_EVICTION, TRANSACTION_POOL_MAX_BYTES, TRANSACTION_POOL_MAX_ENTRIES
+)
 from backend.wallet.transaction import Transaction
 
+# Evict the transaction that entered the pool first
+EVICT_OLDEST = 'oldest'
+# Evict the transaction sending the lowest amount. Transactions carry no fee, so the amount is their priority
+EVICT_LOWEST_AMOUNT = 'lowest_amount'
+EVICTION_POLICIES = (EVICT_OLDEST, EVICT_LOWEST_AMOUNT)
+
 
 class TransactionPool:
-    def __init__(self):
+    """
+    Transactions waiting to be mined into a block.
+    The pool is bounded by a number of transactions and an estimate of their size in bytes. Once full, a transaction
+    is evicted to admit a new one, following the eviction policy. With the lowest amount policy, a transaction
+    sending less than every pooled one is rejected instead.
+    Transactions are indexed by sender address, and admissions, evictions and rejections are counted
+    """
+
+    def __init__(
+            self,
+            max_entries: int = TRANSACTION_POOL_MAX_ENTRIES,
+            max_bytes: int = TRANSACTION_POOL_MAX_BYTES,
+            eviction: str = TRANSACTION_POOL_EVICTION
+    ):
+        if eviction not in EVICTION_POLICIES:
+            raise Exception(f'Unknown transaction pool eviction policy {eviction}')
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+
+        # Transactions by id, in the order they were admitted
         self.transaction_map: dict[str, Transaction] = {}
+        # Ids of the pooled transactions of each sender address, in the order they were admitted
+        self.sender_index: dict[str, dict[str, None]] = {}
+        # Admission number, estimated size in bytes and amount sent of each pooled transaction, by id
+        self.entries: dict[str, tuple[int, int, int]] = {}
+        # (amount, admission number, id) of the pooled transactions, for the lowest amount policy.
+        # Entries of transactions removed since are skipped when they come up
+        self.amount_heap: list[tuple[int, int, str]] = []
+        self.admission_numbers = itertools.count()
+        self.bytes = 0
+
+        self.admissions = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.transaction_map)
 
     def set_transaction(self, transaction: Transaction):
         """
-        Set a transaction in the transaction pool
+        Set a transaction in the transaction pool, replacing the pooled transaction with the same id.
+        Transactions are evicted to make room for it if the pool is full
         :param transaction:
-        :return:
+        :raise: Exception if the transaction is rejected, in which case it is left out of the pool
+        """
+        size = TransactionPool.transaction_size(transaction)
+        amount = TransactionPool.amount_sent(transaction)
+
+        with self.lock:
+            if size > self.max_bytes or self.max_entries < 1:
+                self.rejections += 1
+                raise Exception("Transaction rejected. It does not fit in the transaction pool")
+
+            self.remove_transaction(transaction.id)
+
+            if self.eviction == EVICT_LOWEST_AMOUNT:
+                lowest = self._lowest_amount_entry()
+                if self._is_full(size) and lowest is not None and amount <= lowest[0]:
+                    self.rejections += 1
+                    raise Exception("Transaction rejected. The transaction pool is full of higher amounts")
+
+            while self._is_full(size):
+                self._evict()
+
+            admission_number = next(self.admission_numbers)
+            self.transaction_map[transaction.id] = transaction
+            self.sender_index.setdefault(transaction.input['address'], {})[transaction.id] = None
+            self.entries[transaction.id] = (admission_number, size, amount)
+            self.bytes += size
+            if self.eviction == EVICT_LOWEST_AMOUNT:
+                heapq.heappush(self.amount_heap, (amount, admission_number, transaction.id))
+            self.admissions += 1
+
+    def remove_transaction(self, transaction_id: str):
+        """
+        Remove a transaction from the pool, if it is there
+        :param transaction_id:
+        :return: the removed transaction, or None
+        """
+        with self.lock:
+            transaction = self.transaction_map.pop(transaction_id, None)
+            if transaction is None:
+                return None
+
+            sender_ids = self.sender_index[transaction.input['address']]
+            del sender_ids[transaction_id]
+            if not sender_ids:
+                del self.sender_index[transaction.input['address']]
+
+            _, size, _ = self.entries.pop(transaction_id)
+            self.bytes -= size
+
+            # Drop the entries of removed transactions once they outnumber the pooled ones
+            if len(self.amount_heap) > 2 * len(self.transaction_map) + 64:
+                self.amount_heap = [entry for entry in self.amount_heap if self._is_pooled(entry)]
+                heapq.heapify(self.amount_heap)
+
+            return transaction
+
+    def update_transaction(self, transaction: Transaction, sender_wallet, recipient, amount):
+        """
+        Update a pooled transaction with an existing or new recipient, see Transaction.update, and set it in the pool
+        again, so its size and amount are counted anew
+        :param transaction:
+        :param sender_wallet:
+        :param recipient:
+        :param amount:
+        :raise: Exception if the update is invalid, in which case the transaction is unchanged, or if the updated
+            transaction is rejected, in which case it is left out of the pool
         """
-        self.transaction_map[transaction.id] = transaction
+        with self.lock:
+            transaction.update(sender_wallet, recipient, amount)
+            self.set_transaction(transaction)
 
     def existing_transaction(self, address):
         """
-        Find a transaction generated by the address in the transaction pool
+        Find a transaction generated by the address in the transaction pool, through the sender index
         :param address:
         :return:
         """
-        for transaction in self.transaction_map.values():
-            if transaction.input['address'] == address:
-                return transaction
+        with self.lock:
+            sender_ids = self.sender_index.get(address)
+            if sender_ids:
+                return self.transaction_map[next(iter(sender_ids))]
 
     def transaction_data(self):
         """
-        Return the transactions of the transaction poool represented in their JSON format
+        Return the transactions of the transaction poool represented in their JSON format.
+        They are copies, as a pooled transaction of the wallet is updated in place
         :return:
         """
-        return list(map(
-                lambda transaction: transaction.to_json(),
-                self.transaction_map.values()
-        ))
+        with self.lock:
+            return list(map(
+                    lambda transaction: copy.deepcopy(transaction.to_json()),
+                    self.transaction_map.values()
+            ))
+
+    def update_for_blocks(self, removed_blocks: list, added_blocks: list, state):
+        """
+        Follow a change of the chain, as a Blockchain listener. Transactions of the added blocks are deleted from the
+        pool, and transactions of the removed blocks are admitted again, so they can be mined on the new tip, if they
+        are still valid on the new chain: not on it already, and spending the current balance of their sender.
+        Only the transactions of the changed blocks are looked at
+        :param removed_blocks: blocks removed from the tip
+        :param added_blocks: blocks added on top of the fork point
+        :param state: state of the chain after the change
+        """
+        transaction_ids = state.transaction_ids
+        with self.lock:
+            for block in added_blocks:
+                for transaction in block.transactions:
+                    if not transaction.is_reward:
+                        self.remove_transaction(transaction.id)
+
+            for block in reversed(removed_blocks):
+                for transaction_json in block.data:
+                    if transaction_json['input'] == MINING_REWARD_INPUT or transaction_json['id'] in transaction_ids:
+                        continue
+                    # Copied, as a pooled transaction of the wallet is updated in place
+                    transaction = Transaction.from_json(copy.deepcopy(transaction_json))
+                    try:
+                        if state.balance(transaction.input['address']) != transaction.input['amount']:
+                            raise Exception("The sender balance changed on the new chain")
+                        self.set_transaction(transaction)
+                    except Exception as e:
+                        print(f'\n -- Did not return orphaned transaction {transaction.id} to the pool: {e}')
 
     def clear_blockchain_transactions(self, blockchain):
         """
-        Delete blockchain transactions recorded in the transaction pool
+        Delete blockchain transactions recorded in the transaction pool.
+        Looked up in the transaction ids the chain state keeps, instead of reading every block of the chain.
+        Pools following the chain through update_for_blocks do not need this
         :param blockchain:
         :return:
         """
-        for block in blockchain.chain:
-            for transaction in block.data:
-                try:
-                    del self.transaction_map[transaction['id']]
-                except KeyError:
-                    pass
+        transaction_ids = blockchain.synced_state().transaction_ids
+        with self.lock:
+            for transaction_id in list(self.transaction_map):
+                if transaction_id in transaction_ids:
+                    self.remove_transaction(transaction_id)
+
+    def stats(self) -> dict:
+        """
+        Size of the pool, and counts of the transactions admitted, evicted and rejected
+        :return:
+        """
+        return {
+            'transactions': len(self.transaction_map),
+            'bytes': self.bytes,
+            'max_transactions': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'eviction': self.eviction,
+            'admissions': self.admissions,
+            'evictions': self.evictions,
+            'rejections': self.rejections
+        }
 
+    def _is_full(self, size: int) -> bool:
+        """
+        Whether a transaction of the size does not fit next to the pooled ones
+        """
+        return len(self.transaction_map) >= self.max_entries or self.bytes + size > self.max_bytes
 
+    def _is_pooled(self, amount_entry) -> bool:
+        _, admission_number, transaction_id = amount_entry
+        entry = self.entries.get(transaction_id)
+        return entry is not None and entry[0] == admission_number
 
+    def _lowest_amount_entry(self):
+        """
+        :return: heap entry of the pooled transaction sending the lowest amount, or None if the pool is empty
+        """
+        while self.amount_heap and not self._is_pooled(self.amount_heap[0]):
+            heapq.heappop(self.amount_heap)
+        return self.amount_heap[0] if self.amount_heap else None
+
+    def _evict(self):
+        if self.eviction == EVICT_LOWEST_AMOUNT:
+            transaction_id = self._lowest_amount_entry()[2]
+        else:
+            transaction_id = next(iter(self.transaction_map))
+
+        self.remove_transaction(transaction_id)
+        self.evictions += 1
+
+    @staticmethod
+    def transaction_size(transaction: Transaction) -> int:
+        """
+        Estimate of the memory a pooled transaction takes: the length of its JSON representation
+        :param transaction:
+        :return: bytes
+        """
+        return len(json.dumps(transaction.to_json()))
+
+    @staticmethod
+    def amount_sent(transaction: Transaction) -> int:
+        """
+        Total amount the transaction sends to addresses other than the sender
+        :param transaction:
+        :return:
+        """
+        sender = transaction.input['address']
+        return sum(amount for address, amount in transaction.output.items() if address != sender)
@@ -1,8 +1,9 @@
+import hashlib
 import json
 import os
 import uuid
 
-from backend.config import STARTING_BALANCE
+from backend.config import PUBLIC_KEY_CACHE_SIZE, SIGNATURE_CACHE_MAX_BYTES, STARTING_BALANCE
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.asymmetric import ec  # Elliptic curve key value pairing
 from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature, decode_dss_signature
@@ -10,6 +11,14 @@ from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.exceptions import InvalidSignature
 
 from backend.util.crypto_hash import crypto_hash
+from backend.util.lru_cache import LRUCache
+
+# Digests of (public key, signed data, signature) of signatures that have already been verified
+SIGNATURE_CACHE = LRUCache(max_bytes=SIGNATURE_CACHE_MAX_BYTES)
+# Serialised public keys to their loaded key objects. A few active addresses send most transactions
+PUBLIC_KEY_CACHE = LRUCache(max_entries=PUBLIC_KEY_CACHE_SIZE)
+# Serialised public keys to their addresses, checked against the sender address of every transaction
+ADDRESS_CACHE = LRUCache(max_entries=PUBLIC_KEY_CACHE_SIZE)
 
 
 class Wallet:
@@ -26,6 +35,7 @@ class Wallet:
             default_backend()
         )  # same standard as BTC
         self.public_key: str = self.serialize_public_key()
+        self.compact_public_key: str = self.serialize_compact_public_key()  # what transaction inputs carry
         self.address: str = crypto_hash(self.serialize_public_key())  # Create the address from the hashed public key
 
     @property
@@ -53,6 +63,56 @@ class Wallet:
         ).decode('utf-8')
         return public_key
 
+    def serialize_compact_public_key(self):
+        """
+        Serialise the public key as the hex of its 33 byte compressed SECP256K1 point.
+        A fraction of the size of the PEM text, for the transaction inputs stored on the chain
+        :return:
+        """
+        return self.private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.X962,
+            format=serialization.PublicFormat.CompressedPoint
+        ).hex()
+
+    @staticmethod
+    def is_pem_public_key(public_key: str) -> bool:
+        """
+        Tell the PEM public keys of legacy transaction inputs apart from compact ones
+        :param public_key:
+        :return:
+        """
+        return public_key.startswith('-----BEGIN')
+
+    @staticmethod
+    def pem_public_key(public_key: str) -> str:
+        """
+        Convert a serialised public key, in either format, to its PEM text
+        :param public_key:
+        :return:
+        """
+        if Wallet.is_pem_public_key(public_key):
+            return public_key
+
+        return Wallet.load_public_key(public_key).public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode('utf-8')
+
+    @staticmethod
+    def address_from_public_key(public_key: str) -> str:
+        """
+        Derive the address of a serialised public key, in either format.
+        Addresses are always the hash of the PEM public key, so they do not change with the input format
+        :param public_key:
+        :raise: ValueError if the key cannot be decoded
+        :return:
+        """
+        address = ADDRESS_CACHE.get(public_key)
+        if address is None:
+            address = crypto_hash(Wallet.pem_public_key(public_key))
+            ADDRESS_CACHE.put(public_key, address)
+        return address
+
     @staticmethod
     def verify(public_key: str, data: any, signature: tuple[int, int]) -> bool:
         """
@@ -62,49 +122,79 @@ class Wallet:
         :param signature:
         :return:
         """
-        deserialized_public_key = serialization.load_pem_public_key(
-            public_key.encode('utf-8'),
-            default_backend()
-        )
+        encoded_data = json.dumps(data).encode('utf-8')
+        cache_key = Wallet.signature_cache_key(public_key, encoded_data, signature)
+        if SIGNATURE_CACHE.get(cache_key):
+            return True
+
+        deserialized_public_key = Wallet.load_public_key(public_key)
         (r, s) = signature # elliptic curve coordinates
         encoded_signature = encode_dss_signature(r, s)
 
-        encoded_data = json.dumps(data).encode('utf-8')
         sha_256_hash = ec.ECDSA(hashes.SHA256())
         try:
             deserialized_public_key.verify(encoded_signature, encoded_data, sha_256_hash)
-            return True
         except InvalidSignature as e:
             return False
 
+        SIGNATURE_CACHE.put(cache_key, True)
+        return True
+
+    @staticmethod
+    def load_public_key(public_key: str) -> ec.EllipticCurvePublicKey:
+        """
+        Load a serialised public key, PEM or compact, reusing the key object if the key was loaded before
+        :param public_key:
+        :raise: ValueError if the key cannot be decoded
+        :return:
+        """
+        deserialized_public_key = PUBLIC_KEY_CACHE.get(public_key)
+        if deserialized_public_key is None:
+            if Wallet.is_pem_public_key(public_key):
+                deserialized_public_key = serialization.load_pem_public_key(
+                    public_key.encode('utf-8'),
+                    default_backend()
+                )
+            else:
+                deserialized_public_key = ec.EllipticCurvePublicKey.from_encoded_point(
+                    ec.SECP256K1(),
+                    bytes.fromhex(public_key)
+                )
+            PUBLIC_KEY_CACHE.put(public_key, deserialized_public_key)
+        return deserialized_public_key
+
+    @staticmethod
+    def signature_cache_key(public_key: str, encoded_data: bytes, signature) -> bytes:
+        """
+        Digest identifying a verified signature. It covers the exact signed bytes, so data that only differs
+        in its key order does not share the key
+        :param public_key:
+        :param encoded_data: the data as it is signed
+        :param signature:
+        :return:
+        """
+        (r, s) = signature
+        sha256 = hashlib.sha256(public_key.encode('utf-8'))
+        sha256.update(b'\0' + encoded_data + b'\0')
+        sha256.update(f'{r},{s}'.encode('utf-8'))
+        return sha256.digest()
+
     @staticmethod
     def calculate_balance(blockchain, address: str):
         """
         Calculate the balance of a wallet address, based on the data on the blockchain.
 
         The balance is found by adding the output values that belong to the address since the most recent transaction
-        by that address
+        by that address. It is looked up in the balance index the blockchain keeps up to date as blocks are added
         :param blockchain:
         :param address:
         :return:
         """
-        balance = STARTING_BALANCE
-
         # If blockchain is empty, just return balance
         if not blockchain:
-            return balance
-
-        for block in blockchain.chain:
-            for transaction in block.data:
-                if transaction['input']['address'] == address:
-                    # any time the address conducts any transactions, it resets its balance
-                    balance = transaction['output'][address]
-                    # any time the address conducts any transactions, subtract its differences of remaining balances
-                    # balance = balance - (STARTING_BALANCE - transaction['output'][address])
-                elif address in transaction['output']:
-                    # If the recipient is receiving an amount, then add it to the balance
-                    balance += transaction['output'][address]
-        return balance
+            return STARTING_BALANCE
+
+        return blockchain.balance(address)
 
 
 def main():
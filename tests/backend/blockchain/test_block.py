@@ -1,10 +1,16 @@
+import json
+import threading
 import time
 
 import pytest
 
-from backend.blockchain.block import Block, GENESIS_DATA
+from backend.blockchain.block import Block, GENESIS_DATA, NonceSearchPool
+from backend.blockchain.block_header import CURRENT_HEADER_VERSION, LEGACY_HEADER_VERSION
 from backend.config import MINE_RATE, SECONDS
+from backend.util.crypto_hash import crypto_hash
 from backend.util.hex_to_binary import hex_to_binary
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
 
 
 def test_mine_block_when_genesis_block_created_then_subsequent_blocks_reference_genesis_block():
@@ -18,6 +24,37 @@ def test_mine_block_when_genesis_block_created_then_subsequent_blocks_reference_
     assert hex_to_binary(block.hash)[0:block.difficulty] == block.difficulty * '0'
 
 
+def test_mine_block_when_multiple_workers_then_mined_block_is_valid():
+    last_block = Block.genesis()
+    data = ['test-data']
+    block = Block.mine_block(last_block, data, workers=2)
+
+    assert isinstance(block, Block)
+    assert block.data == data
+    assert block.last_hash == last_block.hash
+    Block.is_valid_block(last_block, block)
+
+
+
+def test_mine_block_when_multiple_workers_then_worker_pool_reused():
+    first_block = Block.mine_block(Block.genesis(), [], workers=2)
+    search_pool = NonceSearchPool.shared(2)
+
+    second_block = Block.mine_block(first_block, [], workers=2)
+
+    assert NonceSearchPool.shared(2) is search_pool
+    Block.is_valid_block(first_block, second_block)
+
+
+def test_mine_block_when_stop_event_set_then_returns_none():
+    stop_event = threading.Event()
+    stop_event.set()
+    last_block = Block(time.time_ns(), 'test_last_hash', 'test_hash', ['test_data'], 60, 0)
+
+    assert Block.mine_block(last_block, ['test_data'], stop_event=stop_event) is None
+    assert Block.mine_block(last_block, ['test_data'], workers=2, stop_event=stop_event) is None
+
+
 def test_genesis_returns_a_block_type_with_expected_values():
     gen_block = Block.genesis()
     assert isinstance(gen_block, Block)
@@ -25,6 +62,54 @@ def test_genesis_returns_a_block_type_with_expected_values():
         assert getattr(gen_block, key) == value
 
 
+def test_to_json_when_serialised_then_same_format_and_block_not_shared():
+    block = Block.mine_block(Block.genesis(), ['foo'])
+
+    block_json = block.to_json()
+    block_json['data'].append('bar')
+    block_json['hash'] = 'evil_hash'
+
+    assert list(block_json) == ['timestamp', 'last_hash', 'hash', 'data', 'difficulty', 'nonce', 'version']
+    assert block.data == ['foo']
+    assert Block.from_json(block.to_json()) == block
+    assert not hasattr(block, '__dict__')
+
+
+def test_to_json_when_transaction_changed_then_block_data_not_changed():
+    transaction = Transaction(Wallet(), 'recipient', 1)
+    block = Block.mine_block(Block.genesis(), [transaction.to_json()])
+
+    block.to_json()['data'][0]['output']['recipient'] = 1000
+
+    assert block.data[0]['output']['recipient'] == 1
+
+
+def test_transactions_when_accessed_then_parsed_once():
+    transaction = Transaction(Wallet(), 'recipient', 1)
+    block = Block.mine_block(Block.genesis(), [transaction.to_json()])
+
+    transactions = block.transactions
+
+    assert [parsed.id for parsed in transactions] == [transaction.id]
+    assert block.transactions is transactions
+
+
+def test_to_json_bytes_when_encoded_then_cached_json_of_block():
+    block = Block.mine_block(Block.genesis(), [Transaction(Wallet(), 'recipient', 1).to_json()])
+
+    json_bytes = block.to_json_bytes()
+
+    assert json.loads(json_bytes) == json.loads(json.dumps(block.to_json()))
+    assert block.to_json_bytes() is json_bytes
+
+
+def test_block_when_created_then_last_hash_shares_previous_hash_string():
+    last_block = Block.mine_block(Block.genesis(), [])
+    block = Block.from_json({**Block.mine_block(last_block, []).to_json(), 'last_hash': ''.join(last_block.hash)})
+
+    assert block.last_hash is last_block.hash
+
+
 def test_mine_block_when_quick_mining_difficulty_is_too_low_then_difficulty_is_increased():
     # The difficulty of the added block should increase because of our config having a high value for MINE_RATE,
     # If the config is changed, test might break
@@ -73,6 +158,44 @@ def test_is_valid_block_when_block_is_valid_does_not_throw():
     Block.is_valid_block(last_block, block)
 
 
+def test_mine_block_uses_current_header_version():
+    block = Block.mine_block(Block.genesis(), ['test_data'])
+    assert block.version == CURRENT_HEADER_VERSION
+
+
+def test_is_valid_block_when_legacy_json_hashed_block_then_does_not_throw():
+    last_block = Block.genesis()
+    timestamp = last_block.timestamp + MINE_RATE
+    difficulty = last_block.difficulty - 1
+    nonce = 0
+    hash = crypto_hash(timestamp, last_block.hash, difficulty, nonce)
+    while hex_to_binary(hash)[0:difficulty] != '0' * difficulty:
+        nonce += 1
+        hash = crypto_hash(timestamp, last_block.hash, difficulty, nonce)
+
+    # Legacy blocks were serialised without a version
+    block = Block.from_json({
+        'timestamp': timestamp,
+        'last_hash': last_block.hash,
+        'hash': hash,
+        'data': ['test_data'],
+        'difficulty': difficulty,
+        'nonce': nonce
+    })
+
+    assert block.version == LEGACY_HEADER_VERSION
+    Block.is_valid_block(last_block, block)
+
+
+def test_is_valid_block_when_header_version_unknown_then_throws():
+    last_block = Block.genesis()
+    block = Block.mine_block(last_block, ['test_data'])
+    block.version = 99
+
+    with pytest.raises(Exception, match="Unknown block header version"):
+        Block.is_valid_block(last_block, block)
+
+
 def test_is_valid_block_when_block_last_hash_is_invalid_then_throws():
     last_block = Block.genesis()
     block = Block.mine_block(last_block, ['test_data'])
@@ -120,3 +243,10 @@ def test_is_valid_block_when_difficulty_is_not_adjusted_by_1_then_throws():
         Block.is_valid_block(last_block, block)
 
 
+def test_block_when_equal_then_same_hash_and_set_entry():
+    block = Block.mine_block(Block.genesis(), ['foo'])
+    blocks = {Block.genesis(), block}
+
+    assert Block.from_json(block.to_json()) in blocks
+    assert hash(Block.genesis()) == hash(Block.genesis())
+    assert len(blocks) == 2
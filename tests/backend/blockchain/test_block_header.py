@@ -0,0 +1,53 @@
+import hashlib
+
+import pytest
+
+from backend.blockchain.block_header import (
+    BINARY_HEADER_VERSION,
+    HEADER_PREFIX,
+    HEADER_SUFFIX,
+    LEGACY_HEADER_VERSION,
+    hash_to_bytes,
+    header_hash,
+    header_prefix,
+    prefixed_header_digest
+)
+from backend.util.crypto_hash import crypto_hash
+
+LAST_HASH = crypto_hash('last_block')
+
+
+def test_hash_to_bytes_when_hex_hash_then_returns_raw_bytes():
+    assert hash_to_bytes(LAST_HASH) == bytes.fromhex(LAST_HASH)
+
+
+def test_hash_to_bytes_when_not_hex_hash_then_returns_32_bytes():
+    assert len(hash_to_bytes('genesis_hash')) == 32
+
+
+def test_prefixed_header_digest_equals_hash_of_full_header():
+    prefix = header_prefix(LAST_HASH, 5)
+    full_header = HEADER_PREFIX.pack(BINARY_HEADER_VERSION, bytes.fromhex(LAST_HASH), 5) + HEADER_SUFFIX.pack(10, 7)
+
+    assert prefixed_header_digest(prefix, 10, 7) == hashlib.sha256(full_header).digest()
+    # The prefix can be reused for the next nonce
+    assert prefixed_header_digest(prefix, 10, 8) != prefixed_header_digest(prefix, 10, 7)
+
+
+def test_header_hash_when_binary_version_then_matches_prefixed_digest():
+    expected = prefixed_header_digest(header_prefix(LAST_HASH, 5), 10, 7).hex()
+    assert header_hash(BINARY_HEADER_VERSION, 10, LAST_HASH, 5, 7) == expected
+
+
+def test_header_hash_when_legacy_version_then_matches_crypto_hash():
+    assert header_hash(LEGACY_HEADER_VERSION, 10, LAST_HASH, 5, 7) == crypto_hash(10, LAST_HASH, 5, 7)
+
+
+def test_header_hash_when_nonce_cannot_be_encoded_then_raises():
+    with pytest.raises(ValueError, match='Cannot encode'):
+        header_hash(BINARY_HEADER_VERSION, 10, LAST_HASH, 5, 'some_evil_nonce')
+
+
+def test_header_hash_when_version_unknown_then_raises():
+    with pytest.raises(ValueError, match='Unknown block header version'):
+        header_hash(99, 10, LAST_HASH, 5, 7)
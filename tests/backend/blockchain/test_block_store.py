@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from backend.blockchain.block_store import INDEX_ENTRY, BlockStore
+from backend.blockchain.blockchain import Blockchain
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+def as_json(chain):
+    # Tuples in the transactions, like the signatures, come back from JSON as lists
+    return json.loads(json.dumps([block.to_json() for block in chain]))
+
+
+@pytest.fixture
+def chain():
+    blockchain = Blockchain()
+    for i in range(4):
+        blockchain.add_block([Transaction(Wallet(), 'recipient', i).to_json()])
+    return blockchain.chain
+
+
+def stored_block_store(directory, chain, **kwargs):
+    block_store = BlockStore(str(directory), fsync=False, **kwargs)
+    for block in chain:
+        block_store.append(block)
+    return block_store
+
+
+def test_block_store_when_reopened_then_reads_appended_blocks(tmp_path, chain):
+    stored_block_store(tmp_path, chain)
+
+    block_store = BlockStore(str(tmp_path))
+
+    assert not block_store.repaired
+    assert len(block_store) == len(chain)
+    assert as_json(block_store.read_all()) == as_json(chain)
+    assert as_json([block_store.read(2)]) == as_json([chain[2]])
+
+
+def test_block_store_when_segment_full_then_starts_new_segment(tmp_path, chain):
+    block_store = stored_block_store(tmp_path, chain, segment_size=1)
+
+    assert os.path.exists(block_store.segment_path(len(chain) - 1))
+    assert as_json(BlockStore(str(tmp_path), segment_size=1).read_all()) == as_json(chain)
+
+
+def test_block_store_when_last_record_truncated_then_tail_dropped(tmp_path, chain):
+    block_store = stored_block_store(tmp_path, chain)
+    segment_path = block_store.segment_path(0)
+    with open(segment_path, 'r+b') as f:
+        f.truncate(os.path.getsize(segment_path) - 10)
+
+    block_store = BlockStore(str(tmp_path))
+
+    assert block_store.repaired
+    assert as_json(block_store.read_all()) == as_json(chain[:-1])
+    block_store.append(chain[-1])
+    assert as_json(BlockStore(str(tmp_path)).read_all()) == as_json(chain)
+
+
+def test_block_store_when_index_entry_partially_written_then_rebuilt_from_record(tmp_path, chain):
+    block_store = stored_block_store(tmp_path, chain)
+    with open(block_store.index_path, 'r+b') as f:
+        f.truncate(len(chain) * INDEX_ENTRY.size - 5)
+
+    block_store = BlockStore(str(tmp_path))
+
+    assert block_store.repaired
+    assert as_json(block_store.read_all()) == as_json(chain)
+    assert os.path.getsize(block_store.index_path) == len(chain) * INDEX_ENTRY.size
+
+
+def test_block_store_when_record_corrupt_then_dropped(tmp_path, chain):
+    block_store = stored_block_store(tmp_path, chain, segment_size=1)
+    with open(block_store.segment_path(len(chain) - 1), 'r+b') as f:
+        f.seek(20)
+        f.write(b'#')
+
+    assert as_json(BlockStore(str(tmp_path), segment_size=1).read_all()) == as_json(chain[:-1])
+
+
+def test_sync_when_chain_forks_then_only_differing_blocks_rewritten(tmp_path, chain):
+    block_store = stored_block_store(tmp_path, chain)
+    fork = Blockchain(chain[:2])
+    for i in range(3):
+        fork.add_block([Transaction(Wallet(), 'fork', i).to_json()])
+
+    block_store.sync(fork.chain)
+
+    assert len(block_store) == len(fork.chain)
+    assert as_json(BlockStore(str(tmp_path)).read_all()) == as_json(fork.chain)
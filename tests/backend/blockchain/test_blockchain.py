@@ -1,14 +1,19 @@
+import json
+import random
+
 import pytest
 
 from backend.blockchain.block import Block
 from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.chain_state import ChainState
+from backend.config import MINING_REWARD_INPUT, STARTING_BALANCE
 from backend.wallet.transaction import Transaction
 from backend.wallet.wallet import Wallet
 
 
 def test_blockchain_first_block_is_the_same_as_genesis_block():
     blockchain = Blockchain()
-    assert blockchain.chain[0].__dict__ == Block.genesis().__dict__
+    assert blockchain.chain[0].to_json() == Block.genesis().to_json()
 
 
 def test_add_block_adds_new_block_with_expected_data():
@@ -17,14 +22,41 @@ def test_add_block_adds_new_block_with_expected_data():
     assert len(blockchain.chain) == 1
 
     data = ['test-data']
-    blockchain.add_block(data)
+    block = blockchain.add_block(data)
     last_block = blockchain.chain[-1]
 
+    assert block is last_block
+
     assert len(blockchain.chain) == 2
     assert last_block.data == data
     assert last_block.last_hash == initial_hash
 
 
+def test_add_block_when_tip_moves_while_mining_then_raises_and_block_not_appended():
+    blockchain = Blockchain()
+    mining_engine = blockchain.mining_engine
+
+    class TipMovingEngine:
+        def mine(self, last_block, data):
+            blockchain.append_block(mining_engine.mine(last_block, ['other-data']))
+            return mining_engine.mine(last_block, data)
+
+    blockchain.mining_engine = TipMovingEngine()
+
+    with pytest.raises(Exception, match='does not extend the tip'):
+        blockchain.add_block(['test-data'])
+    assert blockchain.chain[-1].data == ['other-data']
+
+
+def test_append_block_when_block_does_not_extend_tip_then_raises():
+    blockchain = Blockchain()
+    stale_block = Block.mine_block(blockchain.chain[-1], [])
+    blockchain.add_block([])
+
+    with pytest.raises(Exception, match='does not extend the tip'):
+        blockchain.append_block(stale_block)
+
+
 @pytest.fixture
 def blockchain_three_blocks():
     blockchain = Blockchain()
@@ -35,6 +67,45 @@ def blockchain_three_blocks():
     return blockchain
 
 
+def test_to_json_bytes_when_encoded_then_same_as_json_of_blocks(blockchain_three_blocks):
+    expected = json.loads(json.dumps(blockchain_three_blocks.to_json()))
+
+    assert json.loads(blockchain_three_blocks.to_json_bytes()) == expected
+    assert json.loads(blockchain_three_blocks.to_json_bytes(range(3, 0, -1))) == expected[3:0:-1]
+
+
+def test_headers_when_range_then_header_fields_with_heights(blockchain_three_blocks):
+    headers = blockchain_three_blocks.headers(1, 10)
+
+    assert [header['height'] for header in headers] == [1, 2, 3]
+    assert [header['hash'] for header in headers] == [block.hash for block in blockchain_three_blocks.chain[1:]]
+    assert 'data' not in headers[0]
+    Block.is_valid_block(blockchain_three_blocks.chain[1], Block.from_header(headers[1]))
+
+
+def test_height_of_when_hash_on_chain_then_height(blockchain_three_blocks):
+    assert blockchain_three_blocks.height_of(blockchain_three_blocks.chain[2].hash) == 2
+    assert blockchain_three_blocks.height_of('unknown_hash') is None
+
+
+def test_height_of_when_hash_in_uppercase_then_none(blockchain_three_blocks):
+    assert blockchain_three_blocks.height_of(blockchain_three_blocks.chain[2].hash.upper()) is None
+
+
+def test_height_of_when_chain_switched_to_fork_then_heights_of_new_chain(blockchain_three_blocks):
+    orphaned_block = blockchain_three_blocks.chain[2]
+    blockchain_three_blocks.height_of(orphaned_block.hash)
+    fork = Blockchain(blockchain_three_blocks.chain[:2])
+    for i in range(2):
+        fork.add_block([Transaction(Wallet(), 'fork_recipient', i).to_json()])
+
+    blockchain_three_blocks.switch_to_fork(1, fork.chain[2:])
+
+    assert blockchain_three_blocks.height_of(orphaned_block.hash) is None
+    assert blockchain_three_blocks.height_of(fork.chain[3].hash) == 3
+    assert blockchain_three_blocks.height_of(fork.chain[1].hash) == 1
+
+
 def test_is_valid_chain_when_all_blocks_valid_then_does_not_throw(blockchain_three_blocks):
     Blockchain.is_valid_chain(blockchain_three_blocks.chain)
 
@@ -83,6 +154,223 @@ def test_replace_chain_when_chain_is_invalid_then_throws(blockchain_three_blocks
         blockchain.replace_chain(blockchain_three_blocks.chain)
 
 
+def test_replace_chain_when_incoming_chain_extends_local_chain_then_only_new_blocks_validated(blockchain_three_blocks):
+    blockchain = Blockchain(blockchain_three_blocks.chain[:])
+    incoming_chain = blockchain_three_blocks.chain[:]
+    incoming_chain.append(Block.mine_block(incoming_chain[-1], [Transaction(Wallet(), 'recipient', 1).to_json()]))
+    # Tampering with an already known block is not looked at, the local block is kept
+    incoming_chain[1] = Block.from_json({**incoming_chain[1].to_json(), 'data': ['evil_data']})
+
+    blockchain.replace_chain(incoming_chain)
+
+    assert len(blockchain.chain) == 5
+    assert blockchain.chain[1] is blockchain_three_blocks.chain[1]
+    assert blockchain.chain[-1] is incoming_chain[-1]
+
+
+def test_replace_chain_when_incoming_chain_forks_then_switches_to_fork(blockchain_three_blocks):
+    sender = Wallet()
+    fork = Blockchain(blockchain_three_blocks.chain[:2])
+    fork.add_block([Transaction(sender, 'recipient', 10).to_json()])
+    fork.add_block([Transaction(Wallet(), 'recipient', 20).to_json()])
+    fork.add_block([Transaction(Wallet(), 'recipient', 30).to_json()])
+    orphaned_block = blockchain_three_blocks.chain[2]
+
+    assert blockchain_three_blocks.find_fork_height(fork.chain) == 1
+
+    blockchain_three_blocks.replace_chain(fork.chain)
+
+    assert blockchain_three_blocks.chain == fork.chain
+    assert orphaned_block not in blockchain_three_blocks.chain
+    state = blockchain_three_blocks.synced_state()
+    assert state.height == 5
+    assert state.balance(sender.address) == Wallet.calculate_balance(fork, sender.address)
+    assert orphaned_block.data[0]['id'] not in state.transaction_ids
+
+
+def test_replace_chain_when_fork_is_invalid_then_chain_and_state_unchanged(blockchain_three_blocks):
+    fork = Blockchain(blockchain_three_blocks.chain[:2])
+    fork.add_block([Transaction(Wallet(), 'recipient', 10).to_json()])
+    fork.add_block([Transaction(Wallet(), 'recipient', 20).to_json()])
+    fork.add_block([Transaction(Wallet(), 'recipient', 30).to_json()])
+    fork.chain[-1].nonce = 'some_evil_nonce'
+
+    original_chain = blockchain_three_blocks.chain[:]
+    original_ids = set(blockchain_three_blocks.synced_state().transaction_ids)
+
+    with pytest.raises(Exception, match='The incoming chain is invalid'):
+        blockchain_three_blocks.replace_chain(fork.chain)
+
+    assert blockchain_three_blocks.chain == original_chain
+    assert blockchain_three_blocks.synced_state().transaction_ids == original_ids
+
+
+def test_address_transactions_when_paged_then_newest_first_with_blocks(blockchain_three_blocks):
+    transactions, cursor = blockchain_three_blocks.address_transactions('recipient', limit=2)
+    older_transactions, last_cursor = blockchain_three_blocks.address_transactions('recipient', cursor, limit=2)
+
+    assert [transaction['height'] for transaction in transactions + older_transactions] == [3, 2, 1]
+    assert older_transactions[0]['block_hash'] == blockchain_three_blocks.chain[1].hash
+    assert older_transactions[0]['transaction'] == blockchain_three_blocks.chain[1].data[0]
+    assert last_cursor is None
+    assert blockchain_three_blocks.address_transactions('unknown') == ([], None)
+
+
+def test_find_transaction_when_on_chain_then_location_and_json(blockchain_three_blocks):
+    transaction_json = blockchain_three_blocks.chain[2].data[0]
+
+    assert blockchain_three_blocks.find_transaction(transaction_json['id']) == {
+        'height': 2,
+        'block_hash': blockchain_three_blocks.chain[2].hash,
+        'position': 0,
+        'transaction': transaction_json
+    }
+    assert blockchain_three_blocks.find_transaction('unknown') is None
+
+
+def test_known_addresses_when_chain_switches_to_fork_then_orphaned_addresses_removed(blockchain_three_blocks):
+    orphaned_sender = blockchain_three_blocks.chain[3].data[0]['input']['address']
+    fork = Blockchain(blockchain_three_blocks.chain[:3])
+    fork.add_block([Transaction(Wallet(), 'fork_recipient', 10).to_json()])
+    fork.add_block([Transaction(Wallet(), 'fork_recipient', 20).to_json()])
+    assert orphaned_sender in blockchain_three_blocks.known_addresses()
+
+    blockchain_three_blocks.replace_chain(fork.chain)
+
+    assert orphaned_sender not in blockchain_three_blocks.known_addresses()
+    assert 'fork_recipient' in blockchain_three_blocks.known_addresses()
+    transactions, _ = blockchain_three_blocks.address_transactions('recipient')
+    assert [transaction['height'] for transaction in transactions] == [2, 1]
+    assert blockchain_three_blocks.find_transaction(fork.chain[3].data[0]['id'])['height'] == 3
+
+
+def test_listeners_when_chain_changes_then_called_with_removed_and_added_blocks(blockchain_three_blocks):
+    changes = []
+    blockchain_three_blocks.add_listener(lambda removed, added, state: changes.append((removed, added)))
+    fork = Blockchain(blockchain_three_blocks.chain[:2])
+    fork.add_block([Transaction(Wallet(), 'recipient', 10).to_json()])
+    fork.add_block([Transaction(Wallet(), 'recipient', 20).to_json()])
+    fork.add_block([Transaction(Wallet(), 'recipient', 30).to_json()])
+    orphaned_blocks = blockchain_three_blocks.chain[2:]
+
+    blockchain_three_blocks.replace_chain(fork.chain)
+    blockchain_three_blocks.add_block([])
+
+    assert changes == [
+        (orphaned_blocks[::-1], fork.chain[2:]),
+        ([], [blockchain_three_blocks.chain[-1]])
+    ]
+
+
+def test_receive_block_when_block_extends_tip_then_added(blockchain_three_blocks):
+    blockchain = Blockchain(blockchain_three_blocks.chain[:])
+    blockchain.balance('recipient')  # bring the state up to date first
+    blockchain_three_blocks.add_block([Transaction(Wallet(), 'recipient', 5).to_json()])
+
+    blockchain.receive_block(blockchain_three_blocks.chain[-1])
+
+    assert blockchain.chain == blockchain_three_blocks.chain
+    assert blockchain.balance('recipient') == blockchain_three_blocks.balance('recipient')
+
+
+def test_receive_block_when_block_does_not_extend_tip_then_raises(blockchain_three_blocks):
+    block = blockchain_three_blocks.chain[-1]
+
+    with pytest.raises(Exception, match="does not extend the tip"):
+        blockchain_three_blocks.receive_block(block)
+
+
+def test_receive_block_when_block_invalid_then_raises(blockchain_three_blocks):
+    block = blockchain_three_blocks.mining_engine.mine(blockchain_three_blocks.chain[-1], [])
+    block.hash = 'evil_hash'
+
+    with pytest.raises(Exception, match="Cannot add. The block is invalid"):
+        blockchain_three_blocks.receive_block(block)
+
+
+def test_restore_state_when_blocks_after_snapshot_valid_then_state_at_tip(blockchain_three_blocks):
+    state = ChainState()
+    state.apply_block(blockchain_three_blocks.chain[0], validate=False)
+    state.apply_block(blockchain_three_blocks.chain[1], validate=False)
+    blockchain = Blockchain(blockchain_three_blocks.chain[:])
+
+    blockchain.restore_state(ChainState.from_json(state.to_json()))
+
+    assert blockchain.chain == blockchain_three_blocks.chain
+    assert blockchain.state.base_height == 2
+    assert blockchain.synced_state().balances == blockchain_three_blocks.synced_state().balances
+
+
+def test_restore_state_when_block_after_snapshot_invalid_then_chain_cut_to_snapshot(blockchain_three_blocks):
+    state = ChainState()
+    state.apply_block(blockchain_three_blocks.chain[0], validate=False)
+    chain = blockchain_three_blocks.chain[:]
+    chain[2].hash = 'evil_hash'
+
+    blockchain = Blockchain(chain)
+    with pytest.raises(Exception):
+        blockchain.restore_state(ChainState.from_json(state.to_json()))
+
+    assert len(blockchain.chain) == 1
+    assert blockchain.state.height == 1
+
+
+def test_replace_chain_when_fork_below_snapshot_then_state_rebuilt(blockchain_three_blocks):
+    fork = Blockchain(blockchain_three_blocks.chain[:2])
+    for i in range(3):
+        fork.add_block([Transaction(Wallet(), 'fork', i).to_json()])
+    state = ChainState()
+    for block in blockchain_three_blocks.chain:
+        state.apply_block(block, validate=False)
+    blockchain_three_blocks.restore_state(ChainState.from_json(state.to_json()))
+
+    blockchain_three_blocks.replace_chain(fork.chain)
+
+    assert blockchain_three_blocks.chain == fork.chain
+    assert blockchain_three_blocks.synced_state().balances == fork.synced_state().balances
+
+
+def test_replace_chain_when_no_common_genesis_then_throws(blockchain_three_blocks):
+    blockchain = Blockchain()
+    blockchain_three_blocks.chain[0].hash = 'some_evil_hash'
+
+    with pytest.raises(Exception, match='The genesis block must be valid'):
+        blockchain.replace_chain(blockchain_three_blocks.chain)
+
+
+def test_replace_chain_when_local_genesis_corrupt_then_whole_chain_replaced(blockchain_three_blocks):
+    corrupt_genesis = Block.genesis()
+    corrupt_genesis.hash = 'corrupt_genesis_hash'
+    blockchain = Blockchain([corrupt_genesis, Block.mine_block(corrupt_genesis, [])])
+    blockchain.synced_state()
+    changes = []
+    blockchain.add_listener(lambda removed, added, state: changes.append((removed, added)))
+
+    assert blockchain.find_fork_height(blockchain_three_blocks.chain) == -1
+
+    blockchain.replace_chain(blockchain_three_blocks.chain)
+
+    assert blockchain.chain == blockchain_three_blocks.chain
+    assert blockchain.synced_state().balances == blockchain_three_blocks.synced_state().balances
+    assert blockchain.synced_state().height == 4
+    assert changes[0][0][-1] is corrupt_genesis
+
+
+def test_from_json_when_chain_mixes_legacy_and_compact_inputs_then_valid():
+    blockchain = Blockchain()
+    wallet = Wallet(blockchain)
+    legacy_transaction = Transaction(wallet, 'recipient', 1)
+    legacy_transaction.input['public_key'] = wallet.public_key
+    del legacy_transaction.input['version']
+    blockchain.add_block([legacy_transaction.to_json()])
+    blockchain.add_block([Transaction(wallet, 'recipient', 1).to_json()])
+
+    restored = Blockchain.from_json(blockchain.to_json())
+
+    Blockchain.is_valid_chain(restored.chain)
+    assert restored.balance(wallet.address) == wallet.balance
+
+
 def test_valid_transaction_chain_when_valid_does_not_raise(blockchain_three_blocks):
     Blockchain.is_valid_chain(blockchain_three_blocks.chain)
 
@@ -129,4 +417,88 @@ def test_is_valid_transaction_chain_when_historic_balance_not_matching_current_b
         Blockchain.is_valid_transaction_chain(blockchain_three_blocks.chain)
 
 
-
+def historic_balance(chain, address):
+    balance = STARTING_BALANCE
+    for block in chain:
+        for transaction in block.data:
+            if transaction['input']['address'] == address:
+                balance = transaction['output'][address]
+            elif address in transaction['output']:
+                balance += transaction['output'][address]
+    return balance
+
+
+def rescanning_is_valid_transaction_chain(chain):
+    """
+    Reference implementation that recalculates the historic balance of every sender from genesis
+    """
+    transaction_ids = set()
+
+    for i in range(len(chain)):
+        has_mining_reward = False
+
+        for transaction_json in chain[i].data:
+            transaction = Transaction.from_json(transaction_json)
+
+            if transaction.id in transaction_ids:
+                raise Exception(f'Transaction with {transaction.id} is not unique')
+
+            if transaction.input == MINING_REWARD_INPUT:
+                if has_mining_reward:
+                    raise Exception(f'There can only be one mining reward per block')
+                has_mining_reward = True
+            else:
+                transaction_ids.add(transaction.id)
+                if historic_balance(chain[0:i], transaction.input['address']) != transaction.input['amount']:
+                    raise Exception(f'Transaction {transaction.id} has an invalid input amount')
+
+            Transaction.is_valid_transaction(transaction)
+
+
+def accepts(validate, chain):
+    try:
+        validate(chain)
+        return True
+    except Exception:
+        return False
+
+
+def test_is_valid_transaction_chain_accepts_and_rejects_like_rescanning_reference():
+    rng = random.Random(3)
+    results = []
+
+    for _ in range(20):
+        blockchain = Blockchain()
+        wallets = [Wallet(blockchain) for _ in range(3)]
+        # Wallets without a blockchain always claim the starting balance, which is wrong once they have spent
+        detached_wallet = Wallet()
+        fault_block = rng.randint(1, 6)  # some chains get no fault at all
+
+        for height in range(1, 5):
+            transactions = []
+            for sender, recipient in (rng.sample(wallets, 2) for _ in range(2)):
+                transactions.append(Transaction(sender, recipient.address, rng.randint(1, 30)).to_json())
+            transactions.append(Transaction.reward_transaction(rng.choice(wallets)).to_json())
+
+            if height == fault_block:
+                fault = rng.choice(['duplicate', 'second_reward', 'detached_spend', 'tampered_output'])
+                if fault == 'duplicate':
+                    transactions.append(rng.choice(blockchain.chain[-1].data or transactions))
+                elif fault == 'second_reward':
+                    transactions.append(Transaction.reward_transaction(rng.choice(wallets)).to_json())
+                elif fault == 'detached_spend':
+                    transactions.append(Transaction(detached_wallet, wallets[0].address, 5).to_json())
+                else:
+                    transactions[0]['output'][wallets[0].address] = 999
+
+            blockchain.chain.append(Block.mine_block(blockchain.chain[-1], transactions))
+            if height == 1:
+                # The detached wallet spends once correctly, further spends claim a stale balance
+                blockchain.chain[-1].data.append(Transaction(detached_wallet, wallets[1].address, 5).to_json())
+
+        expected = accepts(rescanning_is_valid_transaction_chain, blockchain.chain)
+        assert accepts(Blockchain.is_valid_transaction_chain, blockchain.chain) == expected
+        results.append(expected)
+
+    # Both outcomes are covered
+    assert True in results and False in results
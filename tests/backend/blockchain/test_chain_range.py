@@ -0,0 +1,98 @@
+import pytest
+
+from backend.blockchain.block import Block
+from backend.blockchain.chain_range import (
+    chain_etag, decode_cursor, encode_cursor, newest_first_heights, page_heights, page_postings
+)
+from backend.config import BLOCKCHAIN_RANGE_LIMIT
+
+
+@pytest.fixture
+def chain():
+    chain = [Block.genesis()]
+    for i in range(9):
+        chain.append(Block.mine_block(chain[-1], [i]))
+    return chain
+
+
+@pytest.mark.parametrize('start, end', [(0, 3), (3, 6), (8, 20), (20, 30), (-3, -1), (2, 1)])
+def test_newest_first_heights_when_range_then_same_as_reversed_slice(chain, start, end):
+    heights = newest_first_heights(len(chain), start, end)
+
+    assert [chain[height] for height in heights] == chain[::-1][start:end]
+
+
+def test_newest_first_heights_when_range_exceeds_limit_then_capped():
+    assert list(newest_first_heights(10, 0, 10, limit=4)) == [9, 8, 7, 6]
+    assert len(newest_first_heights(10 * BLOCKCHAIN_RANGE_LIMIT, 0, 2 * BLOCKCHAIN_RANGE_LIMIT)) == \
+        BLOCKCHAIN_RANGE_LIMIT
+
+
+def test_page_heights_when_following_cursors_then_every_height_once_newest_first(chain):
+    heights, cursor = page_heights(chain, limit=4)
+    pages = [heights]
+    while cursor:
+        heights, cursor = page_heights(chain, cursor, limit=4)
+        pages.append(heights)
+
+    assert [len(page) for page in pages] == [4, 4, 2]
+    assert [height for page in pages for height in page] == list(range(len(chain) - 1, -1, -1))
+
+
+def test_page_heights_when_blocks_added_then_next_page_unchanged(chain):
+    _, cursor = page_heights(chain[:6], limit=3)
+
+    heights, _ = page_heights(chain, cursor, limit=3)
+
+    assert list(heights) == [2, 1, 0]
+
+
+def test_page_heights_when_cursor_block_replaced_then_raises(chain):
+    with pytest.raises(Exception, match='no longer on the chain'):
+        page_heights(chain, encode_cursor(5, 'replaced_hash'))
+
+    with pytest.raises(Exception, match='Invalid cursor'):
+        page_heights(chain, 'not a cursor')
+
+
+def test_decode_cursor_when_encoded_then_same_height_and_hash():
+    assert decode_cursor(encode_cursor(7, 'some_hash')) == (7, 'some_hash')
+
+
+def test_page_postings_when_following_cursors_then_every_posting_once_newest_first(chain):
+    postings = [(height, f'transaction-{height}-{i}') for height in range(1, 6) for i in range(2)]
+
+    page, cursor = page_postings(postings, chain, limit=4)
+    pages = [page]
+    while cursor:
+        page, cursor = page_postings(postings, chain, cursor, limit=4)
+        pages.append(page)
+
+    assert [len(page) for page in pages] == [4, 4, 2]
+    assert [posting for page in pages for posting in page] == postings[::-1]
+
+
+def test_page_postings_when_postings_added_then_next_page_unchanged(chain):
+    postings = [(height, f'transaction-{height}') for height in range(1, 10)]
+    _, cursor = page_postings(postings[:6], chain, limit=3)
+
+    page, _ = page_postings(postings, chain, cursor, limit=3)
+
+    assert page == postings[:3][::-1]
+
+
+def test_page_postings_when_cursor_block_replaced_then_raises(chain):
+    postings = [(height, f'transaction-{height}') for height in range(1, 10)]
+
+    with pytest.raises(Exception, match='no longer on the chain'):
+        page_postings(postings, chain, encode_cursor(3, 'replaced_hash'))
+
+    with pytest.raises(Exception, match='no longer on the chain'):
+        page_postings(postings[:2], chain, encode_cursor(3, chain[4].hash))
+
+
+def test_chain_etag_when_tip_or_parameters_change_then_changes():
+    assert chain_etag('tip_hash') == 'tip_hash'
+    assert chain_etag('tip_hash', 'start=0&end=3') == chain_etag('tip_hash', 'start=0&end=3')
+    assert chain_etag('tip_hash', 'start=0&end=3') != chain_etag('tip_hash', 'start=3&end=6')
+    assert chain_etag('tip_hash', 'start=0&end=3') != chain_etag('new_tip_hash', 'start=0&end=3')
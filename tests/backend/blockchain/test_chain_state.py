@@ -0,0 +1,147 @@
+import functools
+import json
+
+import pytest
+
+from backend.blockchain import chain_state
+from backend.blockchain.block import Block
+from backend.blockchain.chain_state import ChainState
+from backend.config import MINING_REWARD_INPUT, STARTING_BALANCE
+from backend.wallet.signature_verifier import first_invalid_signature
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+def block_of(*transactions):
+    return Block.mine_block(Block.genesis(), [transaction.to_json() for transaction in transactions])
+
+
+def test_apply_block_updates_balances_and_transaction_ids():
+    sender = Wallet()
+    transaction = Transaction(sender, 'recipient', 10)
+    state = ChainState()
+
+    state.apply_block(block_of(transaction))
+
+    assert state.height == 1
+    assert state.balance(sender.address) == STARTING_BALANCE - 10
+    assert state.balance('recipient') == STARTING_BALANCE + 10
+    assert transaction.id in state.transaction_ids
+
+
+def test_rollback_block_restores_previous_state():
+    sender = Wallet()
+    state = ChainState()
+    state.apply_block(block_of(Transaction(sender, 'recipient', 10)))
+    balances = dict(state.balances)
+    transaction_ids = set(state.transaction_ids)
+
+    state.apply_block(block_of(Transaction(Wallet(), 'recipient', 5), Transaction.reward_transaction(sender)))
+    state.rollback_block()
+
+    assert state.height == 1
+    assert state.balances == balances
+    assert state.transaction_ids == transaction_ids
+
+
+def test_apply_block_when_blocks_applied_and_rolled_back_then_address_postings_follow():
+    sender = Wallet()
+    first = Transaction(sender, 'recipient', 10)
+    reward = Transaction.reward_transaction(sender)
+    state = ChainState()
+    state.apply_block(block_of(first))
+    state.apply_block(block_of(Transaction(Wallet(), 'recipient', 5), reward))
+
+    assert state.address_postings_of(sender.address) == [(0, first.id), (1, reward.id)]
+    assert [posting[0] for posting in state.address_postings_of('recipient')] == [0, 1]
+    assert MINING_REWARD_INPUT['address'] not in state.known_addresses()
+
+    state.rollback_block()
+
+    assert state.address_postings_of(sender.address) == [(0, first.id)]
+    assert set(state.known_addresses()) == {sender.address, 'recipient'}
+
+
+def test_transaction_location_when_block_applied_and_rolled_back_then_follows():
+    first = Transaction(Wallet(), 'recipient', 10)
+    second = Transaction(Wallet(), 'recipient', 5)
+    reward = Transaction.reward_transaction(Wallet())
+    state = ChainState()
+    state.apply_block(block_of(first))
+    state.apply_block(block_of(reward, second))
+
+    assert state.transaction_location(first.id) == (0, 0)
+    assert state.transaction_location(second.id) == (1, 1)
+    assert state.transaction_location(reward.id) is None
+
+    state.rollback_block()
+
+    assert state.transaction_location(second.id) is None
+    assert set(state.transaction_ids) == {first.id}
+
+
+def test_apply_block_when_transaction_already_applied_then_raises():
+    transaction = Transaction(Wallet(), 'recipient', 10)
+    state = ChainState()
+    state.apply_block(block_of(transaction))
+
+    with pytest.raises(Exception, match='is not unique'):
+        state.apply_block(block_of(transaction))
+    assert state.height == 1
+
+
+def test_apply_block_when_input_amount_is_not_sender_balance_then_raises():
+    sender = Wallet()
+    state = ChainState()
+    state.apply_block(block_of(Transaction(sender, 'recipient', 10)))
+
+    # The sender wallet is not attached to a blockchain, so it still believes it holds the starting balance
+    with pytest.raises(Exception, match='invalid input amount'):
+        state.apply_block(block_of(Transaction(sender, 'recipient', 10)))
+
+
+def test_apply_blocks_when_signatures_verified_on_pool_then_earliest_failure_raised(monkeypatch):
+    monkeypatch.setattr(
+        chain_state,
+        'first_invalid_signature',
+        functools.partial(first_invalid_signature, workers=2, batch_size=1, pool='thread')
+    )
+    sender = Wallet()
+    bad_signature = Transaction(Wallet(), 'recipient', 1)
+    bad_signature.input['signature'] = Wallet().sign(bad_signature.output)
+    blocks = [
+        block_of(Transaction(Wallet(), 'recipient', 1), Transaction(Wallet(), 'recipient', 1)),
+        block_of(bad_signature, Transaction(sender, 'recipient', 10)),
+        # Invalid input amount, but after the invalid signature
+        block_of(Transaction(sender, 'recipient', 10))
+    ]
+    state = ChainState()
+
+    with pytest.raises(Exception, match=f'Invalid transaction signature, in transaction {bad_signature.id}'):
+        state.apply_blocks(blocks)
+    assert state.height == 0
+
+    state.apply_blocks(blocks[:1])
+    assert state.height == 1
+
+
+def test_from_json_when_state_serialised_then_continues_from_same_state():
+    sender = Wallet()
+    transaction = Transaction(sender, 'recipient', 10)
+    state = ChainState()
+    state.apply_block(block_of(transaction))
+
+    restored = ChainState.from_json(json.loads(json.dumps(state.to_json())))
+    restored.apply_block(block_of(Transaction(Wallet(), 'recipient', 5)))
+
+    assert restored.height == 2
+    assert restored.balance(sender.address) == STARTING_BALANCE - 10
+    assert restored.balance('recipient') == STARTING_BALANCE + 15
+    assert restored.transaction_ids > state.transaction_ids
+    assert restored.address_postings_of(sender.address) == state.address_postings_of(sender.address)
+    assert len(restored.address_postings_of('recipient')) == 2
+    assert restored.transaction_location(transaction.id) == (0, 0)
+
+    restored.rollback_block()
+    with pytest.raises(Exception, match='Cannot roll back below the snapshot'):
+        restored.rollback_block()
@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+
+from backend.blockchain.block import Block
+from backend.blockchain.block_store import BlockStore
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.chain_sync import ChainSync
+from backend.blockchain.lazy_chain import LazyChain
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+def extended(chain, blocks, name='recipient'):
+    blockchain = Blockchain(chain[:])
+    for i in range(blocks):
+        blockchain.add_block([Transaction(Wallet(), name, i).to_json()])
+    return blockchain.chain
+
+
+@pytest.fixture
+def peer_chain():
+    return extended([Block.genesis()], 5)
+
+
+def test_sync_when_local_chain_is_genesis_then_replaced_by_peer_chain(peer_chain):
+    blockchain = Blockchain()
+
+    assert ChainSync(blockchain).sync(iter(peer_chain)) == len(peer_chain) - 1
+    assert blockchain.chain == peer_chain
+    assert blockchain.synced_state().balances == Blockchain(peer_chain).synced_state().balances
+
+
+def test_sync_when_peer_chain_forks_then_switches_to_fork(peer_chain):
+    blockchain = Blockchain(extended(peer_chain[:3], 3, 'local'))
+    chain_sync = ChainSync(blockchain)
+    longest_pending = 0
+
+    def blocks():
+        nonlocal longest_pending
+        for block in extended(peer_chain, 2):
+            longest_pending = max(longest_pending, len(chain_sync.pending))
+            yield block
+
+    assert chain_sync.sync(blocks()) == 5
+    assert blockchain.chain[:3] == peer_chain[:3]
+    # Blocks are only kept until the incoming chain is longer than the local chain
+    assert longest_pending == 3
+
+
+def test_sync_when_fork_deeper_than_max_fork_depth_then_raises_and_chain_unchanged(peer_chain):
+    local_chain = extended(peer_chain[:3], 3, 'local')
+    blockchain = Blockchain(local_chain[:])
+    incoming_chain = extended(peer_chain, 2)
+
+    with pytest.raises(Exception, match='forks more than 3 blocks deep'):
+        ChainSync(blockchain, max_fork_depth=3).sync(iter(incoming_chain))
+    assert blockchain.chain == local_chain
+
+    assert ChainSync(blockchain, max_fork_depth=4).sync(iter(incoming_chain)) == 5
+
+
+def test_sync_when_reading_blocks_then_chain_not_locked(peer_chain):
+    blockchain = Blockchain()
+    lock_free = []
+
+    def try_lock():
+        if blockchain.lock.acquire(blocking=False):
+            blockchain.lock.release()
+            lock_free.append(True)
+
+    def blocks():
+        for block in peer_chain:
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            yield block
+
+    ChainSync(blockchain).sync(blocks())
+
+    assert len(lock_free) == len(peer_chain)
+
+
+def test_sync_when_local_fork_block_replaced_during_sync_then_raises(peer_chain):
+    blockchain = Blockchain(extended(peer_chain[:3], 3, 'local'))
+    other_blocks = extended(peer_chain[:2], 5, 'other')[2:]
+
+    def blocks():
+        for height, block in enumerate(extended(peer_chain, 2)):
+            if height == 4:
+                blockchain.switch_to_fork(1, other_blocks)
+            yield block
+
+    with pytest.raises(Exception, match='The local chain changed during the sync'):
+        ChainSync(blockchain).sync(blocks())
+    assert blockchain.chain[2:] == other_blocks
+
+
+def test_sync_when_peer_chain_not_longer_then_raises_and_chain_unchanged(peer_chain):
+    local_chain = extended(peer_chain[:2], 4, 'local')
+    blockchain = Blockchain(local_chain[:])
+
+    with pytest.raises(Exception, match='must be longer'):
+        ChainSync(blockchain).sync(iter(peer_chain))
+    assert blockchain.chain == local_chain
+
+
+def test_sync_when_invalid_block_after_longer_prefix_then_keeps_valid_prefix(peer_chain):
+    blockchain = Blockchain()
+    peer_chain[4].hash = 'evil_hash'
+
+    with pytest.raises(Exception, match='The incoming chain is invalid'):
+        ChainSync(blockchain).sync(iter(peer_chain))
+    assert blockchain.chain == peer_chain[:4]
+
+
+def test_sync_when_genesis_differs_then_raises(peer_chain):
+    peer_chain[0] = Block(2, 'other_last_hash', 'other_hash', [], 3, 'nonce')
+
+    with pytest.raises(Exception, match='The genesis block must be valid'):
+        ChainSync(Blockchain()).sync(iter(peer_chain))
+
+
+def test_sync_when_lazy_chain_then_saved_blocks_released_from_memory(tmp_path, peer_chain):
+    block_store = BlockStore(str(tmp_path), fsync=False)
+    block_store.append(Block.genesis())
+    blockchain = Blockchain(LazyChain(block_store), block_store)
+
+    ChainSync(blockchain, save_interval=2).sync(iter(peer_chain))
+
+    assert len(block_store) == len(peer_chain)
+    assert blockchain.chain.blocks == []
+    assert [block.hash for block in blockchain.chain] == [block.hash for block in peer_chain]
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+import requests
+
+from backend.blockchain.block import Block
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.headers_sync import HeadersFirstSync, HttpPeer
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+class LocalPeer:
+    """
+    Chain endpoints of a peer node, served from a blockchain in the same process through JSON
+    """
+
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self.blocks_sent = 0
+
+    def length(self):
+        return len(self.blockchain.chain)
+
+    def headers(self, start, end):
+        return json.loads(json.dumps(self.blockchain.headers(start, end)))
+
+    def blocks_after(self, block_hash):
+        height = self.blockchain.height_of(block_hash)
+        for block in self.blockchain.chain[height + 1:]:
+            self.blocks_sent += 1
+            yield Block.from_json(json.loads(block.to_json_bytes()))
+
+
+def hashes(chain):
+    return [block.hash for block in chain]
+
+
+def extended(chain, blocks, name='recipient'):
+    blockchain = Blockchain(chain[:])
+    for i in range(blocks):
+        blockchain.add_block([Transaction(Wallet(), name, i).to_json()])
+    return blockchain
+
+
+@pytest.fixture
+def local_chain():
+    return extended([Block.genesis()], 6).chain
+
+
+def test_sync_when_peer_extends_local_chain_then_only_missing_blocks_downloaded(local_chain):
+    peer = LocalPeer(extended(local_chain, 2))
+    blockchain = Blockchain(local_chain[:])
+
+    assert HeadersFirstSync(blockchain, peer, window=2).sync() == 2
+    assert hashes(blockchain.chain) == hashes(peer.blockchain.chain)
+    assert peer.blocks_sent == 2
+
+
+def test_sync_when_peer_forked_below_window_then_fork_found_and_switched(local_chain):
+    peer = LocalPeer(extended(local_chain[:2], 7, 'fork'))
+    blockchain = Blockchain(local_chain[:])
+
+    HeadersFirstSync(blockchain, peer, window=2).sync()
+
+    assert hashes(blockchain.chain) == hashes(peer.blockchain.chain)
+    assert peer.blocks_sent == 7
+
+
+def test_sync_when_peer_chain_not_longer_then_raises(local_chain):
+    peer = LocalPeer(Blockchain(local_chain[:4]))
+
+    with pytest.raises(Exception, match='must be longer'):
+        HeadersFirstSync(Blockchain(local_chain[:]), peer).sync()
+
+
+def test_sync_when_header_proof_of_work_invalid_then_raises_before_downloading_blocks(local_chain):
+    peer = LocalPeer(extended(local_chain, 2))
+    peer.blockchain.chain[-1].nonce = 'some_evil_nonce'
+    blockchain = Blockchain(local_chain[:])
+
+    with pytest.raises(Exception, match='The incoming chain is invalid'):
+        HeadersFirstSync(blockchain, peer).sync()
+    assert peer.blocks_sent == 0
+    assert blockchain.chain == local_chain
+
+
+def test_sync_when_no_common_genesis_then_raises(local_chain):
+    other_genesis = Block(2, 'other_last_hash', 'other_hash', [], 3, 'nonce')
+    peer = LocalPeer(extended([other_genesis], 8, 'other'))
+
+    with pytest.raises(Exception, match='no block in common'):
+        HeadersFirstSync(Blockchain(local_chain[:]), peer, window=2).sync()
+
+
+def test_http_peer_when_requesting_then_timeout_given(monkeypatch):
+    timeouts = []
+
+    class Response:
+        ok = True
+
+        def json(self):
+            return 1
+
+    def get(url, **kwargs):
+        timeouts.append(kwargs.get('timeout'))
+        return Response()
+
+    monkeypatch.setattr(requests, 'get', get)
+    peer = HttpPeer('http://peer', timeout=3)
+
+    peer.length()
+    peer.headers(0, 1)
+
+    assert timeouts == [3, 3]
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+from backend.blockchain.block import Block
+from backend.blockchain.block_header import hash_to_bytes
+from backend.blockchain.block_store import BlockStore
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.lazy_chain import LazyChain
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+def as_json(chain):
+    # Tuples in the transactions, like the signatures, come back from JSON as lists
+    return json.loads(json.dumps([block.to_json() for block in chain]))
+
+
+@pytest.fixture
+def chain():
+    blockchain = Blockchain()
+    for i in range(4):
+        blockchain.add_block([Transaction(Wallet(), 'recipient', i).to_json()])
+    return blockchain.chain
+
+
+@pytest.fixture
+def block_store(tmp_path, chain):
+    block_store = BlockStore(str(tmp_path), fsync=False)
+    block_store.sync(chain)
+    return block_store
+
+
+def test_lazy_chain_when_loaded_then_no_block_read(block_store, chain):
+    lazy_chain = LazyChain(block_store)
+
+    assert len(lazy_chain) == len(chain)
+    assert len(lazy_chain.cache) == 0
+
+
+def test_lazy_chain_when_indexed_then_reads_and_caches_block(block_store, chain):
+    lazy_chain = LazyChain(block_store)
+
+    assert lazy_chain[-1].hash == chain[-1].hash
+    assert lazy_chain[-1] is lazy_chain[len(chain) - 1]
+    assert as_json(lazy_chain[1:3]) == as_json(chain[1:3])
+    assert as_json(lazy_chain) == as_json(chain)
+    with pytest.raises(IndexError):
+        lazy_chain[len(chain)]
+
+
+def test_lazy_chain_when_many_blocks_read_then_cache_bounded(block_store, chain):
+    lazy_chain = LazyChain(block_store, cache_size=2)
+
+    list(lazy_chain)
+
+    assert len(lazy_chain.cache) == 2
+
+
+def test_lazy_chain_when_tail_replaced_then_behaves_like_list(block_store, chain):
+    lazy_chain = LazyChain(block_store)
+    blocks = list(chain)
+    new_block = Block.mine_block(chain[1], [])
+
+    for sequence in (lazy_chain, blocks):
+        del sequence[2:]
+        sequence.append(new_block)
+        sequence.extend([])
+
+    assert as_json(lazy_chain) == as_json(blocks)
+    with pytest.raises(IndexError):
+        del lazy_chain[0:1]
+
+
+def test_blockchain_when_lazy_chain_extended_then_saved_and_reloaded(block_store, chain):
+    blockchain = Blockchain(LazyChain(block_store), block_store)
+    blockchain.add_block([Transaction(Wallet(), 'recipient', 10).to_json()])
+    blockchain.save_to_file()
+
+    reloaded = LazyChain(BlockStore(block_store.directory))
+
+    assert len(reloaded) == len(chain) + 1
+    assert as_json(reloaded) == as_json(blockchain.chain)
+    Blockchain.is_valid_chain(reloaded)
+
+
+def test_json_bytes_when_block_not_cached_then_read_without_decoding(block_store, chain):
+    lazy_chain = LazyChain(block_store)
+
+    assert [json.loads(lazy_chain.json_bytes(height)) for height in range(len(chain))] == as_json(chain)
+    assert len(lazy_chain.cache) == 0
+
+
+def test_release_saved_blocks_when_chain_saved_then_appended_blocks_read_from_store(block_store, chain):
+    blockchain = Blockchain(LazyChain(block_store), block_store)
+    blockchain.add_block([Transaction(Wallet(), 'recipient', 10).to_json()])
+    blockchain.save_to_file()
+
+    assert blockchain.chain.blocks == []
+    assert blockchain.chain.stored_length == len(chain) + 1
+    assert blockchain.chain[-1].hash == block_store.read(len(chain)).hash
+
+
+def test_hash_bytes_when_stored_or_appended_then_hash_of_block(block_store, chain):
+    lazy_chain = LazyChain(block_store)
+    block = Block.mine_block(chain[-1], [])
+    lazy_chain.append(block)
+
+    assert [lazy_chain.hash_bytes(height) for height in range(len(lazy_chain))] == [
+        hash_to_bytes(block.hash) for block in chain + [block]
+    ]
+    assert len(lazy_chain.cache) == 0
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from backend.blockchain.block import Block
+from backend.blockchain.block_header import CURRENT_HEADER_VERSION
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.mining import (
+    BatchedMiningEngine,
+    MiningEngine,
+    MultiprocessMiningEngine,
+    PythonMiningEngine,
+    get_mining_engine
+)
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+@pytest.mark.parametrize('engine', [PythonMiningEngine(), BatchedMiningEngine(100), MultiprocessMiningEngine(2)])
+def test_mining_engine_mines_valid_block(engine):
+    last_block = Block.genesis()
+    data = ['test-data']
+    block = engine.mine(last_block, data)
+
+    assert block.data == data
+    assert block.version == CURRENT_HEADER_VERSION
+    Block.is_valid_block(last_block, block)
+
+
+@pytest.mark.parametrize('engine', [PythonMiningEngine(), BatchedMiningEngine(100), MultiprocessMiningEngine(2)])
+def test_mining_engine_when_stop_event_set_then_returns_none(engine):
+    stop_event = threading.Event()
+    stop_event.set()
+    last_block = Block(time.time_ns(), 'test_last_hash', 'test_hash', [], 60, 0)
+
+    assert engine.mine(last_block, [], stop_event) is None
+
+
+def test_get_mining_engine_returns_engine_registered_under_name():
+    assert isinstance(get_mining_engine('batched'), BatchedMiningEngine)
+
+
+def test_get_mining_engine_when_name_unknown_then_raises():
+    with pytest.raises(Exception, match='Unknown mining engine'):
+        get_mining_engine('quantum')
+
+
+def test_add_block_mines_with_the_given_engine():
+    blockchain = Blockchain(mining_engine=BatchedMiningEngine())
+    blockchain.add_block([Transaction(Wallet(), 'recipient', 1).to_json()])
+
+    Blockchain.is_valid_chain(blockchain.chain)
+
+
+def test_multiprocess_engine_when_mining_several_blocks_then_worker_pool_reused():
+    engine = MultiprocessMiningEngine(2)
+    first_block = engine.mine(Block.genesis(), [])
+    search_pool = engine.search_pool
+
+    second_block = engine.mine(first_block, [])
+
+    assert engine.search_pool is search_pool
+    Block.is_valid_block(first_block, second_block)
+    engine.close()
+    assert engine.search_pool is None
+
+
+def test_mining_engine_when_search_not_implemented_then_cannot_be_created():
+    class IncompleteMiningEngine(MiningEngine):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        IncompleteMiningEngine()
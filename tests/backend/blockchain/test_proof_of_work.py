@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from backend.blockchain.proof_of_work import (
+    difficulty_to_target,
+    digest_leading_zero_bits,
+    digest_meets_target,
+    hash_meets_target,
+    leading_zero_bits,
+    meets_difficulty
+)
+from backend.util.crypto_hash import crypto_hash
+from backend.util.hex_to_binary import hex_to_binary
+
+
+def hex_to_binary_meets_difficulty(hash_hex, difficulty):
+    # The original string based check, used as the oracle
+    return hex_to_binary(hash_hex)[0:difficulty] == '0' * difficulty
+
+
+def random_hashes():
+    rng = random.Random(42)
+    hashes = [crypto_hash(i) for i in range(200)]
+    # Hashes with many leading zero bits are rare, so shift random values down to get some
+    hashes += [f'{rng.getrandbits(256) >> rng.randint(0, 256):064x}' for _ in range(500)]
+    return hashes
+
+
+def test_leading_zero_bits_matches_hex_to_binary():
+    for hash_hex in random_hashes():
+        binary = hex_to_binary(hash_hex)
+        assert leading_zero_bits(hash_hex) == len(binary) - len(binary.lstrip('0'))
+
+
+def test_digest_leading_zero_bits_matches_hex_leading_zero_bits():
+    for hash_hex in random_hashes():
+        assert digest_leading_zero_bits(bytes.fromhex(hash_hex)) == leading_zero_bits(hash_hex)
+
+
+def test_meets_difficulty_matches_hex_to_binary():
+    for hash_hex in random_hashes():
+        for difficulty in range(0, 258):
+            assert meets_difficulty(hash_hex, difficulty) == hex_to_binary_meets_difficulty(hash_hex, difficulty)
+
+
+def test_meets_difficulty_when_hash_is_shorter_than_difficulty_then_matches_hex_to_binary():
+    for hash_hex in ['fff', '000', '0' * 13, '01', '']:
+        for difficulty in range(1, 60):
+            assert meets_difficulty(hash_hex, difficulty) == hex_to_binary_meets_difficulty(hash_hex, difficulty)
+
+
+def test_meets_difficulty_when_hash_is_not_hex_then_returns_false():
+    assert not meets_difficulty('not_a_hash', 1)
+
+
+@pytest.mark.parametrize('hash_hex', ['0x00ff', '00_ff', ' 00ff', '00ff\n', '00FF', '-0ff', 0])
+def test_meets_difficulty_when_hash_is_not_strict_lowercase_hex_then_returns_false(hash_hex):
+    for difficulty in (0, 1):
+        assert not meets_difficulty(hash_hex, difficulty)
+
+
+def test_meets_difficulty_when_hash_is_empty_then_matches_hex_to_binary():
+    for difficulty in (0, 1):
+        assert meets_difficulty('', difficulty) == hex_to_binary_meets_difficulty('', difficulty)
+
+
+def test_target_comparison_matches_hex_to_binary():
+    for hash_hex in random_hashes():
+        for difficulty in range(1, 257):
+            target = difficulty_to_target(difficulty)
+            expected = hex_to_binary_meets_difficulty(hash_hex, difficulty)
+
+            assert hash_meets_target(hash_hex, target) == expected
+            assert digest_meets_target(bytes.fromhex(hash_hex), target) == expected
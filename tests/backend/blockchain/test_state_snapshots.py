@@ -0,0 +1,60 @@
+import pytest
+
+from backend.blockchain import blockchain as blockchain_module
+from backend.blockchain.block_store import BlockStore
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.chain_state import ChainState
+from backend.blockchain.state_snapshots import StateSnapshots
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+@pytest.fixture
+def blockchain(tmp_path):
+    blockchain = Blockchain(block_store=BlockStore(str(tmp_path), fsync=False))
+    for i in range(4):
+        blockchain.add_block([Transaction(Wallet(), 'recipient', i).to_json()])
+    blockchain.save_to_file()
+    return blockchain
+
+
+def test_load_when_snapshot_matches_stored_tip_then_state_loaded(blockchain):
+    blockchain.snapshots.save(blockchain.synced_state(), blockchain.chain[-1].hash)
+
+    state = blockchain.snapshots.load(blockchain.block_store)
+
+    assert state.height == len(blockchain.chain)
+    assert state.balances == blockchain.synced_state().balances
+    assert state.transaction_ids == blockchain.synced_state().transaction_ids
+
+
+def test_load_when_snapshot_tip_not_stored_then_earlier_snapshot_loaded(blockchain):
+    state = ChainState()
+    for block in blockchain.chain[:3]:
+        state.apply_block(block, validate=False)
+    blockchain.snapshots.save(state, blockchain.chain[2].hash)
+    fork_state = ChainState.from_json({**state.to_json(), 'height': 4})
+    blockchain.snapshots.save(fork_state, 'fork_hash')
+
+    assert blockchain.snapshots.load(blockchain.block_store).height == 3
+
+
+def test_save_when_more_snapshots_than_kept_then_oldest_deleted(tmp_path):
+    snapshots = StateSnapshots(str(tmp_path), kept=2)
+    state = ChainState()
+
+    for height in range(1, 4):
+        state.base_height = height
+        snapshots.save(state, f'hash_{height}')
+
+    assert snapshots.heights() == [3, 2]
+
+
+def test_save_to_file_when_snapshot_interval_reached_then_snapshot_saved(blockchain, monkeypatch):
+    monkeypatch.setattr(blockchain_module, 'STATE_SNAPSHOT_INTERVAL', 2)
+
+    blockchain.add_block([Transaction(Wallet(), 'recipient', 1).to_json()])
+    blockchain.save_to_file()
+
+    assert blockchain.snapshots.heights() == [len(blockchain.chain)]
+    assert blockchain.snapshot_height == len(blockchain.chain)
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from backend.blockchain.block import Block
+from backend.blockchain.blockchain import Blockchain
+from backend.config import MINING_REWARD_INPUT
+from backend.miner import Miner
+from backend.wallet.transaction_pool import TransactionPool
+from backend.wallet.wallet import Wallet
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'Timed out waiting for the miner'
+        time.sleep(0.01)
+
+
+def test_miner_when_started_then_mines_valid_blocks_until_stopped():
+    blockchain = Blockchain()
+    miner = Miner(blockchain, TransactionPool(), Wallet(blockchain))
+
+    miner.start()
+    wait_for(lambda: miner.blocks_mined >= 2)
+    miner.stop()
+
+    assert not miner.status()['running']
+    assert len(blockchain.chain) == miner.blocks_mined + 1
+    assert blockchain.chain[-1].hash == miner.last_block_hash
+    assert blockchain.chain[-1].data[-1]['input'] == MINING_REWARD_INPUT
+    Blockchain.is_valid_chain(blockchain.chain)
+
+
+def test_miner_when_restarted_then_mines_on_new_tip():
+    # A tip so difficult that the miner never finds a hash during the test
+    hard_tip = Block(time.time_ns(), 'last_hash', 'hard_tip_hash', [], 60, 0)
+    blockchain = Blockchain([Block.genesis(), hard_tip])
+    miner = Miner(blockchain, TransactionPool(), Wallet(blockchain))
+
+    miner.start()
+    wait_for(lambda: miner.status()['mining_height'] == 2)
+
+    # A peer's block is accepted
+    blockchain.chain.append(Block(time.time_ns(), 'hard_tip_hash', 'new_tip_hash', [], 60, 0))
+    miner.restart()
+    wait_for(lambda: miner.status()['mining_height'] == 3)
+    miner.stop()
+
+    assert miner.restarts >= 1
+    assert miner.blocks_mined == 0
+    assert len(blockchain.chain) == 3
+
+
+def test_miner_when_stopped_between_loop_check_and_abort_clear_then_run_returns():
+    hard_tip = Block(time.time_ns(), 'last_hash', 'hard_tip_hash', [], 60, 0)
+    blockchain = Blockchain([Block.genesis(), hard_tip])
+    miner = Miner(blockchain, TransactionPool(), Wallet(blockchain))
+    miner.running = True
+    clear = miner.abort_event.clear
+
+    def stop_then_clear():
+        # stop() runs right before the loop clears the abort event
+        miner.running = False
+        miner.abort_event.set()
+        clear()
+
+    miner.abort_event.clear = stop_then_clear
+    thread = threading.Thread(target=miner.run, daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert miner.mining_height is None
+
+
+def test_miner_when_started_from_several_threads_then_one_mining_thread():
+    miner = Miner(Blockchain(), TransactionPool(), Wallet())
+    runs = []
+
+    def run():
+        runs.append(threading.current_thread())
+        miner.abort_event.wait()
+
+    miner.run = run
+    starters = [threading.Thread(target=miner.start) for _ in range(8)]
+    for starter in starters:
+        starter.start()
+    for starter in starters:
+        starter.join()
+    wait_for(lambda: runs)
+    miner.stop()
+
+    assert len(runs) == 1
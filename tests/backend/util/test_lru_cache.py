@@ -0,0 +1,42 @@
+from backend.util.lru_cache import LRUCache
+
+
+def test_get_when_cached_then_counts_hit_and_returns_value():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_put_when_max_entries_reached_then_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    assert cache.evictions == 1
+
+
+def test_put_when_max_bytes_reached_then_evicts_until_under_limit():
+    cache = LRUCache(max_bytes=30, sizeof=lambda key, value: 10)
+    for key in range(5):
+        cache.put(key, key)
+
+    assert len(cache) == 3
+    assert cache.bytes == 30
+    assert list(cache.entries) == [2, 3, 4]
+
+
+def test_put_when_key_already_cached_then_replaces_size():
+    cache = LRUCache(sizeof=lambda key, value: value)
+    cache.put('a', 10)
+    cache.put('a', 4)
+
+    assert cache.bytes == 4
@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from backend.blockchain.block import Block
+from backend.blockchain.block_store import BlockStore
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.lazy_chain import LazyChain
+from backend.util.try_retrieve_local_blockchain import try_retrieve_local_blockchain
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+def as_json(chain):
+    # Tuples in the transactions, like the signatures, come back from JSON as lists
+    return json.loads(json.dumps([block.to_json() for block in chain]))
+
+
+def test_try_retrieve_local_blockchain_when_nothing_saved_then_genesis_chain_stored(tmp_path):
+    store_path = str(tmp_path / 'store')
+
+    blockchain = try_retrieve_local_blockchain(store_path)
+
+    assert as_json(blockchain.chain) == as_json([Block.genesis()])
+    assert as_json(try_retrieve_local_blockchain(store_path).chain) == as_json([Block.genesis()])
+
+
+def test_try_retrieve_local_blockchain_when_blocks_saved_then_loaded(tmp_path):
+    store_path = str(tmp_path / 'store')
+    blockchain = try_retrieve_local_blockchain(store_path)
+    blockchain.add_block([Transaction(Wallet(), 'recipient', 1).to_json()])
+    blockchain.save_to_file()
+
+    assert as_json(try_retrieve_local_blockchain(store_path).chain) == as_json(blockchain.chain)
+
+
+def test_try_retrieve_local_blockchain_when_legacy_json_file_then_migrated(tmp_path):
+    store_path = str(tmp_path / 'store')
+    legacy_file_path = str(tmp_path / 'local_blockchain.txt')
+    legacy_blockchain = Blockchain()
+    legacy_blockchain.add_block([Transaction(Wallet(), 'recipient', 1).to_json()])
+    with open(legacy_file_path, 'w') as f:
+        f.write(json.dumps(legacy_blockchain.to_json()))
+
+    blockchain = try_retrieve_local_blockchain(store_path, legacy_file_path)
+
+    assert as_json(blockchain.chain) == as_json(legacy_blockchain.chain)
+    assert not os.path.exists(legacy_file_path)
+    assert as_json(try_retrieve_local_blockchain(store_path, legacy_file_path).chain) == as_json(legacy_blockchain.chain)
+
+
+def test_try_retrieve_local_blockchain_when_migration_interrupted_then_redone_on_next_load(tmp_path, monkeypatch):
+    store_path = str(tmp_path / 'store')
+    legacy_file_path = str(tmp_path / 'local_blockchain.txt')
+    legacy_blockchain = Blockchain()
+    for i in range(3):
+        legacy_blockchain.add_block([Transaction(Wallet(), 'recipient', i).to_json()])
+    with open(legacy_file_path, 'w') as f:
+        f.write(json.dumps(legacy_blockchain.to_json()))
+
+    append = BlockStore.append
+
+    def crash_on_third_block(block_store, block):
+        if len(block_store) == 2:
+            raise KeyboardInterrupt
+        append(block_store, block)
+
+    monkeypatch.setattr(BlockStore, 'append', crash_on_third_block)
+    with pytest.raises(KeyboardInterrupt):
+        try_retrieve_local_blockchain(store_path, legacy_file_path)
+    monkeypatch.setattr(BlockStore, 'append', append)
+
+    assert os.path.exists(legacy_file_path)
+    blockchain = try_retrieve_local_blockchain(store_path, legacy_file_path)
+
+    assert as_json(blockchain.chain) == as_json(legacy_blockchain.chain)
+    assert not os.path.exists(f'{store_path}.migrating')
+
+
+def test_try_retrieve_local_blockchain_when_lazy_then_blocks_read_on_access(tmp_path):
+    store_path = str(tmp_path / 'store')
+    try_retrieve_local_blockchain(store_path)
+
+    assert isinstance(try_retrieve_local_blockchain(store_path, lazy=True).chain, LazyChain)
+    assert isinstance(try_retrieve_local_blockchain(store_path, lazy=False).chain, list)
+
+
+def test_try_retrieve_local_blockchain_when_snapshot_saved_then_only_later_blocks_replayed(tmp_path, capsys):
+    store_path = str(tmp_path / 'store')
+    blockchain = try_retrieve_local_blockchain(store_path)
+    blockchain.add_block([Transaction(Wallet(), 'recipient', 1).to_json()])
+    blockchain.save_to_file()
+    blockchain.snapshots.save(blockchain.synced_state(), blockchain.chain[-1].hash)
+    blockchain.add_block([Transaction(Wallet(), 'recipient', 2).to_json()])
+    blockchain.save_to_file()
+
+    restarted = try_retrieve_local_blockchain(store_path)
+
+    assert restarted.state.base_height == 2
+    assert 'Restored the chain state from the snapshot at height 2' in capsys.readouterr().out
+    assert restarted.synced_state().balances == blockchain.synced_state().balances
@@ -0,0 +1,38 @@
+import pytest
+
+from backend.wallet.parsed_transaction import ParsedTransaction
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+
+def test_parsed_transaction_when_transaction_then_fields_precomputed():
+    sender = Wallet()
+    transaction = Transaction(sender, 'recipient', 10)
+
+    parsed = ParsedTransaction(transaction.to_json())
+
+    assert parsed.id == transaction.id
+    assert not parsed.is_reward
+    assert parsed.sender == sender.address
+    assert parsed.input_amount == sender.balance
+    assert dict(parsed.outputs) == transaction.output
+    assert set(parsed.addresses) == {'recipient', sender.address}
+    Transaction.is_valid_transaction(parsed)
+
+
+def test_parsed_transaction_when_mining_reward_then_is_reward():
+    miner = Wallet()
+
+    parsed = ParsedTransaction(Transaction.reward_transaction(miner).to_json())
+
+    assert parsed.is_reward
+    assert parsed.input_amount is None
+    assert parsed.addresses == (miner.address,)
+    Transaction.is_valid_transaction(parsed)
+
+
+def test_parsed_transaction_when_unknown_field_then_exception():
+    transaction_json = {**Transaction(Wallet(), 'recipient', 10).to_json(), 'fee': 1}
+
+    with pytest.raises(Exception, match='Unknown transaction fields'):
+        ParsedTransaction(transaction_json)
@@ -0,0 +1,38 @@
+import pytest
+
+from backend.wallet import signature_verifier
+from backend.wallet.signature_verifier import first_invalid_signature
+from backend.wallet.wallet import Wallet
+
+
+def signatures(count, invalid_at=None):
+    wallet = Wallet()
+    result = []
+    for i in range(count):
+        data = {'foo': i}
+        signer = Wallet() if i == invalid_at else wallet
+        result.append((wallet.public_key, data, signer.sign(data)))
+    return result
+
+
+@pytest.mark.parametrize('pool', ['process', 'thread'])
+def test_first_invalid_signature_when_all_valid_then_returns_none(pool):
+    assert first_invalid_signature(signatures(9), workers=2, batch_size=2, pool=pool) is None
+
+
+@pytest.mark.parametrize('pool', ['process', 'thread'])
+def test_first_invalid_signature_returns_index_of_first_invalid(pool):
+    assert first_invalid_signature(signatures(9, invalid_at=5), workers=2, batch_size=2, pool=pool) == 5
+
+
+def test_first_invalid_signature_when_single_worker_then_verifies_in_order():
+    assert first_invalid_signature(signatures(4, invalid_at=2), workers=1) == 2
+
+
+@pytest.mark.parametrize('pool', ['process', 'thread'])
+def test_first_invalid_signature_when_called_again_then_pool_reused(pool):
+    first_invalid_signature(signatures(5), workers=2, batch_size=2, pool=pool)
+    executor = signature_verifier._executors[(pool, 2)]
+
+    assert first_invalid_signature(signatures(5, invalid_at=1), workers=2, batch_size=2, pool=pool) == 1
+    assert signature_verifier._executors[(pool, 2)] is executor
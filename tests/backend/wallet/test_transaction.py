@@ -2,7 +2,7 @@ import pytest
 
 from backend.config import STARTING_BALANCE, MINING_REWARD_INPUT, MINING_REWARD
 from backend.wallet.wallet import Wallet
-from backend.wallet.transaction import Transaction
+from backend.wallet.transaction import COMPACT_INPUT_VERSION, Transaction
 
 
 def test_transaction_when_sender_sends_amount_to_recipient_then_output_and_input_created_correctly():
@@ -16,10 +16,58 @@ def test_transaction_when_sender_sends_amount_to_recipient_then_output_and_input
     assert transaction.input['address'] == sender_wallet.address
     assert transaction.input['amount'] == sender_wallet.balance
     assert 'timestamp' in transaction.input
-    assert transaction.input['public_key'] == sender_wallet.public_key
+    assert transaction.input['public_key'] == sender_wallet.compact_public_key
+    assert transaction.input['version'] == COMPACT_INPUT_VERSION
     assert Wallet.verify(transaction.input['public_key'], transaction.output, transaction.input['signature'])
 
 
+def test_is_valid_transaction_when_legacy_input_with_pem_public_key_then_does_not_raise():
+    sender_wallet = Wallet()
+    transaction = Transaction(sender_wallet, 'recipient', 50)
+    transaction.input['public_key'] = sender_wallet.public_key
+    del transaction.input['version']
+
+    Transaction.is_valid_transaction(Transaction.from_json(transaction.to_json()))
+
+
+def test_is_valid_transaction_when_compact_input_carries_pem_public_key_then_raises():
+    sender_wallet = Wallet()
+    transaction = Transaction(sender_wallet, 'recipient', 50)
+    transaction.input['public_key'] = sender_wallet.public_key
+
+    with pytest.raises(Exception, match='not in the format of input version 2'):
+        Transaction.is_valid_transaction(transaction)
+
+
+def test_is_valid_transaction_when_untagged_input_carries_compact_public_key_then_raises():
+    transaction = Transaction(Wallet(), 'recipient', 50)
+    del transaction.input['version']
+
+    with pytest.raises(Exception, match='not in the format of input version 1'):
+        Transaction.is_valid_transaction(transaction)
+
+
+def test_is_valid_transaction_when_input_version_unknown_then_raises():
+    transaction = Transaction(Wallet(), 'recipient', 50)
+    transaction.input['version'] = 3
+
+    with pytest.raises(Exception, match='Unknown transaction input version 3'):
+        Transaction.is_valid_transaction(transaction)
+
+
+def test_is_valid_transaction_when_address_is_not_address_of_public_key_then_raises():
+    sender_wallet = Wallet()
+    transaction = Transaction(sender_wallet, 'recipient', 50)
+    transaction.input['public_key'] = Wallet().compact_public_key
+
+    with pytest.raises(Exception, match='not the address of its public key'):
+        Transaction.is_valid_transaction(transaction)
+
+    transaction.input['public_key'] = 'not_a_public_key'
+    with pytest.raises(Exception, match='Invalid transaction public key'):
+        Transaction.is_valid_transaction(transaction)
+
+
 def test_transaction_when_balance_exceeds_transaction_then_throws():
     with pytest.raises(Exception, match="Amount exceeds balance"):
         Transaction(sender_wallet=Wallet(), recipient='recipient', amount=STARTING_BALANCE + 1)
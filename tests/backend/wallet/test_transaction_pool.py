@@ -1,5 +1,7 @@
+import pytest
+
 from backend.blockchain.blockchain import Blockchain
-from backend.wallet.transaction_pool import TransactionPool
+from backend.wallet.transaction_pool import EVICT_LOWEST_AMOUNT, TransactionPool
 from backend.wallet.transaction import Transaction
 from backend.wallet.wallet import Wallet
 
@@ -36,6 +38,141 @@ def test_clear_blockchain_transactions():
     assert transaction2.id not in transaction_pool.transaction_map
 
 
+def test_existing_transaction_when_sender_has_pooled_transaction_then_found():
+    wallet = Wallet()
+    transaction = Transaction(wallet, 'recipient', 1)
+    transaction_pool = TransactionPool()
+    transaction_pool.set_transaction(Transaction(Wallet(), 'recipient', 2))
+    transaction_pool.set_transaction(transaction)
+
+    assert transaction_pool.existing_transaction(wallet.address) is transaction
+    assert transaction_pool.existing_transaction('unknown') is None
+
+    transaction_pool.remove_transaction(transaction.id)
+
+    assert transaction_pool.existing_transaction(wallet.address) is None
+
+
+def test_transaction_data_when_pooled_transaction_updated_then_data_not_changed():
+    transaction_pool = TransactionPool()
+    wallet = Wallet()
+    transaction = Transaction(wallet, 'recipient', 1)
+    transaction_pool.set_transaction(transaction)
+
+    transaction_data = transaction_pool.transaction_data()
+    transaction.update(wallet, 'next_recipient', 2)
+
+    assert 'next_recipient' not in transaction_data[0]['output']
+
+
+def test_set_transaction_when_same_id_set_again_then_replaced():
+    wallet = Wallet()
+    transaction = Transaction(wallet, 'recipient', 1)
+    transaction_pool = TransactionPool()
+    transaction_pool.set_transaction(transaction)
+
+    transaction.update(wallet, 'other_recipient', 2)
+    transaction_pool.set_transaction(transaction)
+
+    assert len(transaction_pool) == 1
+    assert transaction_pool.bytes == TransactionPool.transaction_size(transaction)
+
+
+def test_set_transaction_when_pool_full_then_oldest_evicted():
+    transactions = [Transaction(Wallet(), 'recipient', i) for i in range(1, 5)]
+    transaction_pool = TransactionPool(max_entries=3)
+
+    for transaction in transactions:
+        transaction_pool.set_transaction(transaction)
+
+    assert list(transaction_pool.transaction_map) == [transaction.id for transaction in transactions[1:]]
+    assert transaction_pool.stats()['admissions'] == 4
+    assert transaction_pool.stats()['evictions'] == 1
+
+
+def test_set_transaction_when_pool_full_then_lowest_amount_evicted_or_rejected():
+    transaction_pool = TransactionPool(max_entries=3, eviction=EVICT_LOWEST_AMOUNT)
+    for amount in (20, 10, 30):
+        transaction_pool.set_transaction(Transaction(Wallet(), 'recipient', amount))
+
+    with pytest.raises(Exception, match='full of higher amounts'):
+        transaction_pool.set_transaction(Transaction(Wallet(), 'recipient', 5))
+    transaction_pool.set_transaction(Transaction(Wallet(), 'recipient', 15))
+
+    amounts = [TransactionPool.amount_sent(transaction) for transaction in transaction_pool.transaction_map.values()]
+    assert sorted(amounts) == [15, 20, 30]
+    assert transaction_pool.stats()['evictions'] == 1
+    assert transaction_pool.stats()['rejections'] == 1
+
+
+def test_update_transaction_when_pooled_transaction_updated_then_size_and_amount_counted_anew():
+    transaction_pool = TransactionPool(max_entries=2, eviction=EVICT_LOWEST_AMOUNT)
+    wallet = Wallet()
+    updated = Transaction(wallet, 'recipient', 10)
+    other = Transaction(Wallet(), 'recipient', 20)
+    transaction_pool.set_transaction(updated)
+    transaction_pool.set_transaction(other)
+
+    transaction_pool.update_transaction(updated, wallet, 'next_recipient', 15)
+
+    assert transaction_pool.bytes == sum(
+        TransactionPool.transaction_size(transaction) for transaction in (updated, other)
+    )
+    transaction_pool.set_transaction(Transaction(Wallet(), 'recipient', 22))
+    assert updated.id in transaction_pool.transaction_map
+    assert other.id not in transaction_pool.transaction_map
+
+
+def test_set_transaction_when_bytes_limit_reached_then_pool_stays_within_limit():
+    transaction = Transaction(Wallet(), 'recipient', 1)
+    size = TransactionPool.transaction_size(transaction)
+    transaction_pool = TransactionPool(max_bytes=int(2.5 * size))
+
+    for _ in range(10):
+        transaction_pool.set_transaction(Transaction(Wallet(), 'recipient', 1))
+
+    assert len(transaction_pool) == 2
+    assert transaction_pool.bytes <= transaction_pool.max_bytes
+
+    with pytest.raises(Exception, match='does not fit'):
+        TransactionPool(max_bytes=size - 1).set_transaction(transaction)
+
+
+def test_update_for_blocks_when_chain_switches_to_fork_then_confirmed_dropped_and_orphaned_returned():
+    orphaned = Transaction(Wallet(), 'recipient', 1)
+    confirmed_in_both = Transaction(Wallet(), 'recipient', 2)
+    pooled = Transaction(Wallet(), 'recipient', 3)
+    blockchain = Blockchain()
+    transaction_pool = TransactionPool()
+    blockchain.add_listener(transaction_pool.update_for_blocks)
+    fork = Blockchain(blockchain.chain[:])
+
+    transaction_pool.set_transaction(orphaned)
+    transaction_pool.set_transaction(pooled)
+    blockchain.add_block([orphaned.to_json(), confirmed_in_both.to_json()])
+
+    assert list(transaction_pool.transaction_map) == [pooled.id]
+
+    fork.add_block([confirmed_in_both.to_json(), pooled.to_json()])
+    fork.add_block([])
+    blockchain.replace_chain(fork.chain)
+
+    assert list(transaction_pool.transaction_map) == [orphaned.id]
+    assert transaction_pool.transaction_map[orphaned.id].to_json() == orphaned.to_json()
+
+
+def test_update_for_blocks_when_new_chain_spends_from_same_sender_then_orphaned_not_returned():
+    sender = Wallet()
+    orphaned = Transaction(sender, 'recipient', 1)
+    blockchain = Blockchain()
+    transaction_pool = TransactionPool()
+    blockchain.add_listener(transaction_pool.update_for_blocks)
+    fork = Blockchain(blockchain.chain[:])
 
+    blockchain.add_block([orphaned.to_json()])
 
+    fork.add_block([Transaction(sender, 'other_recipient', 5).to_json()])
+    fork.add_block([])
+    blockchain.replace_chain(fork.chain)
 
+    assert len(transaction_pool) == 0
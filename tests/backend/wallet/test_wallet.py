@@ -1,7 +1,26 @@
+import random
+
 from backend.blockchain.blockchain import Blockchain
 from backend.config import STARTING_BALANCE
 from backend.wallet.transaction import Transaction
-from backend.wallet.wallet import Wallet
+from backend.wallet.wallet import PUBLIC_KEY_CACHE, SIGNATURE_CACHE, Wallet
+
+
+def scan_balance(blockchain, address):
+    """
+    Reference implementation of the balance: scan every transaction of the chain
+    """
+    balance = STARTING_BALANCE
+
+    for block in blockchain.chain:
+        for transaction in block.data:
+            if transaction['input']['address'] == address:
+                # any time the address conducts any transactions, it resets its balance
+                balance = transaction['output'][address]
+            elif address in transaction['output']:
+                # If the recipient is receiving an amount, then add it to the balance
+                balance += transaction['output'][address]
+    return balance
 
 
 def test_verify_valid_signature_returns_true():
@@ -18,6 +37,36 @@ def test_verify_valid_signature_returns_false():
     assert not Wallet.verify(Wallet().public_key, data, signature)
 
 
+def test_verify_when_signature_already_verified_then_cache_hit():
+    data = {'foo': 'test_data', 'bar': 1}
+    wallet = Wallet()
+    signature = wallet.sign(data)
+
+    assert Wallet.verify(wallet.public_key, data, signature)
+    hits = SIGNATURE_CACHE.hits
+    assert Wallet.verify(wallet.public_key, data, signature)
+    assert SIGNATURE_CACHE.hits == hits + 1
+
+
+def test_verify_when_data_differs_only_in_key_order_then_not_a_cache_hit():
+    data = {'foo': 'test_data', 'bar': 1}
+    wallet = Wallet()
+    signature = wallet.sign(data)
+    assert Wallet.verify(wallet.public_key, data, signature)
+
+    # The signature covers the serialised data, so the reordered data does not carry a valid signature
+    assert not Wallet.verify(wallet.public_key, {'bar': 1, 'foo': 'test_data'}, signature)
+
+
+def test_load_public_key_when_loaded_before_then_returns_cached_key():
+    wallet = Wallet()
+    public_key = Wallet.load_public_key(wallet.public_key)
+
+    assert public_key.public_numbers() == wallet.private_key.public_key().public_numbers()
+    assert Wallet.load_public_key(wallet.public_key) is public_key
+    assert wallet.public_key in PUBLIC_KEY_CACHE
+
+
 def test_calculate_wallet_balance_when_no_transactions_balance_equals_starting_balance():
     blockchain = Blockchain()
     wallet = Wallet()
@@ -112,8 +161,47 @@ def test_calculate_wallet_balance_when_sent_amounts_to_multiple_wallets_then_bal
     assert Wallet.calculate_balance(blockchain, receiving_wallet2.address) == STARTING_BALANCE + sent_amount2
 
 
+def test_calculate_balance_matches_scan_of_the_chain_as_blocks_are_added_and_replaced():
+    rng = random.Random(7)
+    blockchain = Blockchain()
+    wallets = [Wallet(blockchain) for _ in range(4)]
+    addresses = [wallet.address for wallet in wallets]
+
+    def assert_matches_scan():
+        for address in addresses:
+            assert Wallet.calculate_balance(blockchain, address) == scan_balance(blockchain, address)
+
+    for _ in range(4):
+        transactions = []
+        for wallet in rng.sample(wallets, 2):
+            recipient = rng.choice([address for address in addresses if address != wallet.address])
+            transactions.append(Transaction(wallet, recipient, rng.randint(1, 20)).to_json())
+        transactions.append(Transaction.reward_transaction(rng.choice(wallets)).to_json())
+        blockchain.add_block(transactions)
+        assert_matches_scan()
 
+    # Fork off the second block, so replacing the chain rolls back the balances of the last blocks
+    fork = Blockchain(blockchain.chain[:2])
+    for _ in range(4):
+        sender = Wallet(fork)
+        fork.add_block([Transaction(sender, rng.choice(addresses), rng.randint(1, 20)).to_json()])
 
+    blockchain.replace_chain(fork.chain)
+    assert_matches_scan()
 
 
+def test_verify_when_compact_public_key_then_valid():
+    wallet = Wallet()
+    data = {'foo': 'test_data'}
+    signature = wallet.sign(data)
+
+    assert len(wallet.compact_public_key) == 66
+    assert Wallet.verify(wallet.compact_public_key, data, signature)
+    assert not Wallet.verify(Wallet().compact_public_key, data, signature)
+
+
+def test_address_from_public_key_when_either_format_then_wallet_address():
+    wallet = Wallet()
 
+    assert Wallet.address_from_public_key(wallet.public_key) == wallet.address
+    assert Wallet.address_from_public_key(wallet.compact_public_key) == wallet.address